@@ -0,0 +1,29 @@
+from benchmarks import synthetic
+from benchmarks.results import result, timed
+
+
+def run(n_docs: int = 500, words_per_doc: int = 800, n_queries: int = 50) -> dict:
+    """
+    RAGPipeline._retrieve_context end to end (embed → search → rerank/bias →
+    token budget) over a synthetic text corpus. Ingest is uncached
+    (no source_dir) so the index always reflects the current code.
+    """
+    import numpy as np
+    from src.rag_pipeline import RAGPipeline
+
+    pipeline = RAGPipeline()
+    t_ingest, _ = timed(pipeline.ingest, synthetic.documents(n_docs, words_per_doc))
+    questions = synthetic.queries(n_queries)
+    pipeline._retrieve_context(questions[0])    # warm-up
+
+    latencies = []
+    for q in questions:
+        t, _ = timed(pipeline._retrieve_context, q)
+        latencies.append(t * 1000)
+    p50, p95 = np.percentile(latencies, [50, 95])
+    print(f"[bench_pipeline] _retrieve_context p50={p50:.1f} ms p95={p95:.1f} ms")
+    return {
+        "pipeline.ingest_s": result(t_ingest, "s", False),
+        "pipeline.retrieve_context_p50_ms": result(p50, "ms", False),
+        "pipeline.retrieve_context_p95_ms": result(p95, "ms", False),
+    }
@@ -0,0 +1,109 @@
+"""
+Cold-start cost of the service entry points, each measured in a fresh
+interpreter under `python -X importtime`:
+
+    startup.import_<name>_ms  — cumulative import time of the module
+    startup.pipeline_init_ms  — import + RAGPipeline() construction
+
+ML frameworks imported at startup are reported by name — they belong inside
+the function that first needs them, not at module level.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --target-ms 300 --top 20
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from benchmarks.results import result
+
+ENTRY_POINTS = {
+    "pipeline": "src.rag_pipeline",
+    "api": "main",                  # python-api/main.py — needs fastapi
+}
+
+HEAVY_MODULES = ("torch", "transformers", "sentence_transformers", "open_clip",
+                 "faiss", "whisper", "llama_cpp", "cv2")
+
+PIPELINE_INIT = (
+    "import time; t0 = time.perf_counter(); "
+    "from src.rag_pipeline import RAGPipeline; RAGPipeline(); "
+    "print((time.perf_counter() - t0) * 1000)"
+)
+
+
+def import_profile(code: str) -> dict:
+    """
+    Runs `code` in a fresh interpreter with -X importtime.
+    Returns {"modules": {name: cumulative_us}, "total_ms", "stdout", "error"}.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [str(PROJECT_ROOT), str(PROJECT_ROOT / "python-api")]))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    modules, total_us = {}, 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+        if len(name) - len(name.lstrip()) == 1:   # top level — children are nested
+            total_us += int(cumulative)
+    error = None
+    if proc.returncode != 0:
+        error = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+    return {"modules": modules, "total_ms": total_us / 1000,
+            "stdout": proc.stdout.strip(), "error": error}
+
+
+def run(repeat: int = 3, top: int = 0) -> dict:
+    """Best of `repeat` cold starts per entry point."""
+    results = {}
+    for name, module in ENTRY_POINTS.items():
+        runs = [import_profile(f"import {module}") for _ in range(repeat)]
+        best = min(runs, key=lambda r: r["total_ms"])
+        if best["error"]:
+            print(f"[bench_startup] {name}: skipped — {best['error']}")
+            continue
+        heavy = [m for m in HEAVY_MODULES if m in best["modules"]]
+        print(f"[bench_startup] import {module}: {best['total_ms']:.1f} ms"
+              + (f"  (loads {', '.join(heavy)})" if heavy else ""))
+        for mod, us in sorted(best["modules"].items(), key=lambda kv: -kv[1])[:top]:
+            print(f"    {us / 1000:>9.1f} ms  {mod}")
+        results[f"startup.import_{name}_ms"] = result(best["total_ms"], "ms", False)
+
+    inits = [import_profile(PIPELINE_INIT) for _ in range(repeat)]
+    inits = [float(r["stdout"].splitlines()[-1]) for r in inits if not r["error"]]
+    if inits:
+        print(f"[bench_startup] RAGPipeline() cold: {min(inits):.1f} ms")
+        results["startup.pipeline_init_ms"] = result(min(inits), "ms", False)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--target-ms", type=float, default=None,
+                        help="exit 1 if any cold start exceeds this")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.top)
+    if args.target_ms is not None:
+        over = {k: r["value"] for k, r in results.items() if r["value"] > args.target_ms}
+        for k, v in over.items():
+            print(f"[bench_startup] {k} = {v:.1f} ms exceeds target {args.target_ms:.0f} ms")
+        if over:
+            sys.exit(1)
+        print(f"[bench_startup] All cold starts under {args.target_ms:.0f} ms.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+from benchmarks import synthetic
+from benchmarks.results import result, timed
+
+
+def run_chunker(model_name: str, n_docs: int = 200, words_per_doc: int = 800,
+                max_tokens: int = 256, overlap: int = 50) -> dict:
+    from src.chunking.token_chunker import TokenChunker
+
+    chunker = TokenChunker(model_name=model_name, max_tokens=max_tokens, overlap=overlap)
+    docs = synthetic.documents(n_docs, words_per_doc)
+    chunker.chunk(docs[:2])     # warm-up
+    t, chunks = timed(chunker.chunk, docs, repeat=3)
+    words = n_docs * words_per_doc
+    print(f"[bench_text] TokenChunker: {words / t:,.0f} words/s, {len(chunks)} chunks")
+    return {
+        "chunker.words_per_s": result(words / t, "words/s", True),
+        "chunker.chunks_per_s": result(len(chunks) / t, "chunks/s", True),
+    }
+
+
+def run_embedder(model_name: str, n_chunks: int = 2000, words_per_chunk: int = 150) -> dict:
+    import numpy as np
+    from src.embeddings.text_embedder import TextEmbedder
+
+    embedder = TextEmbedder(model_name)
+    rng = np.random.default_rng(0)
+    texts = [synthetic.text(words_per_chunk, rng) for _ in range(n_chunks)]
+    embedder.embed(texts[:32])  # warm-up
+    t, _ = timed(embedder.embed, texts)
+    t_query, _ = timed(lambda: [embedder.embed([q]) for q in synthetic.queries(100)])
+    print(f"[bench_text] TextEmbedder: {n_chunks / t:,.1f} chunks/s")
+    return {
+        "embedder.chunks_per_s": result(n_chunks / t, "chunks/s", True),
+        "embedder.query_ms": result(t_query * 1000 / 100, "ms/query", False),
+    }
@@ -0,0 +1,52 @@
+import shutil
+import tempfile
+import numpy as np
+from pathlib import Path
+from src.vectorstore.faiss_store import FAISSStore
+from benchmarks import synthetic
+from benchmarks.results import result, timed
+
+
+def run(sizes: list[int], dim: int = 384, kind: str = "clustered", metric: str = "cosine",
+        storage: str = "float32", k: int = 10, n_queries: int = 200) -> dict:
+    """FAISSStore add / search / filtered search / save / load at each corpus size."""
+    results = {}
+    queries = next(synthetic.vectors(n_queries, dim, kind, seed=99))
+
+    for n in sizes:
+        tag = f"n={n}"
+        store = FAISSStore(dim, metric=metric, storage=storage)
+        add_s, lo = 0.0, 0
+        for block in synthetic.vectors(n, dim, kind):
+            meta = synthetic.metadata(lo, lo + len(block))
+            t, _ = timed(store.add, block, meta)
+            add_s += t
+            lo += len(block)
+        results[f"faiss.add.{tag}"] = result(n / add_s, "vectors/s", True)
+
+        t, _ = timed(lambda: [store.search(q[None, :], k, threshold=float("inf"))
+                              for q in queries], repeat=3)
+        results[f"faiss.search.{tag}"] = result(t * 1000 / n_queries, "ms/query", False)
+
+        # source filter: pushed into FAISS as an ID-selector bitmap
+        filters = {"source": synthetic.SOURCES[:4]}
+        store.filter_mask(filters)      # field index built once, outside the timing
+        t, _ = timed(lambda: [store.search(q[None, :], k, threshold=float("inf"),
+                                           filters=filters) for q in queries], repeat=3)
+        results[f"faiss.search_filtered.{tag}"] = result(t * 1000 / n_queries, "ms/query", False)
+
+        tmp = Path(tempfile.mkdtemp(prefix="bench_faiss_"))
+        try:
+            index_path, meta_path = str(tmp / "index.faiss"), str(tmp / "metadata.pkl")
+            t, _ = timed(store.save, index_path, meta_path, repeat=3)
+            results[f"faiss.save.{tag}"] = result(t, "s", False)
+            del store
+            t, _ = timed(FAISSStore.load, index_path, meta_path, repeat=3)
+            results[f"faiss.load.{tag}"] = result(t, "s", False)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        print(f"[bench_vectorstore] {tag}: "
+              + ", ".join(f"{k.split('.')[1]}={v['value']} {v['unit']}"
+                          for k, v in results.items() if k.endswith(tag)))
+    return results
@@ -0,0 +1,69 @@
+import json
+import time
+import platform
+import subprocess
+from pathlib import Path
+
+
+def result(value: float, unit: str, higher_is_better: bool) -> dict:
+    return {"value": round(float(value), 4), "unit": unit, "higher_is_better": higher_is_better}
+
+
+def timed(fn, *args, repeat: int = 1, **kwargs) -> tuple[float, object]:
+    """Best-of-`repeat` wall time in seconds, plus the last return value."""
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save(results: dict, out_dir: str = "outputs/benchmarks", config: dict = None) -> Path:
+    """Write {meta, config, results} to <out_dir>/<commit>_<timestamp>.json."""
+    meta = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+    path = Path(out_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    path = path / f"{meta['commit']}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "config": config or {}, "results": results}, f, indent=2)
+    return path
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10) -> list[dict]:
+    """
+    Per shared benchmark: relative change, signed so that positive = worse.
+    A row regresses when it is worse than the baseline by more than `threshold`.
+    """
+    rows = []
+    for name, cur in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or not base["value"]:
+            continue
+        change = (cur["value"] - base["value"]) / abs(base["value"])
+        worse = -change if cur["higher_is_better"] else change
+        rows.append({
+            "name": name, "unit": cur["unit"],
+            "baseline": base["value"], "current": cur["value"],
+            "worse_by": round(worse, 4), "regressed": worse > threshold,
+        })
+    return rows
@@ -0,0 +1,99 @@
+"""
+OmniRAG — Retrieval Benchmarks
+==============================
+Micro-benchmarks for the retrieval stack on synthetic corpora:
+
+    vectorstore — FAISSStore add / search / filtered search / save / load
+    chunker     — TokenChunker throughput
+    embedder    — TextEmbedder.embed chunks/sec and single-query latency
+    pipeline    — RAGPipeline._retrieve_context end to end
+    startup     — cold import / RAGPipeline() time (see bench_startup.py)
+
+Results go to outputs/benchmarks/<commit>_<timestamp>.json. With --compare,
+every shared benchmark is checked against a baseline run and the exit code is
+1 if any is worse by more than --threshold (relative).
+
+Corpus sizes are 384-d float32: 1M vectors ≈ 1.5 GB, 10M ≈ 15 GB of RAM plus
+metadata, so the 10M tier is opt-in.
+
+Usage:
+    python benchmarks/run.py
+    python benchmarks/run.py --suites vectorstore --sizes 10000 100000 1000000 10000000
+    python benchmarks/run.py --compare outputs/benchmarks/abc1234_20260101_120000.json
+    python scripts/plot_results.py --benchmarks outputs/benchmarks/*.json
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+import yaml
+from benchmarks import results as bench_results
+
+SUITES = ["vectorstore", "chunker", "embedder", "pipeline", "startup"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=SUITES)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--kind", choices=["clustered", "random"], default="clustered")
+    parser.add_argument("--metric", choices=["cosine", "l2"], default="cosine")
+    parser.add_argument("--storage", choices=["float32", "fp16", "int8"], default="float32")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--out-dir", default="outputs/benchmarks")
+    parser.add_argument("--compare", help="baseline results JSON")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    with open(PROJECT_ROOT / "config" / "models.yaml") as f:
+        embedding_model = yaml.safe_load(f)["embedding_model"]
+
+    results = {}
+    if "vectorstore" in args.suites:
+        from benchmarks import bench_vectorstore
+        results.update(bench_vectorstore.run(
+            args.sizes, dim=args.dim, kind=args.kind, metric=args.metric,
+            storage=args.storage, k=args.k, n_queries=args.queries,
+        ))
+    if "chunker" in args.suites:
+        from benchmarks import bench_text
+        results.update(bench_text.run_chunker(embedding_model))
+    if "embedder" in args.suites:
+        from benchmarks import bench_text
+        results.update(bench_text.run_embedder(embedding_model))
+    if "pipeline" in args.suites:
+        from benchmarks import bench_pipeline
+        results.update(bench_pipeline.run())
+    if "startup" in args.suites:
+        from benchmarks import bench_startup
+        results.update(bench_startup.run())
+
+    path = bench_results.save(results, args.out_dir, config=vars(args))
+    print(f"\n[Benchmarks] {len(results)} results → {path}")
+
+    if args.compare:
+        rows = bench_results.compare(bench_results.load(args.compare),
+                                     bench_results.load(path), args.threshold)
+        print(f"\n{'Benchmark':<42} {'Baseline':>12} {'Current':>12} {'Worse by':>10}")
+        print("─" * 80)
+        for r in rows:
+            flag = "  REGRESSION" if r["regressed"] else ""
+            print(f"{r['name']:<42} {r['baseline']:>12.4g} {r['current']:>12.4g} "
+                  f"{r['worse_by'] * 100:>9.1f}%{flag}")
+        regressed = [r for r in rows if r["regressed"]]
+        if regressed:
+            print(f"\n[Benchmarks] {len(regressed)} regression(s) beyond "
+                  f"{args.threshold * 100:.0f}%.")
+            sys.exit(1)
+        print("\n[Benchmarks] No regressions.")
+
+
+if __name__ == "__main__":
+    main()
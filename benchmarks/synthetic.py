@@ -0,0 +1,70 @@
+import numpy as np
+from src.schema import Document
+
+_WORDS = (
+    "system model data index query vector memory latency cache shard token "
+    "retrieval embedding document section page audio video image frame caption "
+    "network policy report result method analysis value signal process error "
+    "storage throughput budget context answer source metric design test review"
+).split()
+
+SOURCES = [f"doc_{i:03d}.pdf" for i in range(64)]
+MODALITIES = ["text", "pdf", "audio", "video", "image"]
+
+
+def vectors(n: int, dim: int = 384, kind: str = "clustered", n_clusters: int = 256,
+            seed: int = 0, batch: int = 100_000):
+    """
+    Yield float32 [<=batch x dim] blocks totalling n rows, so 10M-row corpora
+    never exist in memory twice. "clustered" scatters points around topic
+    centroids (closer to real embeddings); "random" is isotropic Gaussian.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((n_clusters, dim)).astype("float32")
+    for lo in range(0, n, batch):
+        m = min(batch, n - lo)
+        noise = rng.standard_normal((m, dim)).astype("float32")
+        if kind == "clustered":
+            block = centroids[rng.integers(0, n_clusters, m)] + 0.5 * noise
+        else:
+            block = noise
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        yield block
+
+
+def metadata(lo: int, hi: int, seed: int = 0) -> list[dict]:
+    """FAISSStore metadata rows lo..hi with the fields the pipeline stores."""
+    rng = np.random.default_rng(seed + lo)
+    src = rng.integers(0, len(SOURCES), hi - lo)
+    mod = rng.integers(0, len(MODALITIES), hi - lo)
+    return [
+        {
+            "text": f"chunk {lo + i}",
+            "section": f"Section {i % 20}",
+            "source": SOURCES[src[i]],
+            "page": int(i % 300),
+            "modality": MODALITIES[mod[i]],
+            "start_time": float(i % 3600) if MODALITIES[mod[i]] in ("audio", "video") else None,
+        }
+        for i in range(hi - lo)
+    ]
+
+
+def text(n_words: int, rng: np.random.Generator) -> str:
+    words = rng.choice(_WORDS, n_words)
+    # sentence breaks every ~12 words so TokenChunker has boundaries to split on
+    return " ".join(w + ("." if i % 12 == 11 else "") for i, w in enumerate(words))
+
+
+def documents(n_docs: int, words_per_doc: int = 800, seed: int = 0) -> list[Document]:
+    rng = np.random.default_rng(seed)
+    return [
+        Document(text=text(words_per_doc, rng), source=SOURCES[i % len(SOURCES)],
+                 modality="text", section=f"Section {i % 20}", page=i % 300)
+        for i in range(n_docs)
+    ]
+
+
+def queries(n: int, seed: int = 1) -> list[str]:
+    rng = np.random.default_rng(seed)
+    return [f"What does the {' '.join(rng.choice(_WORDS, 4))} say?" for _ in range(n)]
@@ -2,13 +2,19 @@
 import sys
 import gc
 import shutil
-import torch
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(PROJECT_ROOT))
 
 from session import state
+from src.utils.metrics import track_model_unload
+
+
+def _empty_cuda_cache():
+    # torch is imported on first ingest, not at API startup
+    import torch
+    torch.cuda.empty_cache()
 
 
 def _free_phi3():
@@ -21,17 +27,18 @@ def _free_phi3():
         return
     pipeline = state["pipeline"]
     if hasattr(pipeline, "generator") and pipeline.generator is not None:
-        try:
-            del pipeline.generator.llm
-        except Exception:
-            pass
-        try:
-            del pipeline.generator
-        except Exception:
-            pass
-        pipeline.generator = None
-        gc.collect()
-        torch.cuda.empty_cache()
+        with track_model_unload("generator"):
+            try:
+                del pipeline.generator.llm
+            except Exception:
+                pass
+            try:
+                del pipeline.generator
+            except Exception:
+                pass
+            pipeline.generator = None
+            gc.collect()
+            _empty_cuda_cache()
         print("[Ingest] Phi-3 unloaded — VRAM freed for ingestion models.")
 
 
@@ -69,7 +76,7 @@ def run_ingestion(file_path: str, modality: str, filename: str) -> list:
         documents = captioner.caption_file(str(path))
         captioner.unload()
         gc.collect()
-        torch.cuda.empty_cache()
+        _empty_cuda_cache()
         print("[Ingest] Qwen2-VL freed.")
 
     # ── AUDIO ─────────────────────────────────────────────────────────────
@@ -78,9 +85,10 @@ def run_ingestion(file_path: str, modality: str, filename: str) -> list:
         tmp = _make_tmp(path, "audio_tmp")
         transcriber = AudioTranscriber(model_size="small", device="cuda")
         documents = transcriber.transcribe(str(tmp))
-        del transcriber
-        gc.collect()
-        torch.cuda.empty_cache()
+        with track_model_unload("whisper"):
+            del transcriber
+            gc.collect()
+            _empty_cuda_cache()
         shutil.rmtree(tmp)
         print("[Ingest] Whisper freed.")
 
@@ -92,17 +100,17 @@ def run_ingestion(file_path: str, modality: str, filename: str) -> list:
         tmp = _make_tmp(path, "video_tmp")
 
         processor = VideoProcessor(keyframe_interval=2, device="cuda")
-        transcript_docs, keyframe_images, keyframe_sources = processor.process(str(tmp))
+        transcript_docs, keyframe_refs, keyframe_sources = processor.process(str(tmp))
         processor.unload()
         gc.collect()
-        torch.cuda.empty_cache()
+        _empty_cuda_cache()
         print("[Ingest] Whisper freed.")
 
         captioner = VideoCaptioner()
-        keyframe_docs = captioner.caption_frames(keyframe_images, keyframe_sources)
+        keyframe_docs = captioner.caption_frames(keyframe_refs, keyframe_sources)
         captioner.unload()
         gc.collect()
-        torch.cuda.empty_cache()
+        _empty_cuda_cache()
         shutil.rmtree(tmp)
         print("[Ingest] Qwen2-VL freed.")
 
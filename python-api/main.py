@@ -1,4 +1,5 @@
 import sys
+import time
 import asyncio
 import threading
 import tempfile
@@ -10,15 +11,19 @@ sys.path.insert(0, str(PROJECT_ROOT))
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 
 # ── Third-party imports ──────────────────────────────────────────────────────
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, Request, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse
 import uvicorn
 
 # ── Local imports (python-api/) ──────────────────────────────────────────────
 from session import state, clear_pipeline, MODALITY_MAP
 from ingest import run_ingestion
 from query import make_sse_stream
+from src.utils.tracing import STAGE_HISTOGRAM
+from src.utils.metrics import (
+    REGISTRY, HTTP_REQUESTS, INGEST_DOCUMENTS, INGEST_BYTES, INGEST_SECONDS,
+)
 
 # ── App setup ────────────────────────────────────────────────────────────────
 app = FastAPI(title="OmniRAG API", version="6.1")
@@ -34,6 +39,19 @@ UPLOAD_DIR = PROJECT_ROOT / "outputs" / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 
+@app.middleware("http")
+async def count_requests(request: Request, call_next):
+    response = await call_next(request)
+    # route template, not the raw URL — keeps label cardinality bounded
+    route = request.scope.get("route")
+    HTTP_REQUESTS.inc(
+        method=request.method,
+        path=getattr(route, "path", "unmatched"),
+        status=str(response.status_code),
+    )
+    return response
+
+
 # ── STATUS ───────────────────────────────────────────────────────────────────
 @app.get("/status")
 def get_status():
@@ -46,6 +64,18 @@ def get_status():
     }
 
 
+# ── METRICS (Prometheus text format) ──────────────────────────────────────────
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+# ── STAGE TIMINGS (in-process histogram of per-query spans) ─────────────────
+@app.get("/timings")
+def get_timings():
+    return STAGE_HISTOGRAM.snapshot()
+
+
 # ── SESSION CLEAR ─────────────────────────────────────────────────────────────
 @app.delete("/session")
 def delete_session():
@@ -56,8 +86,13 @@ def delete_session():
 # ── background worker ─────────────────────────────────────────────────────────
 def _ingest_worker(dest: Path, modality: str, filename: str):
     """Runs in a daemon thread — updates state directly, never touches HTTP."""
+    start = time.perf_counter()
     try:
+        size = dest.stat().st_size
         docs = run_ingestion(str(dest), modality, filename)
+        INGEST_SECONDS.observe(time.perf_counter() - start, modality=modality)
+        INGEST_DOCUMENTS.inc(len(docs), modality=modality)
+        INGEST_BYTES.inc(size, modality=modality)
         state["current_file"]     = filename
         state["current_modality"] = modality
         state["pipeline_ready"]   = True
@@ -3,6 +3,11 @@ import threading
 import json
 import os
 
+from src.utils.tracing import Trace
+from src.utils.metrics import (
+    QUERIES_IN_FLIGHT, QUERY_QUEUE_DEPTH, TTFT, TOKENS_GENERATED, TOKENS_PER_SECOND,
+)
+
 
 async def make_sse_stream(pipeline, question: str):
     """
@@ -10,14 +15,29 @@ async def make_sse_stream(pipeline, question: str):
     1. Runs _retrieve_context in thread pool (blocking).
     2. Sends sources as first SSE event.
     3. Streams Phi-3 tokens via background thread + asyncio.Queue.
-    4. Sends done event.
+    4. Sends per-stage timings (ms), then the done event.
     """
+    # spans are recorded from the executor / worker threads via trace.bind
+    trace = Trace()
+    QUERIES_IN_FLIGHT.inc()
+    QUERY_QUEUE_DEPTH.inc()     # queued until the first token is streamed
+    try:
+        async for event in _stream(pipeline, question, trace):
+            yield event
+    finally:
+        # also runs when the client disconnects and the stream is closed
+        QUERIES_IN_FLIGHT.dec()
+        if "first_token" not in trace.stages:
+            QUERY_QUEUE_DEPTH.dec()
+
+
+async def _stream(pipeline, question: str, trace: Trace):
     loop = asyncio.get_event_loop()
 
     # ── Retrieval ─────────────────────────────────────────────────────────
     try:
         safe_contexts, results = await loop.run_in_executor(
-            None, pipeline._retrieve_context, question
+            None, trace.bind(pipeline._retrieve_context), question
         )
     except Exception as exc:
         yield f"data: {json.dumps({'error': str(exc)})}\n\n"
@@ -41,34 +61,60 @@ async def make_sse_stream(pipeline, question: str):
     # ── Empty context ─────────────────────────────────────────────────────
     if not safe_contexts:
         yield f"data: {json.dumps({'token': 'I could not find relevant information in the document.'})}\n\n"
+        yield _timings_event(trace)
         yield f"data: {json.dumps({'done': True})}\n\n"
         return
 
     # ── Build prompt and stream tokens ────────────────────────────────────
     from src.generation.prompt_templates import build_prompt
     prompt = build_prompt(safe_contexts, question)
-    pipeline._ensure_generator()
+    with trace.span("load_generator"):
+        pipeline._ensure_generator()
 
+    max_new_tokens = pipeline.answer_tokens(question)
     queue = asyncio.Queue()
+    cancelled = threading.Event()
 
     def _worker():
+        stream = pipeline.generator.generate_stream(prompt, max_new_tokens)
         try:
-            for token in pipeline.generator.generate_stream(prompt):
+            for token in stream:
+                if cancelled.is_set():
+                    break       # client gone — stop decoding instead of draining
                 loop.call_soon_threadsafe(queue.put_nowait, ("token", token))
         except Exception as exc:
             loop.call_soon_threadsafe(queue.put_nowait, ("error", str(exc)))
         finally:
+            stream.close()
             loop.call_soon_threadsafe(queue.put_nowait, ("done", None))
 
-    threading.Thread(target=_worker, daemon=True).start()
+    threading.Thread(target=trace.bind(_worker), daemon=True).start()
+
+    try:
+        while True:
+            event_type, data = await queue.get()
+            if event_type == "token":
+                if "first_token" not in trace.stages:
+                    trace.mark("first_token")   # TTFT as seen by the server
+                    QUERY_QUEUE_DEPTH.dec()
+                TOKENS_GENERATED.inc()
+                yield f"data: {json.dumps({'token': data})}\n\n"
+            elif event_type == "error":
+                yield f"data: {json.dumps({'error': data})}\n\n"
+                break
+            elif event_type == "done":
+                yield _timings_event(trace)
+                yield f"data: {json.dumps({'done': True})}\n\n"
+                break
+    finally:
+        cancelled.set()
+
 
-    while True:
-        event_type, data = await queue.get()
-        if event_type == "token":
-            yield f"data: {json.dumps({'token': data})}\n\n"
-        elif event_type == "error":
-            yield f"data: {json.dumps({'error': data})}\n\n"
-            break
-        elif event_type == "done":
-            yield f"data: {json.dumps({'done': True})}\n\n"
-            break
\ No newline at end of file
+def _timings_event(trace: Trace) -> str:
+    timings = trace.finish()
+    if "first_token" in timings:
+        TTFT.observe(timings["first_token"] / 1000)
+    tokens = trace.counts.get("tokens", 0)
+    if tokens and timings.get("decode"):
+        TOKENS_PER_SECOND.observe(tokens / (timings["decode"] / 1000))
+    return f"data: {json.dumps({'timings': timings, 'tokens': tokens})}\n\n"
\ No newline at end of file
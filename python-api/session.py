@@ -1,6 +1,7 @@
 # python-api/session.py
 import gc
-import torch
+
+from src.utils.metrics import track_model_unload
 
 state = {
     "pipeline":         None,
@@ -50,49 +51,61 @@ def clear_pipeline():
         # ── Generator (Phi-3 / llama-cpp) ────────────────────────────────
         gen = getattr(pipeline, "generator", None)
         if gen is not None:
-            # llama-cpp model
-            llm = getattr(gen, "llm", None)
-            if llm is not None:
-                try:
-                    del llm
-                except Exception:
-                    pass
-                gen.llm = None
-            # HF pipeline wrapper
-            pipe = getattr(gen, "pipe", None)
-            if pipe is not None:
-                _unload_model(pipe, "model")
+            with track_model_unload("generator"):
+                # llama-cpp model
+                llm = getattr(gen, "llm", None)
+                if llm is not None:
+                    try:
+                        del llm
+                    except Exception:
+                        pass
+                    gen.llm = None
+                # HF pipeline wrapper
+                pipe = getattr(gen, "pipe", None)
+                if pipe is not None:
+                    _unload_model(pipe, "model")
+                    try:
+                        del pipe
+                    except Exception:
+                        pass
+                    gen.pipe = None
+                # HF model (huggingface backend)
+                _unload_model(gen, "model")
                 try:
-                    del pipe
+                    del gen
                 except Exception:
                     pass
-                gen.pipe = None
-            try:
-                del gen
-            except Exception:
-                pass
-            pipeline.generator = None
+                pipeline.generator = None
 
         # ── Text embedder (SentenceTransformer) ──────────────────────────
         te = getattr(pipeline, "text_embedder", None)
         if te is not None:
-            _unload_model(te, "model")        # SentenceTransformer stores .model
-            _unload_model(te, "_model")       # some wrappers use _model
-            try:
-                del te
-            except Exception:
-                pass
-            pipeline.text_embedder = None
+            with track_model_unload("text_embedder"):
+                _unload_model(te, "model")        # SentenceTransformer stores .model
+                _unload_model(te, "_model")       # some wrappers use _model
+                try:
+                    del te
+                except Exception:
+                    pass
+                pipeline.text_embedder = None
 
         # ── Image embedder (CLIP via open_clip) ──────────────────────────
         ie = getattr(pipeline, "image_embedder", None)
         if ie is not None:
-            _unload_model(ie, "model")
-            try:
-                del ie
-            except Exception:
-                pass
-            pipeline.image_embedder = None
+            with track_model_unload("clip"):
+                _unload_model(ie, "model")
+                try:
+                    del ie
+                except Exception:
+                    pass
+                pipeline.image_embedder = None
+
+        # ── Cross-encoder reranker (CPU) ─────────────────────────────────
+        rr = getattr(pipeline, "reranker", None)
+        if rr is not None:
+            with track_model_unload("reranker"):
+                _unload_model(rr, "model")
+                pipeline.reranker = None
 
         # ── Vector stores (FAISS — CPU, but release the reference) ───────
         pipeline.text_vectorstore = None
@@ -111,6 +124,8 @@ def clear_pipeline():
 
     gc.collect()
 
+    # imported here, not at module level, to keep API startup free of torch
+    import torch
     if torch.cuda.is_available():
         torch.cuda.empty_cache()
         torch.cuda.ipc_collect()
@@ -0,0 +1,110 @@
+"""
+OmniRAG — Vector Storage Benchmark
+==================================
+Compares FAISSStore with float32, fp16 and int8 (scalar-quantized) vector
+storage, with and without the exact float32 re-rank, on synthetic clustered
+embeddings. Reports serialized index size, load time, per-query search
+latency and recall@k against the exact float32 top-k.
+
+Usage:
+    python scripts/benchmark_quantization.py
+    python scripts/benchmark_quantization.py --n 200000 --dim 384 --k 10 --metric cosine
+"""
+
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+import numpy as np
+from src.vectorstore.faiss_store import FAISSStore
+
+
+def _clustered_vectors(n: int, dim: int, n_clusters: int = 64, seed: int = 0) -> np.ndarray:
+    # embedding-like: points scattered around a few dozen topic centroids
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((n_clusters, dim)).astype("float32")
+    labels = rng.integers(0, n_clusters, n)
+    v = centroids[labels] + 0.5 * rng.standard_normal((n, dim)).astype("float32")
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def _dir_size_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.iterdir()) / 1e6
+
+
+def _run(config: tuple[str, int], vectors, queries, metric, k, truth, workdir):
+    storage, rerank = config
+    out = workdir / f"{storage}_{rerank}"
+    out.mkdir()
+    index_path, meta_path = str(out / "index.faiss"), str(out / "meta.pkl")
+
+    store = FAISSStore(vectors.shape[1], metric=metric, storage=storage, exact_rerank=rerank)
+    store.add(vectors, [{"id": i} for i in range(len(vectors))])
+    store.save(index_path, meta_path)
+    index_mb = (out / "index.faiss").stat().st_size / 1e6
+    total_mb = _dir_size_mb(out)
+    del store
+
+    t0 = time.perf_counter()
+    store = FAISSStore.load(index_path, meta_path, exact_rerank=rerank)
+    load_s = time.perf_counter() - t0
+
+    hits, t0 = 0, time.perf_counter()
+    for qi, q in enumerate(queries):
+        results = store.search(q[None, :], k, threshold=float("inf"))
+        hits += len({r["id"] for r in results} & truth[qi])
+    search_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+    recall = hits / (len(queries) * k)
+    return index_mb, total_mb, load_s, search_ms, recall
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, default=4)
+    parser.add_argument("--metric", choices=["cosine", "l2"], default="cosine")
+    args = parser.parse_args()
+
+    vectors = _clustered_vectors(args.n, args.dim)
+    queries = _clustered_vectors(args.queries, args.dim, seed=1)
+
+    # ground truth: exact float32 top-k
+    exact = FAISSStore(args.dim, metric=args.metric)
+    exact.add(vectors, [{"id": i} for i in range(args.n)])
+    truth = [{r["id"] for r in exact.search(q[None, :], args.k, threshold=float("inf"))}
+             for q in queries]
+    del exact
+
+    configs = [("float32", 0), ("fp16", 0), ("fp16", args.rerank),
+               ("int8", 0), ("int8", args.rerank)]
+
+    print(f"N={args.n} dim={args.dim} metric={args.metric} k={args.k} "
+          f"queries={args.queries}\n")
+    print(f"{'Storage':<14} {'Index(MB)':<11} {'On disk(MB)':<13} {'Load(s)':<9} "
+          f"{'Search(ms)':<12} {'Recall@' + str(args.k)}")
+    print("─" * 70)
+
+    workdir = Path(tempfile.mkdtemp(prefix="quant_bench_"))
+    try:
+        for config in configs:
+            index_mb, total_mb, load_s, search_ms, recall = _run(
+                config, vectors, queries, args.metric, args.k, truth, workdir
+            )
+            label = config[0] + (f"+rr{config[1]}" if config[1] else "")
+            print(f"{label:<14} {index_mb:<11.1f} {total_mb:<13.1f} {load_s:<9.3f} "
+                  f"{search_ms:<12.3f} {recall:.4f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
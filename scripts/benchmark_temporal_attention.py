@@ -0,0 +1,114 @@
+"""
+OmniRAG — Temporal Attention Benchmark
+======================================
+Times TemporalAttention.attend over N random CLIP-sized frame embeddings in
+windowed mode and (where it fits in memory) full N×N mode, reports the peak
+memory each run adds, and checks windowed == full for N <= window.
+
+Every (mode, N) runs in a fresh interpreter: ru_maxrss is a lifetime maximum,
+so in one process a large N would mask every smaller one after it. The
+reported figure is peak RSS minus the RSS after imports and model setup.
+
+Usage:
+    python scripts/benchmark_temporal_attention.py
+    python scripts/benchmark_temporal_attention.py --sizes 100 1000 10000 50000
+"""
+
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+import numpy as np
+import torch
+from src.retrieval.temporal_attention import TemporalAttention
+
+# full attention materialises heads × N × N floats — skip it beyond this
+FULL_MAX_N = 5000
+
+
+def _random_frames(n: int, dim: int = 512) -> np.ndarray:
+    v = np.random.default_rng(0).standard_normal((n, dim)).astype("float32")
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def _time(attn: TemporalAttention, vectors: np.ndarray) -> tuple[float, np.ndarray]:
+    t0 = time.perf_counter()
+    out = attn.attend(vectors)
+    return time.perf_counter() - t0, out
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _child(mode: str, n: int, window: int, overlap: int):
+    """One measurement in this (fresh) process; prints a JSON line."""
+    torch.manual_seed(0)
+    windowed = TemporalAttention(512, 8, window=window, overlap=overlap).eval()
+    full = TemporalAttention(512, 8, window=None).eval()
+    full.load_state_dict(windowed.state_dict())
+    vectors = _random_frames(n)
+
+    baseline = _rss_mb()
+    seconds, out = _time(windowed if mode == "windowed" else full, vectors)
+    peak = _rss_mb() - baseline
+
+    match = None
+    if mode == "full" and n <= window:
+        _, w_out = _time(windowed, vectors)
+        match = bool(np.allclose(w_out, out, atol=1e-5))
+    print(json.dumps({"seconds": seconds, "peak_mb": peak, "match": match}))
+
+
+def _measure(mode: str, n: int, window: int, overlap: int) -> dict:
+    proc = subprocess.run(
+        [sys.executable, __file__, "--child", mode, str(n),
+         "--window", str(window), "--overlap", str(overlap)],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{mode} N={n} failed: "
+                           f"{(proc.stderr.strip().splitlines() or ['?'])[-1]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[100, 500, 1000, 2000, 5000, 10000, 20000, 50000])
+    parser.add_argument("--window", type=int, default=512)
+    parser.add_argument("--overlap", type=int, default=64)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "N"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child[0], int(args.child[1]), args.window, args.overlap)
+        return
+
+    print(f"window={args.window} overlap={args.overlap}\n")
+    print(f"{'N':<8} {'Windowed(s)':<13} {'Win +MB':<9} {'Full(s)':<10} {'Full +MB':<10} {'Match'}")
+    print("─" * 60)
+
+    for n in args.sizes:
+        w = _measure("windowed", n, args.window, args.overlap)
+
+        f_time, f_mb, match = "-", "-", "-"
+        if n <= FULL_MAX_N:
+            f = _measure("full", n, args.window, args.overlap)
+            f_time, f_mb = f"{f['seconds']:.3f}", f"{f['peak_mb']:.0f}"
+            if f["match"] is not None:
+                match = str(f["match"])
+
+        print(f"{n:<8} {w['seconds']:<13.3f} {w['peak_mb']:<9.0f} {f_time:<10} {f_mb:<10} {match}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,28 +5,48 @@ Runs across all 5 modalities and produces:
   - Ingestion time per modality
   - Query latency (avg of N queries)
   - Faithfulness score (ROUGE-L answer vs context)
-  - Recall@k (phrase-based)
+  - Recall@k for several k (phrase-based)
   - A printable results table for synopsis
 
+Phases, so every model is loaded once for the whole run:
+  1. extract   — text / PDF load on worker threads while the GPU modalities
+                 (captioning, Whisper) run one at a time; extracted docs are
+                 cached by data fingerprint in outputs/eval_cache/
+  2. index     — one RAGPipeline (one embedder, one CLIP) indexes every
+                 modality; the index cache is keyed by the same fingerprint
+  3. retrieval — all questions embedded in one batch, one search per question
+                 at max(k), recall@k computed for every k from that ranking
+  4. generate  — the LLM is loaded once, after the ingestion models are freed
+  5. score     — ROUGE-L faithfulness in a process pool
+
+Re-running after a prompt change skips extraction and indexing entirely.
+
 Usage:
     cd ~/Desktop/RAGproject
     source rag-env/bin/activate
     export PYTORCH_CUDA_ALLOC_CONF=expandable_segments:True
     python scripts/evaluate_all.py
+    python scripts/evaluate_all.py --modalities text pdf --ks 1 5 10 --workers 4
+    python scripts/evaluate_all.py --no-cache      # re-extract everything
 """
 
 import sys
 import time
 import json
 import gc
+import pickle
+import argparse
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
 import torch
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(PROJECT_ROOT))
 
-from src.evaluation.retrieval_metrics import recall_at_k
-from src.evaluation.faithfulness import faithfulness_score
+from src.evaluation.retrieval_metrics import recall_at_ks
+from src.evaluation.faithfulness import faithfulness_scores
+from src.utils.cache import compute_dir_hash
 
 # ─────────────────────────────────────────────────────────────────────────────
 # EVAL SETS — matched to actual files in data/
@@ -130,27 +150,26 @@ EVAL_SETS = {
 # HELPERS
 # ─────────────────────────────────────────────────────────────────────────────
 
+DOC_CACHE_DIR = Path("outputs/eval_cache")
+
+# extraction needs no GPU model — safe to run alongside the GPU modalities
+CPU_MODALITIES = ("text", "pdf")
+
+
 def free_vram():
     gc.collect()
     torch.cuda.empty_cache()
 
 
-def ingest_modality(modality: str, data_path: str):
-    """
-    Runs full ingestion for a modality.
-    Returns (RAGPipeline, ingestion_time_seconds, doc_count, chunk_count).
-    """
-    from src.rag_pipeline import RAGPipeline
-
-    t0 = time.time()
-
+def extract_docs(modality: str, data_path: str) -> list:
+    """Runs the modality's loader / captioner / transcriber. Returns Documents."""
     if modality == "text":
         from src.ingestion.text_loader import TextLoader
-        docs = TextLoader(data_path).load()
+        return TextLoader(data_path).load()
 
     elif modality == "pdf":
         from src.ingestion.pdf_loader import PDFLoader
-        docs = PDFLoader(data_path).load()
+        return PDFLoader(data_path).load()
 
     elif modality == "image":
         from src.ingestion.image_captioner import ImageCaptioner
@@ -158,6 +177,7 @@ def ingest_modality(modality: str, data_path: str):
         docs = captioner.caption_dir(data_path)
         captioner.unload()
         free_vram()
+        return docs
 
     elif modality == "audio":
         from src.ingestion.audio_transcriber import AudioTranscriber
@@ -165,29 +185,90 @@ def ingest_modality(modality: str, data_path: str):
         docs = transcriber.transcribe(data_path)
         del transcriber
         free_vram()
+        return docs
 
     elif modality == "video":
         from src.ingestion.video_processor import VideoProcessor
         from src.ingestion.video_captioner import VideoCaptioner
         processor = VideoProcessor(keyframe_interval=2, device="cuda")
-        transcript_docs, keyframe_images, keyframe_sources = processor.process(data_path)
+        transcript_docs, keyframe_refs, keyframe_sources = processor.process(data_path)
         processor.unload()
         free_vram()
         captioner = VideoCaptioner()
-        keyframe_docs = captioner.caption_frames(keyframe_images, keyframe_sources)
+        keyframe_docs = captioner.caption_frames(keyframe_refs, keyframe_sources)
         captioner.unload()
         free_vram()
-        docs = transcript_docs + keyframe_docs
+        return transcript_docs + keyframe_docs
 
-    else:
-        raise ValueError(f"Unknown modality: {modality}")
+    raise ValueError(f"Unknown modality: {modality}")
 
-    doc_count = len(docs)
 
-    pipeline = RAGPipeline()
+def load_docs(modality: str, data_path: str, use_cache: bool = True):
+    """
+    Extracted docs, cached by the data directory's fingerprint — same files,
+    same docs, so captioning / transcription only ever run once per dataset.
+    Returns (docs, extraction_time_seconds, cache_hit).
+    """
+    cache_path = DOC_CACHE_DIR / f"{modality}_{compute_dir_hash(data_path)}.pkl"
+    if use_cache and cache_path.exists():
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+        print(f"[Eval] Cache hit — {modality}: {len(cached['docs'])} docs")
+        return cached["docs"], cached["extract_time"], True
+
+    t0 = time.perf_counter()
+    docs = extract_docs(modality, data_path)
+    extract_time = time.perf_counter() - t0
+
+    # live PIL images don't belong on disk — the image index re-reads
+    # doc.source (or the FrameRef) if it ever has to be rebuilt
+    stored = [
+        dataclasses.replace(d, metadata={k: v for k, v in d.metadata.items()
+                                         if k != "_pil_image"})
+        for d in docs
+    ]
+    DOC_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(cache_path, "wb") as f:
+        pickle.dump({"docs": stored, "extract_time": extract_time}, f)
+    return docs, extract_time, False
+
+
+def extract_all(modalities: list[str], use_cache: bool = True) -> dict:
+    """
+    CPU modalities run on worker threads while the GPU modalities run one at
+    a time on this thread (two captioners would not fit in VRAM together).
+    Returns {modality: (docs, extraction_time, cache_hit) or Exception}.
+    """
+    extracted = {}
+    cpu = [m for m in modalities if m in CPU_MODALITIES]
+    with ThreadPoolExecutor(max_workers=max(1, len(cpu))) as pool:
+        futures = {m: pool.submit(load_docs, m, EVAL_SETS[m]["data_path"], use_cache)
+                   for m in cpu}
+        for m in modalities:
+            if m in futures:
+                continue
+            try:
+                extracted[m] = load_docs(m, EVAL_SETS[m]["data_path"], use_cache)
+            except Exception as e:
+                extracted[m] = e
+        for m, future in futures.items():
+            try:
+                extracted[m] = future.result()
+            except Exception as e:
+                extracted[m] = e
+    return extracted
+
+
+def build_indexes(pipeline, docs: list, data_path: str):
+    """
+    Indexes one modality with the shared pipeline's models.
+    Returns ((text_vectorstore, image_retriever), index_time_seconds, chunk_count).
+    """
+    pipeline.text_vectorstore = None
+    pipeline.image_retriever = None
+    t0 = time.perf_counter()
     pipeline.ingest(docs, source_dir=data_path)
-
-    ingestion_time = time.time() - t0
+    index_time = time.perf_counter() - t0
 
     chunk_count = 0
     if pipeline.text_vectorstore is not None:
@@ -196,126 +277,193 @@ def ingest_modality(modality: str, data_path: str):
         except Exception:
             chunk_count = -1
 
-    return pipeline, ingestion_time, doc_count, chunk_count
+    return (pipeline.text_vectorstore, pipeline.image_retriever), index_time, chunk_count
+
+
+def use_indexes(pipeline, indexes):
+    pipeline.text_vectorstore, pipeline.image_retriever = indexes
+    pipeline._sources = None
 
 
-def evaluate_pipeline(pipeline, queries: list[dict], top_k: int = 10) -> dict:
+def retrieve_chunks(pipeline, indexes: dict, queries: dict, max_k: int) -> dict:
     """
-    Runs all queries against a pipeline.
-    Returns aggregate metrics dict.
+    Embeds every question of every modality in one batch, then runs one dense
+    search per question at max_k. Returns {modality: [chunk texts per question]}.
     """
-    from src.retrieval.text_retriever import TextRetriever
+    flat = [(m, item["question"]) for m in queries for item in queries[m]]
+    if not flat:
+        return {}
+    vectors = pipeline._ensure_text_embedder().embed([q for _, q in flat])
+
+    chunks = {m: [] for m in queries}
+    for (modality, _), vec in zip(flat, vectors):
+        store = indexes[modality][0]
+        if store is None:
+            chunks[modality].append([])
+            continue
+        results = store.search(vec[None, :], max_k)
+        chunks[modality].append([r["text"] for r in results])
+    return chunks
 
-    latencies           = []
-    faithfulness_scores = []
-    recall_scores       = []
 
-    for item in queries:
-        question         = item["question"]
-        relevant_phrases = item["relevant_phrases"]
+def evaluate_pipeline(pipeline, queries: list[dict], chunks: list[list[str]],
+                      ks: tuple, top_k: int = 10) -> dict:
+    """
+    Answers all queries for the active modality and scores recall@k.
+    Faithfulness is scored later, for all modalities at once.
+    """
+    answers, latencies, recalls = [], [], []
 
+    for item, retrieved in zip(queries, chunks):
         # ── Query + latency ────────────────────────────────────────
-        t0 = time.time()
-        answer = pipeline.query(question)
-        query_latency = time.time() - t0
-        latencies.append(query_latency)
-
-        # ── Recall@k ───────────────────────────────────────────────
-        if pipeline.text_vectorstore is not None:
-            retriever = TextRetriever(
-                pipeline.text_embedder,
-                pipeline.text_vectorstore,
-                top_k,
-            )
-            retrieved = retriever.retrieve(question)
-            chunks = [r["text"] for r in retrieved]
-        else:
-            chunks = []
-
-        recall = recall_at_k(chunks, relevant_phrases, k=top_k)
-        recall_scores.append(recall)
+        t0 = time.perf_counter()
+        answer = pipeline.query(item["question"])
+        latencies.append(time.perf_counter() - t0)
+        answers.append(answer)
 
-        # ── Faithfulness (ROUGE-L answer vs context) ───────────────
-        faith = faithfulness_score(answer, chunks[:5])
-        faithfulness_scores.append(faith)
+        # ── Recall@k, every k from the one ranking ─────────────────
+        recalls.append(recall_at_ks(retrieved, item["relevant_phrases"], ks))
 
-        print(f"  Q: {question}")
-        print(f"     Latency={query_latency:.2f}s  "
-              f"Recall@{top_k}={recall:.2f}  "
-              f"Faithfulness={faith:.3f}")
+        print(f"  Q: {item['question']}")
+        print(f"     Latency={latencies[-1]:.2f}s  "
+              + "  ".join(f"Recall@{k}={recalls[-1][k]:.2f}" for k in ks))
         print(f"     A: {answer[:150]}\n")
 
     return {
-        "avg_latency":      round(sum(latencies) / len(latencies), 2),
-        "max_latency":      round(max(latencies), 2),
-        "avg_recall":       round(sum(recall_scores) / len(recall_scores), 3),
-        "avg_faithfulness": round(sum(faithfulness_scores) / len(faithfulness_scores), 4),
-        "n_queries":        len(queries),
+        "avg_latency":  round(sum(latencies) / len(latencies), 2),
+        "max_latency":  round(max(latencies), 2),
+        "avg_recall":   round(sum(r[top_k] for r in recalls) / len(recalls), 3),
+        "recall_at_k":  {str(k): round(sum(r[k] for r in recalls) / len(recalls), 3)
+                         for k in ks},
+        "n_queries":    len(queries),
         "per_query": [
             {
-                "question":     q["question"],
-                "latency":      round(latencies[i], 2),
-                "recall":       round(recall_scores[i], 3),
-                "faithfulness": round(faithfulness_scores[i], 4),
+                "question":    item["question"],
+                "answer":      answers[i],
+                "latency":     round(latencies[i], 2),
+                "recall":      round(recalls[i][top_k], 3),
+                "recall_at_k": {str(k): round(recalls[i][k], 3) for k in ks},
             }
-            for i, q in enumerate(queries)
+            for i, item in enumerate(queries)
         ],
     }
 
 
+def add_faithfulness(results: dict, chunks: dict, workers: int = None):
+    """ROUGE-L of every answer vs its top-5 chunks, scored in one process pool."""
+    keys, pairs = [], []
+    for modality, r in results.items():
+        for i, q in enumerate(r.get("per_query", [])):
+            keys.append((modality, i))
+            pairs.append((q["answer"], chunks[modality][i][:5]))
+
+    for (modality, i), score in zip(keys, faithfulness_scores(pairs, workers)):
+        results[modality]["per_query"][i]["faithfulness"] = score
+
+    for r in results.values():
+        if r.get("per_query"):
+            scores = [q["faithfulness"] for q in r["per_query"]]
+            r["avg_faithfulness"] = round(sum(scores) / len(scores), 4)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # MAIN
 # ─────────────────────────────────────────────────────────────────────────────
 
 def main():
-    top_k = 10
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modalities", nargs="+", choices=list(EVAL_SETS),
+                        default=list(EVAL_SETS))
+    parser.add_argument("--ks", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--top-k", type=int, default=10,
+                        help="k reported as avg_recall (added to --ks if missing)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="faithfulness scoring processes (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="re-extract docs even if the data is unchanged")
+    args = parser.parse_args()
+
+    top_k = args.top_k
+    ks = tuple(sorted(set(args.ks) | {top_k}))
     results = {}
 
     modalities_to_run = []
-    for modality, cfg in EVAL_SETS.items():
-        path = Path(cfg["data_path"])
+    for modality in args.modalities:
+        path = Path(EVAL_SETS[modality]["data_path"])
         if path.exists() and any(path.iterdir()):
             modalities_to_run.append(modality)
         else:
-            print(f"[SKIP] {modality} — no files found at {cfg['data_path']}")
+            print(f"[SKIP] {modality} — no files found at {EVAL_SETS[modality]['data_path']}")
 
     print(f"\n{'='*60}")
     print(f"  OmniRAG Evaluation — {len(modalities_to_run)} modalities")
     print(f"{'='*60}\n")
 
+    # ── 1. Extract ─────────────────────────────────────────────────
+    print("[1] Extracting documents …")
+    extracted = extract_all(modalities_to_run, use_cache=not args.no_cache)
+
+    # ── 2. Index — one pipeline, one set of models ─────────────────
+    print("[2] Building indexes …")
+    from src.rag_pipeline import RAGPipeline
+    pipeline = RAGPipeline()
+    indexes = {}
+
     for modality in modalities_to_run:
         cfg = EVAL_SETS[modality]
-        print(f"\n{'─'*50}")
-        print(f"  MODALITY: {modality.upper()}")
-        print(f"{'─'*50}")
-
-        print(f"[1] Ingesting {cfg['data_path']} …")
+        if isinstance(extracted[modality], Exception):
+            print(f"    ✗ {modality} ingestion failed: {extracted[modality]}")
+            results[modality] = {"error": str(extracted[modality])}
+            continue
+        docs, extract_time, cached = extracted[modality]
         try:
-            pipeline, ingest_time, doc_count, chunk_count = ingest_modality(
-                modality, cfg["data_path"]
+            indexes[modality], index_time, chunk_count = build_indexes(
+                pipeline, docs, cfg["data_path"]
             )
-            print(f"    → {doc_count} docs | {chunk_count} chunks | {ingest_time:.1f}s")
         except Exception as e:
-            print(f"    ✗ Ingestion failed: {e}")
+            print(f"    ✗ {modality} ingestion failed: {e}")
             results[modality] = {"error": str(e)}
             continue
+        # extraction time is the original run's when cached — comparable across runs
+        ingest_time = extract_time + index_time
+        print(f"    → {modality}: {len(docs)} docs | {chunk_count} chunks | "
+              f"{ingest_time:.1f}s{' (docs cached)' if cached else ''}")
+        results[modality] = {
+            "ingestion_time_s": round(ingest_time, 1),
+            "extraction_time_s": round(extract_time, 1),
+            "index_time_s":     round(index_time, 1),
+            "docs_cached":      cached,
+            "doc_count":        len(docs),
+            "chunk_count":      chunk_count,
+        }
+    del extracted
+    free_vram()
 
-        print(f"[2] Running {len(cfg['queries'])} queries …\n")
+    # ── 3. Retrieval — one embedding batch, one search per question ─
+    queries = {m: EVAL_SETS[m]["queries"] for m in indexes}
+    chunks = retrieve_chunks(pipeline, indexes, queries, max(ks))
+
+    # ── 4. Generate ────────────────────────────────────────────────
+    for modality in indexes:
+        print(f"\n{'─'*50}")
+        print(f"  MODALITY: {modality.upper()}")
+        print(f"{'─'*50}")
+        print(f"[3] Running {len(queries[modality])} queries …\n")
+        use_indexes(pipeline, indexes[modality])
         try:
-            metrics = evaluate_pipeline(pipeline, cfg["queries"], top_k=top_k)
+            results[modality].update(evaluate_pipeline(
+                pipeline, queries[modality], chunks[modality], ks, top_k=top_k
+            ))
         except Exception as e:
             print(f"    ✗ Query failed: {e}")
-            metrics = {"error": str(e)}
+            results[modality]["error"] = str(e)
 
-        results[modality] = {
-            "ingestion_time_s": round(ingest_time, 1),
-            "doc_count":        doc_count,
-            "chunk_count":      chunk_count,
-            **metrics,
-        }
+    del pipeline
+    free_vram()
 
-        del pipeline
-        free_vram()
+    # ── 5. Faithfulness (ROUGE-L answer vs context) ────────────────
+    print("[4] Scoring faithfulness …")
+    add_faithfulness(results, chunks, workers=args.workers)
 
     # ── Results table ──────────────────────────────────────────────
     print(f"\n\n{'='*70}")
@@ -351,4 +499,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,329 @@
+"""
+OmniRAG — API Load Test
+=======================
+Drives the real FastAPI app (python-api/main.py) in-process over ASGI — no
+server, no sockets. Uploads one file through POST /ingest, waits for the
+pipeline, then replays GET /query SSE streams from many concurrent users and
+reports p50 / p95 / p99 time-to-first-token, total latency, tokens/sec and
+error rate, plus the server-side stage timings carried by each stream.
+
+Load models:
+    closed  — `--concurrency` users, each sends its next question as soon as
+              the previous answer finishes (plus optional think time)
+    open    — Poisson arrivals at `--rate` req/s regardless of completions,
+              which is what exposes queueing
+
+--stub-generator swaps the LLM for the stub backend (fixed per-token delay),
+so the harness runs without a GPU or GGUF file.
+
+Usage:
+    python scripts/load_test.py --file data/raw/text/sample.txt --stub-generator
+    python scripts/load_test.py --file doc.pdf --mode open --rate 4 --duration 60
+    python scripts/load_test.py --file doc.pdf --concurrency 8 --questions questions.txt --json out.json
+"""
+
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from pathlib import Path
+from urllib.parse import urlencode
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "python-api"))
+
+import numpy as np
+
+DEFAULT_QUESTIONS = [
+    "What is this document about?",
+    "Summarize the main points.",
+    "What are the key findings?",
+    "Who is mentioned in the document?",
+    "What conclusions are drawn?",
+]
+
+
+# ──────────────────────────────────────────────────────────────────
+# ASGI CLIENT
+# ──────────────────────────────────────────────────────────────────
+
+async def asgi_request(app, method: str, path: str, params: dict = None,
+                       body: bytes = b"", headers: list = None, on_body=None) -> int:
+    """
+    One HTTP exchange against an ASGI app. Response body chunks are passed to
+    `on_body` as they are sent, so streamed responses can be timed per event.
+    Returns the status code.
+    """
+    query = urlencode(params or {})
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or [])],
+        "client": ("loadtest", 0),
+        "server": ("loadtest", 80),
+    }
+    finished = asyncio.Event()
+    request_sent = False
+    status = None
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # the client stays connected until the response is complete
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and on_body is not None:
+            on_body(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        finished.set()
+    return status
+
+
+async def get_json(app, path: str) -> dict:
+    chunks = []
+    await asgi_request(app, "GET", path, on_body=chunks.append)
+    return json.loads(b"".join(chunks) or b"{}")
+
+
+async def upload(app, file_path: Path) -> int:
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{file_path.name}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + file_path.read_bytes() + f"\r\n--{boundary}--\r\n".encode()
+    headers = [("content-type", f"multipart/form-data; boundary={boundary}"),
+               ("content-length", str(len(body)))]
+    return await asgi_request(app, "POST", "/ingest", body=body, headers=headers)
+
+
+# ──────────────────────────────────────────────────────────────────
+# ONE QUERY
+# ──────────────────────────────────────────────────────────────────
+
+async def run_query(app, question: str) -> dict:
+    """Replay one /query SSE stream; timestamps are taken as events arrive."""
+    record = {"question": question, "ttft": None, "tokens": 0, "error": None, "timings": None}
+    buffer = b""
+    start = time.perf_counter()
+
+    def on_body(chunk: bytes):
+        nonlocal buffer
+        buffer += chunk
+        while b"\n\n" in buffer:
+            event, buffer = buffer.split(b"\n\n", 1)
+            if not event.startswith(b"data: "):
+                continue
+            data = json.loads(event[6:])
+            if "token" in data:
+                if record["ttft"] is None:
+                    record["ttft"] = time.perf_counter() - start
+                record["tokens"] += 1
+            elif "error" in data:
+                record["error"] = data["error"]
+            elif "timings" in data:
+                record["timings"] = data["timings"]
+
+    try:
+        status = await asgi_request(app, "GET", "/query", params={"q": question},
+                                    on_body=on_body)
+        if status != 200 and record["error"] is None:
+            record["error"] = f"HTTP {status}"
+    except Exception as exc:
+        record["error"] = repr(exc)
+    record["latency"] = time.perf_counter() - start
+    return record
+
+
+# ──────────────────────────────────────────────────────────────────
+# LOAD MODELS
+# ──────────────────────────────────────────────────────────────────
+
+async def closed_loop(app, questions, weights, args, rng) -> list[dict]:
+    deadline = time.perf_counter() + args.duration
+    records = []
+    issued = 0
+
+    async def user():
+        nonlocal issued
+        while time.perf_counter() < deadline and issued < args.max_requests:
+            issued += 1
+            records.append(await run_query(app, rng.choices(questions, weights)[0]))
+            if args.think_time:
+                await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+    await asyncio.gather(*(user() for _ in range(args.concurrency)))
+    return records
+
+
+async def open_loop(app, questions, weights, args, rng) -> list[dict]:
+    deadline = time.perf_counter() + args.duration
+    tasks = []
+    while time.perf_counter() < deadline and len(tasks) < args.max_requests:
+        tasks.append(asyncio.ensure_future(run_query(app, rng.choices(questions, weights)[0])))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    return list(await asyncio.gather(*tasks))
+
+
+# ──────────────────────────────────────────────────────────────────
+# REPORT
+# ──────────────────────────────────────────────────────────────────
+
+def _pcts(values: list[float], scale: float = 1.0) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p = np.percentile(np.asarray(values) * scale, [50, 95, 99])
+    return {"p50": round(float(p[0]), 2), "p95": round(float(p[1]), 2), "p99": round(float(p[2]), 2)}
+
+
+def summarize(records: list[dict], wall_s: float) -> dict:
+    ok = [r for r in records if r["error"] is None]
+    tps = [r["tokens"] / (r["latency"] - r["ttft"]) for r in ok
+           if r["ttft"] is not None and r["tokens"] > 1 and r["latency"] > r["ttft"]]
+    stages = {}
+    for r in ok:
+        for stage, ms in (r["timings"] or {}).items():
+            stages.setdefault(stage, []).append(ms)
+    return {
+        "requests": len(records),
+        "errors": len(records) - len(ok),
+        "error_rate": round((len(records) - len(ok)) / len(records), 4) if records else 0.0,
+        "throughput_rps": round(len(records) / wall_s, 2) if wall_s else 0.0,
+        "ttft_ms": _pcts([r["ttft"] for r in ok if r["ttft"] is not None], 1000),
+        "latency_ms": _pcts([r["latency"] for r in ok], 1000),
+        "tokens_per_s": _pcts(tps),
+        "server_stages_ms": {k: _pcts(v) for k, v in sorted(stages.items())},
+    }
+
+
+def print_report(summary: dict):
+    print(f"\nRequests: {summary['requests']}   Errors: {summary['errors']} "
+          f"({summary['error_rate'] * 100:.1f}%)   Throughput: {summary['throughput_rps']} req/s\n")
+    print(f"{'Metric':<22} {'p50':>10} {'p95':>10} {'p99':>10}")
+    print("─" * 56)
+    rows = [("TTFT (ms)", summary["ttft_ms"]), ("Latency (ms)", summary["latency_ms"]),
+            ("Tokens/sec", summary["tokens_per_s"])]
+    rows += [(f"  {k} (ms)", v) for k, v in summary["server_stages_ms"].items()]
+    for name, p in rows:
+        cells = ["-" if p[q] is None else f"{p[q]:.1f}" for q in ("p50", "p95", "p99")]
+        print(f"{name:<22} {cells[0]:>10} {cells[1]:>10} {cells[2]:>10}")
+
+
+def load_questions(path: str) -> tuple[list[str], list[float]]:
+    """One question per line; an optional leading '<weight>\\t' sets its share of the mix."""
+    if path is None:
+        return DEFAULT_QUESTIONS, [1.0] * len(DEFAULT_QUESTIONS)
+    questions, weights = [], []
+    for line in Path(path).read_text().splitlines():
+        if not line.strip():
+            continue
+        weight, _, text = line.partition("\t")
+        try:
+            weights.append(float(weight))
+            questions.append(text.strip())
+        except ValueError:
+            weights.append(1.0)
+            questions.append(line.strip())
+    return questions, weights
+
+
+# ──────────────────────────────────────────────────────────────────
+# MAIN
+# ──────────────────────────────────────────────────────────────────
+
+async def run(args):
+    from main import app
+    from session import state
+
+    file_path = Path(args.file)
+    t0 = time.perf_counter()
+    status = await upload(app, file_path)
+    if status != 202:
+        raise SystemExit(f"[LoadTest] /ingest returned HTTP {status}")
+    while True:
+        s = await get_json(app, "/status")
+        if s.get("error"):
+            raise SystemExit(f"[LoadTest] Ingestion failed: {s['error']}")
+        if s.get("pipeline_ready") and not s.get("processing"):
+            break
+        await asyncio.sleep(0.5)
+    print(f"[LoadTest] Ingested {file_path.name} in {time.perf_counter() - t0:.1f}s")
+
+    pipeline = state["pipeline"]
+    if args.stub_generator:
+        pipeline.generator = None
+        pipeline._model_config = {
+            "backend": "stub",
+            "token_delay_ms": args.token_delay_ms,
+            "prompt_delay_ms": args.prompt_delay_ms,
+        }
+        pipeline.config["llm"]["max_new_tokens"] = args.max_new_tokens
+
+    questions, weights = load_questions(args.questions)
+    rng = random.Random(args.seed)
+
+    # warm-up: model loads and first-call costs stay out of the measurement
+    await run_query(app, questions[0])
+
+    print(f"[LoadTest] {args.mode}-loop for {args.duration}s — "
+          + (f"{args.concurrency} users" if args.mode == "closed" else f"{args.rate} req/s"))
+    t0 = time.perf_counter()
+    if args.mode == "closed":
+        records = await closed_loop(app, questions, weights, args, rng)
+    else:
+        records = await open_loop(app, questions, weights, args, rng)
+    wall = time.perf_counter() - t0
+
+    summary = summarize(records, wall)
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "summary": summary, "requests": records}, f, indent=2)
+        print(f"\n[LoadTest] Results → {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", required=True, help="File uploaded via POST /ingest")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=4, help="closed loop: users")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="closed loop: mean seconds between a user's requests")
+    parser.add_argument("--rate", type=float, default=2.0, help="open loop: arrivals / s")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--max-requests", type=int, default=10 ** 9)
+    parser.add_argument("--questions", help="question mix file ('[weight\\t]question' per line)")
+    parser.add_argument("--stub-generator", action="store_true",
+                        help="replace the LLM with the stub backend")
+    parser.add_argument("--token-delay-ms", type=float, default=20.0)
+    parser.add_argument("--prompt-delay-ms", type=float, default=100.0)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write summary + per-request records here")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,11 @@
 OmniRAG — Plot Results
 ======================
 Reads outputs/eval_results.json and saves 4 charts to outputs/plots/.
+With --benchmarks, charts benchmark runs (benchmarks/run.py) across commits.
 
 Usage:
     python scripts/plot_results.py
+    python scripts/plot_results.py --benchmarks outputs/benchmarks/*.json
 """
 
 import json
@@ -31,6 +33,42 @@ RESULTS_PATH = Path("outputs/eval_results.json")
 PLOTS_DIR    = Path("outputs/plots")
 PLOTS_DIR.mkdir(parents=True, exist_ok=True)
 
+# ── Benchmark trend mode ──────────────────────────────────────────────────────
+# python scripts/plot_results.py --benchmarks outputs/benchmarks/*.json
+# One panel per benchmark, one point per run (ordered by timestamp).
+if "--benchmarks" in sys.argv:
+    paths = sys.argv[sys.argv.index("--benchmarks") + 1:]
+    runs = []
+    for p in paths:
+        with open(p) as f:
+            runs.append(json.load(f))
+    runs.sort(key=lambda r: r["meta"]["timestamp"])
+    names = sorted({n for r in runs for n in r["results"]})
+    if not names:
+        print("No benchmark results found.")
+        sys.exit(1)
+
+    cols = 3
+    rows = (len(names) + cols - 1) // cols
+    fig, axes = plt.subplots(rows, cols, figsize=(5 * cols, 3 * rows), squeeze=False)
+    labels = [r["meta"]["commit"] for r in runs]
+    for ax, name in zip(axes.flat, names):
+        points = [(i, r["results"][name]) for i, r in enumerate(runs) if name in r["results"]]
+        ax.plot([i for i, _ in points], [v["value"] for _, v in points], marker="o")
+        unit = points[0][1]["unit"]
+        better = "↑" if points[0][1]["higher_is_better"] else "↓"
+        ax.set_title(f"{name}  ({unit}, {better} better)", fontsize=8)
+        ax.set_xticks(range(len(labels)))
+        ax.set_xticklabels(labels, rotation=45, fontsize=6)
+        ax.grid(True)
+    for ax in list(axes.flat)[len(names):]:
+        ax.axis("off")
+    fig.tight_layout()
+    out = PLOTS_DIR / "benchmarks.png"
+    fig.savefig(out, bbox_inches="tight", dpi=150)
+    print(f"  Saved → {out}")
+    sys.exit(0)
+
 # ── Load ──────────────────────────────────────────────────────────────────────
 with open(RESULTS_PATH) as f:
     data = json.load(f)
@@ -0,0 +1,41 @@
+"""
+OmniRAG — Frame Store Cleanup
+=============================
+Deletes keyframe JPEG shards under outputs/frame_store that no persisted
+image index references any more (re-ingested or deleted videos), plus temp
+files left by aborted ingests.
+
+Usage:
+    python scripts/prune_frame_store.py --dry-run
+    python scripts/prune_frame_store.py --min-age-hours 24
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.frame_store import prune_shards
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frame-dir", default="outputs/frame_store")
+    parser.add_argument("--index-root", default="outputs/indexes")
+    parser.add_argument("--min-age-hours", type=float, default=1.0,
+                        help="keep files younger than this — an ingest may still be running")
+    parser.add_argument("--dry-run", action="store_true", help="list, don't delete")
+    args = parser.parse_args()
+
+    removed = prune_shards(args.frame_dir, args.index_root,
+                           min_age_s=args.min_age_hours * 3600, dry_run=args.dry_run)
+    for path in removed:
+        print(f"  {path}")
+    verb = "Would remove" if args.dry_run else "Removed"
+    print(f"[prune_frame_store] {verb} {len(removed)} unreferenced shard file(s).")
+
+
+if __name__ == "__main__":
+    main()
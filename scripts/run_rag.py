@@ -58,13 +58,13 @@ def main():
 
         # Step 1 — Whisper transcription on CPU to preserve VRAM
         processor = VideoProcessor(keyframe_interval=2, device="cuda")
-        transcript_docs, keyframe_images, keyframe_sources = processor.process(path)
+        transcript_docs, keyframe_refs, keyframe_sources = processor.process(path)
         processor.unload()
         print("[INFO] Whisper unloaded, VRAM freed.")
 
         # Step 2 — Qwen2-VL keyframe captioning
         captioner = VideoCaptioner()
-        keyframe_docs = captioner.caption_frames(keyframe_images, keyframe_sources)
+        keyframe_docs = captioner.caption_frames(keyframe_refs, keyframe_sources)
         captioner.unload()
         print("[INFO] Qwen2-VL unloaded, VRAM freed.")
 
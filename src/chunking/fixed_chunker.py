@@ -1,5 +1,5 @@
 from typing import List
-from transformers import AutoTokenizer
+from src.utils.token_utils import get_tokenizer
 
 
 class FixedChunker:
@@ -9,18 +9,17 @@ class FixedChunker:
         overlap: int,
         tokenizer_name: str = "sentence-transformers/all-MiniLM-L6-v2",
         max_tokens: int = 512,
+        tokenizer=None,
     ):
         self.chunk_size = chunk_size          # target tokens per chunk
         self.overlap = overlap                # token overlap
         self.max_tokens = max_tokens
 
-        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+        # shared per model via the tokenizer registry
+        self.tokenizer = tokenizer or get_tokenizer(tokenizer_name)
 
     def chunk(self, text: str) -> List[str]:
-        tokens = self.tokenizer.encode(
-            text,
-            add_special_tokens=False
-        )
+        tokens = self.tokenizer.encode(text)
 
         chunks = []
         start = 0
@@ -1,11 +1,12 @@
 from typing import List
-from transformers import AutoTokenizer
 from src.schema import Document
+from src.utils.token_utils import get_tokenizer
 import re
 
 class TokenChunker:
-    def __init__(self, model_name: str, max_tokens: int, overlap: int = 50):
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+    def __init__(self, model_name: str, max_tokens: int, overlap: int = 50, tokenizer=None):
+        # shared per model via the tokenizer registry
+        self.tokenizer = tokenizer or get_tokenizer(model_name)
         self.max_tokens = max_tokens
         self.overlap = overlap
 
@@ -13,7 +14,7 @@ class TokenChunker:
         all_chunks = []
         for doc in docs:
             text_chunks = self._chunk_text(doc.text)
-            for chunk_text in text_chunks:
+            for chunk_text, n_overlap in text_chunks:
                 all_chunks.append(Document(
                     text=chunk_text,
                     source=doc.source,
@@ -21,33 +22,38 @@ class TokenChunker:
                     section=doc.section,
                     page=doc.page,
                     timestamp=doc.timestamp,
-                    metadata=dict(doc.metadata)
+                    # leading tokens repeated from the previous chunk
+                    metadata={**doc.metadata, "overlap_tokens": n_overlap}
                 ))
         return all_chunks
 
-    def _chunk_text(self, text: str) -> List[str]:
+    def _chunk_text(self, text: str) -> List[tuple]:
+        """(chunk text, number of leading tokens shared with the previous chunk)."""
         paragraphs = re.split(r'(?<=[.!?])\s+', text)
         paragraphs = [p.strip() for p in paragraphs if p.strip()]
         chunks = []
         current_tokens = []
         current_len = 0
-        for para in paragraphs:
-            para_tokens = self.tokenizer.encode(para, add_special_tokens=False)
+        current_overlap = 0
+        # one batched encode per document instead of one call per sentence
+        for para_tokens in self.tokenizer.encode_batch(paragraphs):
             if len(para_tokens) > self.max_tokens:
                 for i in range(0, len(para_tokens), self.max_tokens):
                     sub = para_tokens[i:i + self.max_tokens]
-                    chunks.append(self.tokenizer.decode(sub, skip_special_tokens=True))
+                    chunks.append((self.tokenizer.decode(sub), 0))
                 current_tokens = []
                 current_len = 0
+                current_overlap = 0
                 continue
             if current_len + len(para_tokens) > self.max_tokens:
-                chunks.append(self.tokenizer.decode(current_tokens, skip_special_tokens=True))
+                chunks.append((self.tokenizer.decode(current_tokens), current_overlap))
                 overlap_tokens = current_tokens[-self.overlap:] if self.overlap > 0 else []
                 current_tokens = overlap_tokens + para_tokens
                 current_len = len(current_tokens)
+                current_overlap = len(overlap_tokens)
             else:
                 current_tokens.extend(para_tokens)
                 current_len += len(para_tokens)
         if current_tokens:
-            chunks.append(self.tokenizer.decode(current_tokens, skip_special_tokens=True))
+            chunks.append((self.tokenizer.decode(current_tokens), current_overlap))
         return chunks
\ No newline at end of file
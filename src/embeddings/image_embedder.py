@@ -1,11 +1,18 @@
+import os
 import torch
 import open_clip
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 import numpy as np
+from src.utils.frame_store import FrameRef
 
 class ImageEmbedder:
-    def __init__(self, model_name: str = "ViT-B-32", pretrained: str = "openai", device: str = "cuda"):
+    def __init__(self, model_name: str = "ViT-B-32", pretrained: str = "openai", device: str = "cuda",
+                 batch_size: int = 64, num_workers: int = None):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.batch_size = batch_size
+        # PIL decode + resize release the GIL, so threads scale here
+        self.num_workers = num_workers or min(8, os.cpu_count() or 1)
         print(f"[ImageEmbedder] Loading CLIP on {self.device}")
         self.model, _, self.preprocess = open_clip.create_model_and_transforms(
             model_name, pretrained=pretrained, device=self.device
@@ -15,22 +22,40 @@ class ImageEmbedder:
 
     def encode_images(self, image_paths: list[str]) -> np.ndarray:
         """Encode from file paths — used by Phase 4a (image files)"""
-        vectors = []
-        for path in image_paths:
-            img = Image.open(path).convert("RGB")
-            vectors.append(self._encode_pil(img))
-        return np.vstack(vectors).astype("float32")
+        return self._encode_batched(
+            image_paths, lambda p: self.preprocess(Image.open(p).convert("RGB"))
+        )
 
     def encode_pil_images(self, pil_images: list) -> np.ndarray:
-        """Encode from PIL images directly — used by Phase 4c (video keyframes)"""
-        vectors = [self._encode_pil(img) for img in pil_images]
+        """
+        Encode from PIL images directly — used by Phase 4c (video keyframes).
+        FrameRefs are accepted too and decoded inside the worker threads, so at
+        most one batch of frames is in memory at a time.
+        """
+        return self._encode_batched(
+            pil_images,
+            lambda img: self.preprocess(img.load() if isinstance(img, FrameRef) else img),
+        )
+
+    def _encode_batched(self, items: list, prepare) -> np.ndarray:
+        """
+        Preprocess `items` in a thread pool, stack into batches of
+        self.batch_size and run one CLIP forward pass per batch.
+        """
+        if not items:
+            return np.zeros((0, self.model.visual.output_dim), dtype="float32")
+
+        vectors = []
+        with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+            for start in range(0, len(items), self.batch_size):
+                # pool.map keeps input order
+                tensors = list(pool.map(prepare, items[start:start + self.batch_size]))
+                vectors.append(self._forward(torch.stack(tensors)))
         return np.vstack(vectors).astype("float32")
 
-    def _encode_pil(self, img: Image.Image) -> np.ndarray:
-        """Shared internal encoding logic"""
-        tensor = self.preprocess(img).unsqueeze(0).to(self.device)
-        with torch.no_grad():
-            vec = self.model.encode_image(tensor)
+    def _forward(self, batch: torch.Tensor) -> np.ndarray:
+        with torch.inference_mode():
+            vec = self.model.encode_image(batch.to(self.device))
             vec = vec / vec.norm(dim=-1, keepdim=True)
         return vec.cpu().numpy()
 
@@ -40,4 +65,15 @@ class ImageEmbedder:
         with torch.no_grad():
             vec = self.model.encode_text(tokens)
             vec = vec / vec.norm(dim=-1, keepdim=True)
-        return vec.cpu().numpy().astype("float32")
\ No newline at end of file
+        return vec.cpu().numpy().astype("float32")
+
+    def encode_texts(self, texts: list[str]) -> np.ndarray:
+        """Batched encode_text — used to fit score calibration from captions"""
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            tokens = self.tokenizer(texts[start:start + self.batch_size]).to(self.device)
+            with torch.inference_mode():
+                vec = self.model.encode_text(tokens)
+                vec = vec / vec.norm(dim=-1, keepdim=True)
+            vectors.append(vec.cpu().numpy())
+        return np.vstack(vectors).astype("float32")
@@ -1,9 +1,9 @@
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
 
 class TextEmbedder:
     def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
         self.model = SentenceTransformer(model_name)
 
     def embed(self, texts: list[str]) -> np.ndarray:
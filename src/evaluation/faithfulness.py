@@ -1,5 +1,16 @@
+from concurrent.futures import ProcessPoolExecutor
 from rouge_score import rouge_scorer as rs
 
+# one scorer per process — building it (tokenizer + stemmer) dominates a single score
+_SCORER = None
+
+
+def _get_scorer() -> rs.RougeScorer:
+    global _SCORER
+    if _SCORER is None:
+        _SCORER = rs.RougeScorer(["rougeL"], use_stemmer=True)
+    return _SCORER
+
 
 def faithfulness_score(answer: str, contexts: list[str]) -> float:
     """
@@ -11,7 +22,21 @@ def faithfulness_score(answer: str, contexts: list[str]) -> float:
     if not answer.strip() or not contexts:
         return 0.0
 
-    scorer = rs.RougeScorer(["rougeL"], use_stemmer=True)
     combined_context = " ".join(contexts)
-    score = scorer.score(combined_context, answer)
-    return round(score["rougeL"].fmeasure, 4)
\ No newline at end of file
+    score = _get_scorer().score(combined_context, answer)
+    return round(score["rougeL"].fmeasure, 4)
+
+
+def _score_pair(pair: tuple[str, list[str]]) -> float:
+    return faithfulness_score(*pair)
+
+
+def faithfulness_scores(pairs: list[tuple[str, list[str]]], workers: int = None) -> list[float]:
+    """
+    Score many (answer, contexts) pairs in a process pool — ROUGE-L LCS is pure
+    Python and CPU-bound. workers=1 (or a single pair) scores in-process.
+    """
+    if workers == 1 or len(pairs) <= 1:
+        return [_score_pair(p) for p in pairs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_score_pair, pairs, chunksize=max(1, len(pairs) // 32)))
@@ -2,9 +2,9 @@ import time
 
 
 def measure_latency(func, *args, **kwargs):
-    start = time.time()
+    start = time.perf_counter()
     result = func(*args, **kwargs)
-    end = time.time()
+    end = time.perf_counter()
 
     latency = end - start
     return result, latency
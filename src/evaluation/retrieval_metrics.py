@@ -15,3 +15,24 @@ def recall_at_k(retrieved_chunks, relevant_phrases, k):
         return 0.0
 
     return hits / len(relevant_phrases)
+
+
+def recall_at_ks(retrieved_chunks, relevant_phrases, ks):
+    """
+    Recall@k for several k from one ranked list: each phrase's first hit rank
+    is found once, then recall@k = share of phrases first hit within the top k.
+    Returns {k: recall}.
+    """
+    if not relevant_phrases:
+        return {k: 0.0 for k in ks}
+
+    lowered = [chunk.lower() for chunk in retrieved_chunks[:max(ks)]]
+    first_hit = []
+    for phrase in relevant_phrases:
+        phrase = phrase.lower()
+        first_hit.append(next((i for i, c in enumerate(lowered) if phrase in c), None))
+
+    return {
+        k: sum(1 for r in first_hit if r is not None and r < k) / len(relevant_phrases)
+        for k in ks
+    }
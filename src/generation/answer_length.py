@@ -0,0 +1,42 @@
+import re
+
+# Output-token caps per question type — overridden by llm.answer_length in
+# config.yaml. A yes/no answer never needs the 512 tokens an explanation may.
+DEFAULT_ANSWER_LENGTH = {
+    "yes_no":  96,
+    "factoid": 192,
+    "list":    320,
+    "explain": 512,
+}
+
+_QUANTITY = re.compile(r"\bhow (many|much|long|old|far|often)\b", re.I)
+_EXPLAIN = re.compile(
+    r"\b(explain|describe|summari[sz]e|summary|overview|compare|comparison|"
+    r"difference|differences|discuss|why|how)\b", re.I)
+_LIST = re.compile(
+    r"\b(list|enumerate|name (the|all|some)|what are|which \w+ are|steps|examples|types of)\b", re.I)
+_YES_NO = re.compile(
+    r"^\s*(is|are|was|were|does|do|did|can|could|has|have|had|will|would|should)\b", re.I)
+_FACTOID = re.compile(r"^\s*(who|whom|whose|when|where|what|which)\b", re.I)
+
+
+def classify_question(question: str) -> str:
+    """yes_no | factoid | list | explain — unknown shapes get the full budget."""
+    if _QUANTITY.search(question):
+        return "factoid"
+    if _EXPLAIN.search(question):
+        return "explain"
+    if _LIST.search(question):
+        return "list"
+    if _YES_NO.match(question):
+        return "yes_no"
+    if _FACTOID.match(question):
+        return "factoid"
+    return "explain"
+
+
+def answer_length(question: str, hints: dict = None) -> tuple[str, int]:
+    """(question type, max_new_tokens hint) for a question."""
+    hints = {**DEFAULT_ANSWER_LENGTH, **(hints or {})}
+    kind = classify_question(question)
+    return kind, hints[kind]
@@ -1,7 +1,41 @@
 # src/generation/generator.py
 
+import time
 from pathlib import Path
 from urllib import response
+from src.utils.tracing import current_trace
+from src.utils.metrics import GENERATION_FINISHED, GENERATION_MAX_NEW_TOKENS
+
+STOP_SEQUENCES = ["<|end|>", "<|user|>", "<|system|>", "\nQuestion:", "\nContext:"]
+
+
+def _cut_at_stop(tokens, stops: list[str], finish: dict):
+    """
+    Passes streamed text through until a stop sequence appears, then ends —
+    closing `tokens`, which stops the backend. Only a tail that could still
+    grow into a stop sequence is held back, so normal tokens stream unchanged.
+    """
+    buffer = ""
+    try:
+        for token in tokens:
+            buffer += token
+            hits = [i for i in (buffer.find(s) for s in stops) if i != -1]
+            if hits:
+                if min(hits):
+                    yield buffer[:min(hits)]
+                finish["reason"] = "stop"
+                return
+            held = max((n for s in stops for n in range(1, len(s))
+                        if buffer.endswith(s[:n])), default=0)
+            if len(buffer) > held:
+                yield buffer[:len(buffer) - held]
+                buffer = buffer[len(buffer) - held:]
+        if buffer:
+            yield buffer
+        if finish["reason"] == "cancelled":
+            finish["reason"] = "stop"     # ran to the end without a reason from the backend
+    finally:
+        tokens.close()
 
 
 class Generator:
@@ -13,8 +47,10 @@ class Generator:
 
         if self.backend == "llamacpp":
             self._init_llamacpp(model_config)
+        elif self.backend == "stub":
+            self._init_stub(model_config)
         else:
-            self._init_huggingface(model_config.get("model_name", "google/flan-t5-base"))
+            self._init_huggingface(model_config)
 
     # ------------------------------------------------------------------
     # INIT
@@ -32,99 +68,227 @@ class Generator:
                 f"Or switch models.yaml backend to 'huggingface' to use flan-t5."
             )
 
+        self.n_ctx = model_config.get("n_ctx", 4096)
         self.llm = Llama(
             model_path=model_path,
-            n_ctx=model_config.get("n_ctx", 4096),
+            n_ctx=self.n_ctx,
             n_threads=model_config.get("n_threads", 4),
             n_gpu_layers=model_config.get("n_gpu_layers", 32), 
             verbose=False,
         )
         print(f"[INFO] Loaded GGUF model: {model_path}")
 
-    def _init_huggingface(self, model_name: str):
+    def _init_stub(self, model_config: dict):
+        """
+        No model at all: streams max_new_tokens filler tokens with a fixed
+        per-token delay. For load tests without a GPU or GGUF file.
+        """
+        self.prompt_delay = model_config.get("prompt_delay_ms", 0) / 1000
+        self.token_delay = model_config.get("token_delay_ms", 20) / 1000
+        print(f"[INFO] Stub generator: {self.token_delay * 1000:.0f} ms/token")
+
+    def _init_huggingface(self, model_config: dict):
+        """
+        CPU fallback. dtype: float32 | bfloat16 weights; int8: dynamic int8
+        quantization of the Linear layers (CPU only, loaded as float32 first).
+        n_ctx is the encoder window for T5, prompt + answer otherwise.
+        """
         import torch
         from transformers import (
-            AutoTokenizer,
             AutoModelForSeq2SeqLM,
             AutoModelForCausalLM,
         )
+        from src.utils.token_utils import get_tokenizer
 
-        self.hf_tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.hf_tokenizer.model_max_length = 512
+        model_name = model_config.get("model_name", "google/flan-t5-base")
+        int8 = model_config.get("int8", False)
+        dtype = "float32" if int8 else model_config.get("dtype", "float32")
+        self.device = "cpu" if int8 else model_config.get("device", "cpu")
+        self.n_ctx = model_config.get("n_ctx", 4096)
+        if self.device == "cpu":
+            torch.set_num_threads(model_config.get("n_threads", 4))
 
-        if "t5" in model_name.lower():
-            self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-            self.is_seq2seq = True
-        else:
-            self.model = AutoModelForCausalLM.from_pretrained(model_name)
-            self.is_seq2seq = False
+        # same instance the prompt budget counts with
+        self.hf_tokenizer = get_tokenizer(model_name).tokenizer
 
+        model_cls = AutoModelForSeq2SeqLM if "t5" in model_name.lower() else AutoModelForCausalLM
+        self.is_seq2seq = model_cls is AutoModelForSeq2SeqLM
+        self.model = model_cls.from_pretrained(model_name, torch_dtype=getattr(torch, dtype))
+        if int8:
+            self.model = torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        self.model.to(self.device)
         self.model.eval()
-        print(f"[INFO] Loaded HuggingFace model: {model_name}")
+        print(f"[INFO] Loaded HuggingFace model: {model_name} "
+              f"({'int8' if int8 else dtype}, {self.device})")
 
     # ------------------------------------------------------------------
     # GENERATE
     # ------------------------------------------------------------------
 
-    def generate(self, prompt: str) -> str:
+    def max_tokens_for(self, prompt: str, max_new_tokens: int = None) -> int:
+        """
+        Output-token cap for one request: the requested cap (or the configured
+        max_new_tokens), never more than what is left of n_ctx after the prompt.
+        """
+        cap = max_new_tokens or self.max_new_tokens
+        if self.backend == "llamacpp":
+            prompt_tokens = len(self.llm.tokenize(prompt.encode("utf-8"), special=True))
+            remaining = self.n_ctx - prompt_tokens
+            if remaining <= 0:
+                raise ValueError(
+                    f"Prompt is {prompt_tokens} tokens — no room left in the "
+                    f"{self.n_ctx}-token context window."
+                )
+            cap = min(cap, remaining)
+        elif self.backend == "huggingface" and not self.is_seq2seq:
+            # decoder-only: prompt and answer share n_ctx
+            remaining = self.n_ctx - len(self.hf_tokenizer.encode(prompt))
+            if remaining <= 0:
+                raise ValueError(f"Prompt leaves no room in the {self.n_ctx}-token window.")
+            cap = min(cap, remaining)
+        return cap
+
+    def generate(self, prompt: str, max_new_tokens: int = None) -> str:
         if self.backend == "llamacpp":
-            return self._generate_llamacpp(prompt)
-        else:
-            return self._generate_huggingface(prompt)
-        
-    def generate_stream(self, prompt: str):
+            max_tokens = self.max_tokens_for(prompt, max_new_tokens)
+            GENERATION_MAX_NEW_TOKENS.observe(max_tokens)
+            return self._generate_llamacpp(prompt, max_tokens)
+        # stub / huggingface: the streaming path, joined
+        return "".join(self.generate_stream(prompt, max_new_tokens)).strip()
+
+    def generate_stream(self, prompt: str, max_new_tokens: int = None):
         """
-        Yields string tokens one by one.
-        Uses llama-cpp-python's built-in stream=True support.
+        Yields string tokens one by one — llama-cpp-python's stream=True, or a
+        HuggingFace TextIteratorStreamer fed by generate() on a worker thread.
+        Output stops at the first stop sequence, and closing this generator
+        (client gone) stops decoding at once rather than draining the stream.
+        Under an active trace, records prompt_eval (call → first token),
+        decode (first → last token) and the generated token count.
         """
+        trace = current_trace()
+        start = time.perf_counter()
+        first = None
+        max_tokens = self.max_tokens_for(prompt, max_new_tokens)
+        GENERATION_MAX_NEW_TOKENS.observe(max_tokens)
+        # set by the backend stream / stop filter; "cancelled" if closed early
+        finish = {"reason": "cancelled"}
+        if self.backend == "llamacpp":
+            tokens = self._stream_llamacpp(prompt, max_tokens, finish)
+        elif self.backend == "stub":
+            tokens = self._stream_stub(prompt, max_tokens, finish)
+        else:
+            tokens = self._stream_huggingface(prompt, max_tokens, finish)
+        stream = _cut_at_stop(tokens, STOP_SEQUENCES, finish)
+        try:
+            for token in stream:
+                if token:
+                    if trace is not None:
+                        if first is None:
+                            first = time.perf_counter()
+                            trace.add("prompt_eval", start, first)
+                        trace.count("tokens")
+                    yield token
+        finally:
+            stream.close()      # closes the backend stream too — decoding stops here
+            GENERATION_FINISHED.inc(reason=finish["reason"])
+            if trace is not None and first is not None:
+                trace.add("decode", first, time.perf_counter())
+
+    def _stream_llamacpp(self, prompt: str, max_tokens: int, finish: dict):
         stream = self.llm(
             prompt,
-            max_tokens=self.max_new_tokens,
+            max_tokens=max_tokens,
             temperature=0.2,
             repeat_penalty=1.1,
             echo=False,
-            stop=["<|end|>", "<|user|>", "<|system|>", "\nQuestion:", "\nContext:"],
+            stop=STOP_SEQUENCES,
             stream=True,
         )
         for chunk in stream:
-            token = chunk["choices"][0]["text"]
-            if token:
-                yield token
+            choice = chunk["choices"][0]
+            if choice.get("finish_reason"):
+                finish["reason"] = choice["finish_reason"]
+            yield choice["text"]
 
-    def _generate_llamacpp(self, prompt: str) -> str:
+    def _stream_stub(self, prompt: str, max_tokens: int, finish: dict):
+        time.sleep(self.prompt_delay)
+        for i in range(max_tokens):
+            time.sleep(self.token_delay)
+            yield f" tok{i}"
+        finish["reason"] = "length"
+
+    def _generate_llamacpp(self, prompt: str, max_tokens: int) -> str:
         response = self.llm(
             prompt,
-            max_tokens=self.max_new_tokens,
+            max_tokens=max_tokens,
             temperature=self.temperature,
             repeat_penalty=1.1,
-            stop=["<|end|>", "<|user|>", "<|system|>", "\nQuestion:", "\nContext:"],
+            stop=STOP_SEQUENCES,
             echo=False,
         )
+        GENERATION_FINISHED.inc(reason=response["choices"][0].get("finish_reason") or "stop")
         return response["choices"][0]["text"].strip()
 
-    def _generate_huggingface(self, prompt: str) -> str:
+    def _stream_huggingface(self, prompt: str, max_tokens: int, finish: dict):
+        """
+        model.generate() runs on a worker thread (KV cache on, inference_mode)
+        and pushes decoded text into a TextIteratorStreamer that this generator
+        drains. Closing it early stops generate() via a StoppingCriteria.
+        """
+        import threading
         import torch
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
 
-        inputs = self.hf_tokenizer(
-            prompt,
-            return_tensors="pt",
-            truncation=True,
-            max_length=512,
+        ids = self.hf_tokenizer(prompt, return_tensors="pt")["input_ids"]
+        if ids.shape[-1] > self.n_ctx:
+            # the budget should prevent this — keep the tail, where the question is
+            print(f"[Generator] Prompt is {ids.shape[-1]} tokens; keeping the last {self.n_ctx}.")
+            ids = ids[:, -self.n_ctx:]
+        ids = ids.to(self.device)
+
+        cancel = threading.Event()
+
+        class _Cancelled(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return cancel.is_set()
+
+        streamer = TextIteratorStreamer(
+            self.hf_tokenizer, skip_prompt=not self.is_seq2seq, skip_special_tokens=True
+        )
+        kwargs = dict(
+            input_ids=ids,
+            attention_mask=torch.ones_like(ids),
+            max_new_tokens=max_tokens,
+            use_cache=True,
+            streamer=streamer,
+            stopping_criteria=StoppingCriteriaList([_Cancelled()]),
         )
+        if not self.is_seq2seq:
+            kwargs.update(do_sample=self.temperature > 0, temperature=self.temperature or None,
+                          pad_token_id=self.hf_tokenizer.eos_token_id)
 
-        with torch.no_grad():
-            if self.is_seq2seq:
-                outputs = self.model.generate(
-                    **inputs,
-                    max_new_tokens=self.max_new_tokens,
-                )
-            else:
-                outputs = self.model.generate(
-                    **inputs,
-                    max_new_tokens=self.max_new_tokens,
-                    temperature=self.temperature,
-                    do_sample=True,
-                    pad_token_id=self.hf_tokenizer.eos_token_id,
-                )
+        outcome = {}
+
+        def _run():
+            try:
+                # inference_mode is thread-local — it has to be entered here
+                with torch.inference_mode():
+                    out = self.model.generate(**kwargs)
+                # seq2seq output starts with the decoder start token
+                outcome["new_tokens"] = out.shape[-1] - (1 if self.is_seq2seq else ids.shape[-1])
+            except Exception as exc:
+                outcome["error"] = exc
+                streamer.end()      # unblock the consumer
 
-        return self.hf_tokenizer.decode(outputs[0], skip_special_tokens=True)
\ No newline at end of file
+        worker = threading.Thread(target=_run, daemon=True)
+        worker.start()
+        try:
+            yield from streamer
+        finally:
+            cancel.set()
+            worker.join()
+        if "error" in outcome:
+            raise outcome["error"]
+        finish["reason"] = "length" if outcome["new_tokens"] >= max_tokens else "stop"
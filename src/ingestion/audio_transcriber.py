@@ -1,11 +1,106 @@
 # src/ingestion/audio_transcriber.py
 import os
+import time
 import whisper
+import numpy as np
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from src.schema import Document
+from src.utils.metrics import track_model_load, track_model_unload
 
 
 SUPPORTED_EXTENSIONS = {".mp3", ".wav", ".m4a", ".flac", ".ogg", ".opus", ".webm"}
+SAMPLE_RATE = 16000
+
+
+# ----------------------------------------------------------------------
+# LONG-FORM: energy VAD windowing + CPU worker pool
+# ----------------------------------------------------------------------
+
+def split_on_silence(
+    audio: np.ndarray,
+    sr: int = SAMPLE_RATE,
+    target_window_s: float = 60.0,
+    max_window_s: float = 90.0,
+    frame_ms: int = 30,
+    silence_db: float = -35.0,
+) -> list[tuple[int, int]]:
+    """
+    Energy-based VAD split of a mono waveform into (start, end) sample ranges.
+
+    Each window is cut at the quietest frame between target_window_s and
+    max_window_s, preferring frames below `silence_db` relative to the loudest
+    frame — so cuts land in pauses, never mid-word when a pause exists.
+    Windows are contiguous and cover the whole waveform.
+    """
+    n = audio.shape[0]
+    if n == 0:
+        return []
+
+    hop = max(1, int(sr * frame_ms / 1000))
+    n_frames = n // hop
+    if n_frames == 0 or n <= int(max_window_s * sr):
+        return [(0, n)]
+
+    frames = audio[:n_frames * hop].reshape(n_frames, hop)
+    rms = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1)) + 1e-10
+    db = 20 * np.log10(rms / rms.max())
+
+    target = int(target_window_s * 1000 / frame_ms)
+    longest = int(max_window_s * 1000 / frame_ms)
+
+    windows = []
+    start_f = 0
+    while start_f + longest < n_frames:
+        lo, hi = start_f + target, start_f + longest
+        region = db[lo:hi]
+        silent = np.flatnonzero(region < silence_db)
+        # first silent frame after the target length, else the quietest one
+        cut = lo + (int(silent[0]) if silent.size else int(np.argmin(region)))
+        windows.append((start_f * hop, cut * hop))
+        start_f = cut
+    windows.append((start_f * hop, n))
+    return windows
+
+
+_worker_model = None
+
+
+def _init_worker(model_size: str, threads: int):
+    """Process-pool initializer: one CPU Whisper per worker, no thread oversubscription."""
+    global _worker_model
+    import torch
+    torch.set_num_threads(threads)
+    _worker_model = whisper.load_model(model_size, device="cpu")
+
+
+def _transcribe_window(audio: np.ndarray) -> dict:
+    return _worker_model.transcribe(audio, verbose=False, fp16=False)
+
+
+def _warm(_) -> int:
+    # held briefly so every submit spawns (and initializes) its own worker
+    time.sleep(0.5)
+    return os.getpid()
+
+
+def transcription_pool(model_size: str, workers: int, warm: bool = False) -> ProcessPoolExecutor:
+    """
+    Spawned CPU worker pool, one Whisper per process. warm=True blocks until
+    every worker has loaded its model, so callers can time transcription alone.
+    """
+    threads = max(1, (os.cpu_count() or workers) // workers)
+    # spawn: forking a process that holds torch/CUDA state is unsafe
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_size, threads),
+    )
+    if warm:
+        list(pool.map(_warm, range(workers)))
+    return pool
 
 
 class AudioTranscriber:
@@ -18,15 +113,21 @@ class AudioTranscriber:
     def __init__(self, model_size: str = "small", device: str = "cuda"):
         print(f"[AudioTranscriber] Loading Whisper '{model_size}' on {device}...")
         self.device = device
-        self.model = whisper.load_model(model_size, device=device)
+        self.model_size = model_size
+        self.last_stats = {}
+        with track_model_load("whisper"):
+            self.model = whisper.load_model(model_size, device=device)
         print("[AudioTranscriber] Whisper loaded.")
 
-    def transcribe(self, directory: str) -> list:
+    def transcribe(self, directory: str, long_form: bool = False, workers: int = None) -> list:
         """
         Transcribes all supported audio files found in `directory`.
 
         Args:
             directory: Path to a folder containing one or more audio files.
+            long_form: Split each file at silences and transcribe the windows
+                       in parallel CPU worker processes (see transcribe_long).
+            workers:   Worker process count for long_form (default: CPU count).
 
         Returns:
             List of Document objects, one per Whisper segment.
@@ -43,6 +144,11 @@ class AudioTranscriber:
         documents = []
 
         for audio_path in audio_files:
+            if long_form:
+                audio = whisper.load_audio(str(audio_path))
+                documents.extend(self.transcribe_long(audio, str(audio_path), workers=workers))
+                continue
+
             print(f"[AudioTranscriber] Transcribing: {audio_path.name}")
             result = self.model.transcribe(str(audio_path), verbose=False)
 
@@ -87,6 +193,93 @@ class AudioTranscriber:
 
         print(f"[AudioTranscriber] Transcribing file: {audio_path.name}")
         result = self.model.transcribe(str(audio_path), verbose=False)
+        documents = self._result_to_documents(result, str(audio_path))
+        print(f"[AudioTranscriber] Total documents produced: {len(documents)}")
+        return documents
+
+    def transcribe_array(self, audio: np.ndarray, source: str) -> list:
+        """
+        Transcribes an in-memory 16 kHz mono float32 waveform (e.g. decoded
+        straight from ffmpeg stdout) — no intermediate WAV file on disk.
+        """
+        if audio.size == 0:
+            print(f"[AudioTranscriber] No audio samples for '{source}', skipping.")
+            return []
+
+        print(f"[AudioTranscriber] Transcribing {audio.size / 16000:.1f}s of audio from '{source}'")
+        result = self.model.transcribe(audio.astype(np.float32, copy=False), verbose=False)
+        documents = self._result_to_documents(result, source)
+        print(f"[AudioTranscriber] Total documents produced: {len(documents)}")
+        return documents
+
+    def transcribe_long(
+        self,
+        audio: np.ndarray,
+        source: str,
+        workers: int = None,
+        target_window_s: float = 60.0,
+        max_window_s: float = 90.0,
+        pool: ProcessPoolExecutor = None,
+    ) -> list:
+        """
+        Long-form mode: VAD-split `audio` into silence-bounded windows,
+        transcribe them in parallel CPU worker processes, then stitch the
+        segments back with each window's offset added to start_time.
+
+        workers=1 runs the windows sequentially on self.model (no pool).
+        `pool` (see transcription_pool, sized `workers`) reuses caller-owned,
+        already-loaded workers instead of spawning new ones.
+
+        last_stats reports what stitching had to repair: `clamped` segments
+        whose raw offset + start ran backwards, and `seam_overruns` — windows
+        whose last segment ends past the next window's offset.
+        """
+        windows = split_on_silence(audio, SAMPLE_RATE, target_window_s, max_window_s)
+        if not windows:
+            return []
+        workers = workers or os.cpu_count() or 1
+        workers = max(1, min(workers, len(windows)))
+
+        print(f"[AudioTranscriber] Long-form: {audio.size / SAMPLE_RATE:.1f}s → "
+              f"{len(windows)} windows on {workers} worker(s)")
+        t0 = time.perf_counter()
+
+        chunks = [audio[s:e] for s, e in windows]
+        if pool is not None:
+            results = list(pool.map(_transcribe_window, chunks))
+        elif workers == 1:
+            results = [self.model.transcribe(c, verbose=False) for c in chunks]
+        else:
+            with transcription_pool(self.model_size, workers) as own_pool:
+                results = list(own_pool.map(_transcribe_window, chunks))
+
+        documents = []
+        last_start = 0.0
+        clamped = seam_overruns = 0
+        for i, ((start, _), result) in enumerate(zip(windows, results)):
+            offset = start / SAMPLE_RATE
+            segments = result.get("segments") or []
+            if i + 1 < len(windows) and segments \
+                    and offset + segments[-1].get("end", 0.0) > windows[i + 1][0] / SAMPLE_RATE:
+                seam_overruns += 1
+            for doc in self._result_to_documents(result, source):
+                raw = offset + doc.metadata.get("start_time", 0.0)
+                # clamp keeps stitched timestamps monotonic across window seams
+                if raw < last_start:
+                    clamped += 1
+                t = max(last_start, raw)
+                doc.metadata["start_time"] = round(t, 3)
+                last_start = t
+                documents.append(doc)
+        self.last_stats = {"windows": len(windows), "workers": workers,
+                           "clamped": clamped, "seam_overruns": seam_overruns}
+
+        print(f"[AudioTranscriber] Long-form done in {time.perf_counter() - t0:.1f}s — "
+              f"{len(documents)} segments.")
+        return documents
+
+    def _result_to_documents(self, result: dict, source: str) -> list:
+        """Whisper result dict → one Document per segment (full text fallback)."""
         segments = result.get("segments", [])
 
         documents = []
@@ -95,7 +288,7 @@ class AudioTranscriber:
             if full_text:
                 documents.append(Document(
                     text=full_text,
-                    source=str(audio_path),
+                    source=source,
                     modality="audio",
                     metadata={"start_time": 0.0},
                 ))
@@ -106,16 +299,15 @@ class AudioTranscriber:
                     continue
                 documents.append(Document(
                     text=text,
-                    source=str(audio_path),
+                    source=source,
                     modality="audio",
                     metadata={"start_time": seg.get("start", 0.0)},
                 ))
-            print(f"[AudioTranscriber] {len(segments)} segments from '{audio_path.name}'.")
-
-        print(f"[AudioTranscriber] Total documents produced: {len(documents)}")
+            print(f"[AudioTranscriber] {len(segments)} segments from '{Path(source).name}'.")
         return documents
 
     def unload(self):
         """Explicitly free Whisper from memory (optional, ingest.py uses del instead)."""
-        del self.model
-        self.model = None
\ No newline at end of file
+        with track_model_unload("whisper"):
+            del self.model
+            self.model = None
\ No newline at end of file
@@ -1,11 +1,15 @@
 import torch
 import gc
+import time
 from pathlib import Path
 from PIL import Image
 from transformers import Qwen2VLForConditionalGeneration, AutoProcessor, BitsAndBytesConfig
 from qwen_vl_utils import process_vision_info
 
 from src.schema import Document
+from src.utils.caption_cache import CaptionCache, caption_key
+from src.utils.frame_store import FrameRef, load_frames, frame_hash
+from src.utils.metrics import record_cache, track_model_load, track_model_unload
 
 SUPPORTED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
 
@@ -29,67 +33,106 @@ VIDEO_FRAME_PROMPT = """This is a frame from a video. Describe what is happening
 - Any actions, motion or events visible
 Describe this as a video scene, not a static image."""
 
+# Rough per-frame VRAM cost of a Qwen2-VL-2B 4-bit generate() at max_pixels=512*28*28
+# (vision tokens + KV cache for ~300 new tokens). Used to size micro-batches.
+_VRAM_PER_FRAME_MB = 600
+_MAX_GPU_BATCH = 16
+_CPU_BATCH = 2
+
 
 class ImageCaptioner:
-    def __init__(self, model_id: str = "Qwen/Qwen2-VL-2B-Instruct"):
+    def __init__(
+        self,
+        model_id: str = "Qwen/Qwen2-VL-2B-Instruct",
+        cache_path: str = "outputs/indexes/caption_cache.sqlite",
+    ):
         self.model_id = model_id
         self.model = None
         self.processor = None
+        # content-hash caption cache — None disables it
+        self.cache = CaptionCache(cache_path) if cache_path else None
 
     def _load(self):
         if self.model is not None:
             return
 
         print(f"[ImageCaptioner] Loading {self.model_id} with 4-bit quantization...")
+        with track_model_load("captioner"):
+            bnb_config = BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_compute_dtype=torch.float16,
+                bnb_4bit_use_double_quant=True,
+                bnb_4bit_quant_type="nf4",
+                llm_int8_enable_fp32_cpu_offload=True,
+            )
 
-        bnb_config = BitsAndBytesConfig(
-            load_in_4bit=True,
-            bnb_4bit_compute_dtype=torch.float16,
-            bnb_4bit_use_double_quant=True,
-            bnb_4bit_quant_type="nf4",
-            llm_int8_enable_fp32_cpu_offload=True,
-        )
-
-        self.processor = AutoProcessor.from_pretrained(
-            self.model_id,
-            min_pixels=256 * 28 * 28,
-            max_pixels=512 * 28 * 28,
-        )
+            self.processor = AutoProcessor.from_pretrained(
+                self.model_id,
+                min_pixels=256 * 28 * 28,
+                max_pixels=512 * 28 * 28,
+            )
+            # decoder-only batched generation needs left padding
+            self.processor.tokenizer.padding_side = "left"
 
-        self.model = Qwen2VLForConditionalGeneration.from_pretrained(
-            self.model_id,
-            quantization_config=bnb_config,
-            device_map="cuda",
-            torch_dtype=torch.float16,
-            low_cpu_mem_usage=True,
-        )
-        self.model.eval()
+            self.model = Qwen2VLForConditionalGeneration.from_pretrained(
+                self.model_id,
+                quantization_config=bnb_config,
+                device_map="cuda",
+                torch_dtype=torch.float16,
+                low_cpu_mem_usage=True,
+            )
+            self.model.eval()
         print("[ImageCaptioner] Qwen2-VL loaded.")
 
+    def _pick_batch_size(self) -> int:
+        """
+        Micro-batch size from currently free accelerator memory.
+        No accelerator → small CPU-friendly batch (generate is compute-bound there).
+        """
+        if not torch.cuda.is_available():
+            return _CPU_BATCH
+        try:
+            free_bytes, _ = torch.cuda.mem_get_info()
+        except Exception:
+            return 1
+        free_mb = free_bytes / 1024 ** 2
+        # keep ~20% headroom for allocator fragmentation
+        return max(1, min(_MAX_GPU_BATCH, int(free_mb * 0.8 // _VRAM_PER_FRAME_MB)))
+
     def _caption_pil_with_prompt(self, image: Image.Image, prompt: str) -> str:
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "image", "image": image},
-                    {"type": "text", "text": prompt},
-                ],
-            }
+        return self.caption_batched([image], prompt)[0]
+
+    def _caption_batch(self, images: list, prompt: str) -> list[str]:
+        """Caption a micro-batch of images in a single model.generate() call."""
+        batch_messages = [
+            [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "image", "image": image},
+                        {"type": "text", "text": prompt},
+                    ],
+                }
+            ]
+            for image in images
         ]
 
-        text = self.processor.apply_chat_template(
-            messages, tokenize=False, add_generation_prompt=True
-        )
+        texts = [
+            self.processor.apply_chat_template(
+                messages, tokenize=False, add_generation_prompt=True
+            )
+            for messages in batch_messages
+        ]
 
-        image_inputs, video_inputs = process_vision_info(messages)
+        image_inputs, video_inputs = process_vision_info(batch_messages)
 
         inputs = self.processor(
-            text=[text],
+            text=texts,
             images=image_inputs,
             videos=video_inputs,
             padding=True,
             return_tensors="pt",
-        ).to("cuda")
+        ).to(self.model.device)
 
         with torch.no_grad():
             output_ids = self.model.generate(
@@ -100,30 +143,102 @@ class ImageCaptioner:
                 top_p=None,
             )
 
+        # left padding → every prompt ends at the same column
         generated = output_ids[:, inputs["input_ids"].shape[1]:]
-        caption = self.processor.batch_decode(
+        captions = self.processor.batch_decode(
             generated, skip_special_tokens=True, clean_up_tokenization_spaces=False
-        )[0].strip()
+        )
 
         del inputs, output_ids, generated, image_inputs
-        torch.cuda.empty_cache()
+        return [c.strip() for c in captions]
 
-        return caption
+    def caption_batched(
+        self, images: list, prompt: str, batch_size: int = None
+    ) -> list[str]:
+        """
+        Caption many images via padding-aware micro-batches.
+
+        `images` may be PIL images or FrameRefs from a FrameStore; refs are
+        decoded lazily, one micro-batch at a time. Cached captions (keyed by pixel hash + model + prompt) are returned
+        without touching the model; Qwen2-VL is only loaded if something is
+        missing, and identical frames within the call are captioned once.
+        Misses are grouped by pixel count so each batch carries a similar number
+        of vision tokens (minimal padding). Reports frames/sec per batch.
+        """
+        if not images:
+            return []
+
+        keys = [caption_key(frame_hash(img), self.model_id, prompt)
+                for img in images]
+        cached = self.cache.get_many(keys) if self.cache is not None else {}
+
+        # first occurrence of every uncached key
+        todo = {}
+        for i, key in enumerate(keys):
+            if key not in cached and key not in todo:
+                todo[key] = i
+        print(f"[ImageCaptioner] Caption cache: {len(images) - len(todo)}/{len(images)} hits.")
+        record_cache("caption", hits=len(images) - len(todo), misses=len(todo))
+
+        if todo:
+            self._load()
+            if batch_size is None:
+                batch_size = self._pick_batch_size()
+
+            # PIL images and FrameRefs both expose width / height
+            order = sorted(todo.values(),
+                           key=lambda i: images[i].width * images[i].height)
+            fresh = {}
+
+            for start in range(0, len(order), batch_size):
+                idx = order[start:start + batch_size]
+                t0 = time.perf_counter()
+                batch_images = load_frames([images[i] for i in idx])
+                try:
+                    batch_captions = self._caption_batch(batch_images, prompt)
+                except torch.cuda.OutOfMemoryError:
+                    # shrink and retry this slice one frame at a time
+                    torch.cuda.empty_cache()
+                    print(f"[ImageCaptioner] OOM at batch_size={len(idx)}, retrying per frame.")
+                    batch_captions = [self._caption_batch([img], prompt)[0] for img in batch_images]
+                del batch_images
+                elapsed = time.perf_counter() - t0
+                for i, cap in zip(idx, batch_captions):
+                    fresh[keys[i]] = cap
+                print(f"[ImageCaptioner] batch_size={len(idx)} → "
+                      f"{len(idx) / max(elapsed, 1e-9):.2f} frames/sec")
+
+            if self.cache is not None:
+                self.cache.put_many(fresh, self.model_id)
+            cached.update(fresh)
+
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+        return [cached[k] for k in keys]
 
     def _caption_pil(self, image: Image.Image) -> str:
-        return self._caption_pil_with_prompt(image, CAPTION_PROMPT)
+        return self.caption_batched([image], CAPTION_PROMPT)[0]
 
-    def caption_dir(self, image_dir: str) -> list[Document]:
-        self._load()
-        docs = []
+    def caption_dir(self, image_dir: str, batch_size: int = None) -> list[Document]:
+        paths, images = [], []
         for path in sorted(Path(image_dir).iterdir()):
             if path.suffix.lower() not in SUPPORTED_EXTENSIONS:
                 continue
-            docs.extend(self.caption_file(str(path)))
-        return docs
+            try:
+                images.append(Image.open(path).convert("RGB"))
+                paths.append(path)
+            except Exception as e:
+                print(f"[ImageCaptioner] Could not open {path.name}: {e}")
+
+        print(f"[ImageCaptioner] Captioning {len(images)} images...")
+        captions = self.caption_batched(images, CAPTION_PROMPT, batch_size=batch_size)
+        return [
+            self._image_doc(path, img, caption)
+            for path, img, caption in zip(paths, images, captions)
+        ]
 
     def caption_file(self, file_path: str) -> list[Document]:
-        self._load()
         path = Path(file_path)
         try:
             img = Image.open(path).convert("RGB")
@@ -133,9 +248,11 @@ class ImageCaptioner:
 
         print(f"[ImageCaptioner] Captioning {path.name}...")
         caption = self._caption_pil(img)
-        print(f"  → {caption[:120]}{'...' if len(caption) > 120 else ''}")
+        return [self._image_doc(path, img, caption)]
 
-        return [Document(
+    def _image_doc(self, path: Path, img: Image.Image, caption: str) -> Document:
+        print(f"  → {path.name}: {caption[:120]}{'...' if len(caption) > 120 else ''}")
+        return Document(
             text=caption,
             source=str(path),
             modality="image",
@@ -144,22 +261,23 @@ class ImageCaptioner:
                 "_pil_image": img,
                 "caption_model": self.model_id,
             },
-        )]
+        )
 
     def caption_pil_list(
-        self, pil_images: list, sources: list[str]
+        self, pil_images: list, sources: list[str], batch_size: int = None
     ) -> list[Document]:
-        self._load()
+        print(f"[ImageCaptioner] Captioning {len(pil_images)} frames...")
+        captions = self.caption_batched(pil_images, VIDEO_FRAME_PROMPT, batch_size=batch_size)
         docs = []
-        for img, src in zip(pil_images, sources):
-            print(f"[ImageCaptioner] Captioning frame: {src}")
-            caption = self._caption_pil_with_prompt(img, VIDEO_FRAME_PROMPT)
+        for img, src, caption in zip(pil_images, sources, captions):
+            # FrameRefs stay on disk until the embedder loads them
+            image_key = "_frame_ref" if isinstance(img, FrameRef) else "_pil_image"
             docs.append(Document(
                 text=caption,
                 source=src,
                 modality="image",
                 metadata={
-                    "_pil_image": img,
+                    image_key: img,
                     "caption_model": self.model_id,
                     "source_type": "keyframe_caption",
                 },
@@ -167,11 +285,14 @@ class ImageCaptioner:
         return docs
 
     def unload(self):
+        if self.model is None:
+            return
         print("[ImageCaptioner] Unloading Qwen2-VL...")
-        del self.model
-        del self.processor
-        self.model = None
-        self.processor = None
-        gc.collect()
-        torch.cuda.empty_cache()
+        with track_model_unload("captioner"):
+            del self.model
+            del self.processor
+            self.model = None
+            self.processor = None
+            gc.collect()
+            torch.cuda.empty_cache()
         print("[ImageCaptioner] VRAM freed.")
\ No newline at end of file
@@ -2,30 +2,40 @@ import cv2
 import subprocess
 import torch
 import gc
-import shutil
+import hashlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from PIL import Image
 from src.schema import Document
+from src.utils.frame_store import FrameStore, FrameRef, SHARD_SUFFIX
+from src.utils.metrics import track_model_unload
 from src.ingestion.audio_transcriber import AudioTranscriber
 from src.retrieval.temporal_attention import TemporalAttention
 
 SUPPORTED_EXTENSIONS = {".mp4", ".mkv", ".avi", ".mov"}
+WHISPER_SAMPLE_RATE = 16000
 
 
 class VideoProcessor:
-    def __init__(self, keyframe_interval: int = 2, device: str = "cuda"):
+    def __init__(self, keyframe_interval: int = 2, device: str = "cuda",
+                 frame_dir: str = "outputs/frame_store"):
         self.keyframe_interval = keyframe_interval
         self.device = device
+        # keyframes are spilled here as downscaled JPEG shards, one per video
+        self.frame_dir = Path(frame_dir)
         self.transcriber = AudioTranscriber(model_size="small", device=self.device)
         self.temporal_attn = TemporalAttention(embed_dim=512, num_heads=8)
         self.temporal_attn.eval()
-        # dedicated temp dir — never overlaps with data/audio/
-        self._audio_tmp = Path("outputs/video_audio_tmp")
-        self._audio_tmp.mkdir(parents=True, exist_ok=True)
 
-    def process(self, video_dir: str) -> tuple[list[Document], list[Image.Image], list[str]]:
+    def process(self, video_dir: str) -> tuple[list[Document], list[FrameRef], list[str]]:
+        """
+        Returns (transcript_docs, keyframe_refs, keyframe_sources).
+        Keyframes are FrameRefs into an on-disk shard, not live PIL images —
+        load them with src.utils.frame_store.load_frames in batches.
+        """
         transcript_docs = []
-        keyframe_images = []
+        keyframe_refs = []
         keyframe_sources = []
 
         for file in sorted(Path(video_dir).iterdir()):
@@ -33,47 +43,72 @@ class VideoProcessor:
                 continue
             print(f"[VideoProcessor] Processing {file.name}")
 
-            # extract audio to isolated tmp dir
-            audio_out = self._audio_tmp / f"{file.stem}_extracted.wav"
-            self._extract_audio(file, audio_out)
-            segments = self.transcriber.transcribe_file(str(audio_out))
+            # ffmpeg decode runs in a worker (subprocess I/O releases the GIL)
+            # while OpenCV walks the frames on this thread
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                audio_future = pool.submit(self._extract_audio, file)
+                frames = self._extract_keyframes(file)
+                audio = audio_future.result()
+
+            segments = self.transcriber.transcribe_array(audio, str(file))
             for doc in segments:
                 doc.metadata["video_file"] = file.name
                 doc.modality = "video"
             transcript_docs.extend(segments)
 
-            frames = self._extract_keyframes(file)
-            for timestamp, frame_img in frames:
-                keyframe_images.append(frame_img)
+            for timestamp, frame_ref in frames:
+                keyframe_refs.append(frame_ref)
                 keyframe_sources.append(f"{file.name}::frame_{timestamp:.1f}s")
 
         print(f"[VideoProcessor] Transcripts: {len(transcript_docs)}, "
-              f"Keyframes: {len(keyframe_images)}")
-        return transcript_docs, keyframe_images, keyframe_sources
+              f"Keyframes: {len(keyframe_refs)}")
+        return transcript_docs, keyframe_refs, keyframe_sources
+
+    def _shard_path(self, video_path: Path) -> Path:
+        # video content + sampling interval: the same upload always maps to the
+        # same shard (rewritten atomically with identical frames), and a changed
+        # video never lands in a shard that older FrameRefs point into
+        h = hashlib.sha256(f"{self.keyframe_interval}|".encode())
+        with open(video_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return self.frame_dir / f"{video_path.stem}_{h.hexdigest()[:16]}{SHARD_SUFFIX}"
 
-    def _extract_audio(self, video_path: Path, out_path: Path):
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-        subprocess.run(
-            ["ffmpeg", "-y", "-i", str(video_path),
-             "-ac", "1", "-ar", "16000", str(out_path)],
-            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    def _extract_audio(self, video_path: Path) -> np.ndarray:
+        """
+        Decode the audio track straight from ffmpeg stdout as 16 kHz mono s16le
+        and return a float32 waveform in [-1, 1] — the format whisper.transcribe
+        accepts directly. Nothing is written to disk. Videos without an audio
+        stream yield an empty array.
+        """
+        proc = subprocess.run(
+            ["ffmpeg", "-nostdin", "-i", str(video_path),
+             "-vn", "-f", "s16le", "-acodec", "pcm_s16le",
+             "-ac", "1", "-ar", str(WHISPER_SAMPLE_RATE), "-"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
         )
+        if proc.returncode != 0 or not proc.stdout:
+            print(f"[VideoProcessor] No audio track decoded from {video_path.name}")
+            return np.zeros(0, dtype=np.float32)
+        return np.frombuffer(proc.stdout, np.int16).astype(np.float32) / 32768.0
 
-    def _extract_keyframes(self, video_path: Path) -> list[tuple[float, Image.Image]]:
+    def _extract_keyframes(self, video_path: Path) -> list[tuple[float, FrameRef]]:
         cap = cv2.VideoCapture(str(video_path))
         fps = cap.get(cv2.CAP_PROP_FPS) or 24
-        interval_frames = int(fps * self.keyframe_interval)
+        interval_frames = max(1, int(fps * self.keyframe_interval))
         frames = []
         frame_idx = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            if frame_idx % interval_frames == 0:
-                timestamp = frame_idx / fps
-                img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-                frames.append((timestamp, img))
-            frame_idx += 1
+        with FrameStore(self._shard_path(video_path)) as store:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if frame_idx % interval_frames == 0:
+                    timestamp = frame_idx / fps
+                    img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                    # downscaled + written immediately; only the ref stays in RAM
+                    frames.append((timestamp, store.add(img)))
+                frame_idx += 1
         cap.release()
         return frames
 
@@ -86,12 +121,9 @@ class VideoProcessor:
 
     def unload(self):
         print("[VideoProcessor] Unloading Whisper...")
-        del self.transcriber
-        self.transcriber = None
-        # clean up temp audio files after transcription done
-        if self._audio_tmp.exists():
-            shutil.rmtree(self._audio_tmp)
-            print(f"[VideoProcessor] Cleaned up temp audio files.")
-        gc.collect()
-        torch.cuda.empty_cache()
+        with track_model_unload("whisper"):
+            del self.transcriber
+            self.transcriber = None
+            gc.collect()
+            torch.cuda.empty_cache()
         print("[VideoProcessor] Whisper unloaded.")
\ No newline at end of file
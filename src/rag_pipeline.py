@@ -1,45 +1,45 @@
 import os
-import yaml
-from transformers import AutoTokenizer
+import re
+import hashlib
 from src.schema import Document
 from src.chunking.token_chunker import TokenChunker
 from src.chunking.fixed_chunker import FixedChunker
-from src.embeddings.text_embedder import TextEmbedder
-from src.embeddings.image_embedder import ImageEmbedder
-from src.vectorstore.faiss_store import FAISSStore
 from src.retrieval.text_retriever import TextRetriever
-from src.retrieval.image_retriever import ImageRetriever
-from src.retrieval.unified_retriever import UnifiedRetriever
 from src.generation.prompt_templates import build_prompt
-from src.generation.generator import Generator
-from src.utils.cache import compute_dir_hash, get_cache_paths, cache_exists
+from src.generation.answer_length import answer_length
+from src.utils.config import load_yaml
+from src.utils.token_utils import ContextPacker, get_generation_tokenizer, prompt_token_limit
+from src.utils.tracing import Trace, span, traced_iter
+from src.utils.metrics import record_cache, track_model_load
+from src.utils.cache import (
+    compute_dir_hash, compute_dir_key, get_cache_paths, cache_exists, get_image_index_dir,
+    get_shard_root, list_shards,
+)
+
+# torch, transformers, sentence-transformers, open_clip and faiss are imported
+# where they are first needed — importing this module or constructing a
+# RAGPipeline loads no ML framework and no model.
+
+# a bare stem ("talk", "1") only filters when it is at least this long
+MIN_STEM_CHARS = 4
+
+
+def _mentions(text: str, name: str) -> bool:
+    """`name` appears in `text` as a whole word — not inside another word or number."""
+    return re.search(rf"(?<!\w){re.escape(name)}(?!\w)", text) is not None
 
 
 class RAGPipeline:
 
     def __init__(self):
-        with open("config/config.yaml") as f:
-            self.config = yaml.safe_load(f)
-        with open("config/models.yaml") as f:
-            self.models = yaml.safe_load(f)
-
-        # Chunker
-        chunk_cfg = self.config["chunking"]
-        if chunk_cfg["type"] == "token":
-            self.chunker = TokenChunker(
-                model_name=self.models["embedding_model"],
-                max_tokens=chunk_cfg["max_tokens"],
-                overlap=chunk_cfg["overlap"],
-            )
-        else:
-            self.chunker = FixedChunker(
-                chunk_cfg["chunk_size"],
-                chunk_cfg["overlap"],
-                tokenizer_name=self.models["embedding_model"],
-            )
+        self.config = load_yaml("config/config.yaml")
+        self.models = load_yaml("config/models.yaml")
 
-        # Text embedder — always needed
-        self.text_embedder = TextEmbedder(self.models["embedding_model"])
+        # Chunker, text embedder and budget tokenizer — lazy loaded on first
+        # ingest / query; tokenizers are shared per model (src.utils.token_utils)
+        self.chunker = None
+        self.text_embedder = None
+        self.tokenizer = None
 
         # Image embedder — lazy loaded only when images present
         self.image_embedder = None
@@ -47,32 +47,76 @@ class RAGPipeline:
         # Stores
         self.text_vectorstore = None
         self.image_retriever = None
+        self._sources = None          # indexed source strings, for filename filters
+
+        # Cross-encoder reranker — lazy loaded only if rerank.enabled
+        self.reranker = None
+        self.last_timings = {}
 
         # Generator — lazy loaded only when query() is called
         self.generator = None
         self._model_config = self.models["offline_llm"]
 
-        # Tokenizer for budget
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            self.models["embedding_model"],
-            model_max_length=4096,
-        )
+    def _ensure_tokenizer(self):
+        """
+        Lazy-load the budget tokenizer — the generator's own (the GGUF vocab
+        for llama.cpp), so the prompt is counted in the tokens that fill n_ctx.
+        """
+        if self.tokenizer is None:
+            self.tokenizer = get_generation_tokenizer(
+                self._model_config, fallback=self.models["embedding_model"]
+            )
+        return self.tokenizer
+
+    def _ensure_chunker(self):
+        """Chunks are sized in embedding-model tokens (shared via the registry)."""
+        if self.chunker is None:
+            chunk_cfg = self.config["chunking"]
+            if chunk_cfg["type"] == "token":
+                self.chunker = TokenChunker(
+                    model_name=self.models["embedding_model"],
+                    max_tokens=chunk_cfg["max_tokens"],
+                    overlap=chunk_cfg["overlap"],
+                )
+            else:
+                self.chunker = FixedChunker(
+                    chunk_cfg["chunk_size"],
+                    chunk_cfg["overlap"],
+                    tokenizer_name=self.models["embedding_model"],
+                )
+        return self.chunker
+
+    def _ensure_text_embedder(self):
+        """Lazy-load the SentenceTransformer on first ingest / query."""
+        if self.text_embedder is None:
+            from src.embeddings.text_embedder import TextEmbedder
+            with track_model_load("text_embedder"):
+                self.text_embedder = TextEmbedder(self.models["embedding_model"])
+        return self.text_embedder
 
     # ==========================================================
     # INGESTION
     # ==========================================================
 
     def ingest(self, documents: list[Document], source_dir: str = None):
+        from src.vectorstore.faiss_store import FAISSStore
+        from src.vectorstore.sharded_store import ShardedFAISSStore
+        from src.retrieval.image_retriever import ImageRetriever
+
         cache_dir = "outputs/indexes"
+        self._sources = None
+
+        # video keyframe docs carry _pil_image / _frame_ref — route to image retriever
+        # video transcript docs carry neither — route to text retriever
+        def _is_keyframe(d):
+            return "_pil_image" in d.metadata or "_frame_ref" in d.metadata
 
-        # video keyframe docs have _pil_image — route to image retriever
-        # video transcript docs have no _pil_image — route to text retriever
         text_docs = [d for d in documents if d.modality in ("text", "pdf", "audio")]
         text_docs += [d for d in documents if d.modality == "video"
-                      and "_pil_image" not in d.metadata]
+                      and not _is_keyframe(d)]
         image_docs = [d for d in documents if d.modality == "image"]
         image_docs += [d for d in documents if d.modality == "video"
-                       and "_pil_image" in d.metadata]
+                       and _is_keyframe(d)]
 
         # Inject image captions into text pipeline as plain text docs
         caption_docs = [
@@ -87,72 +131,72 @@ class RAGPipeline:
         ]
         text_docs = text_docs + caption_docs
 
+        # one fingerprint keys both the text and the image index
+        source_hash = compute_dir_hash(source_dir) if source_dir is not None else None
+        retrieval_cfg = self.config["retrieval"]
+        storage = retrieval_cfg.get("storage", "float32")
+        exact_rerank = retrieval_cfg.get("exact_rerank", 0)
+        # None = one flat index; "source" / "hash" = ShardedFAISSStore
+        shard_by = retrieval_cfg.get("shard_by")
+        # keyed by location: shards of unchanged files are reused as others change
+        shard_root = (get_shard_root(cache_dir, compute_dir_key(source_dir))
+                      if shard_by and source_dir is not None else None)
+        store_kwargs = dict(
+            metric=retrieval_cfg.get("metric", "l2"),
+            storage=storage,
+            exact_rerank=exact_rerank,
+        )
+
         # --- TEXT / AUDIO / VIDEO TRANSCRIPTS + IMAGE CAPTIONS ---
         if text_docs:
-            if source_dir is not None:
-                source_hash = compute_dir_hash(source_dir)
+            if shard_root is not None:
+                self.text_vectorstore = self._ingest_sharded(text_docs, shard_root, store_kwargs)
+            elif not shard_by and source_hash is not None and cache_exists(cache_dir, source_hash):
                 index_path, meta_path = get_cache_paths(cache_dir, source_hash)
-                if cache_exists(cache_dir, source_hash):
-                    print(f"[INFO] Cache hit — loading text index.")
-                    self.text_vectorstore = FAISSStore.load(index_path, meta_path)
-                    print(f"[INFO] {len(self.text_vectorstore.metadata)} chunks loaded.")
-                    # still need to build image retriever even on cache hit
-                    if image_docs:
-                        if self.image_embedder is None:
-                            self.image_embedder = ImageEmbedder(
-                                model_name=self.models["clip"]["model"],
-                                pretrained=self.models["clip"]["pretrained"],
-                                device=self.models["clip"]["device"]
-                            )
-                        self.image_retriever = ImageRetriever(
-                            self.image_embedder,
-                            index_dir="outputs/indexes/images"
-                        )
-                        self.image_retriever.build_index(image_docs)
-                    return
-
-            chunks = self.chunker.chunk(text_docs)
-            print(f"[INFO] Total chunks: {len(chunks)}")
-
-            texts = [c.text for c in chunks]
-            embeddings = self.text_embedder.embed(texts)
-
-            metadata = [
-                {
-                    "text": c.text,
-                    "section": c.section or "General",
-                    "source": c.source,
-                    "page": c.page,
-                    "modality": c.modality,
-                    "start_time": c.metadata.get("start_time"),
-                }
-                for c in chunks
-            ]
-
-            self.text_vectorstore = FAISSStore(embeddings.shape[1])
-            self.text_vectorstore.add(embeddings, metadata)
-            print(f"[INFO] Indexed {len(chunks)} text chunks.")
-
-            if source_dir is not None:
-                source_hash = compute_dir_hash(source_dir)
-                index_path, meta_path = get_cache_paths(cache_dir, source_hash)
-                self.text_vectorstore.save(index_path, meta_path)
+                print(f"[INFO] Cache hit — loading text index.")
+                record_cache("text_index", hits=1)
+                self.text_vectorstore = FAISSStore.load(
+                    index_path, meta_path, exact_rerank=exact_rerank
+                )
+                print(f"[INFO] {len(self.text_vectorstore.metadata)} chunks loaded.")
+            else:
+                if source_hash is not None:
+                    record_cache("text_index", misses=1)
+                embeddings, metadata = self._embed_chunks(text_docs)
+
+                if shard_by:
+                    self.text_vectorstore = ShardedFAISSStore(
+                        embeddings.shape[1], shard_by=shard_by,
+                        n_shards=retrieval_cfg.get("n_shards", 8),
+                        root=shard_root, **store_kwargs,
+                    )
+                else:
+                    self.text_vectorstore = FAISSStore(embeddings.shape[1], **store_kwargs)
+                self.text_vectorstore.add(embeddings, metadata)
+                self.text_vectorstore.build_lexical_index()
+                self.text_vectorstore.fit_calibration()
+                print(f"[INFO] Indexed {len(metadata)} text chunks.")
+
+                if source_hash is not None:
+                    index_path, meta_path = get_cache_paths(cache_dir, source_hash)
+                    self.text_vectorstore.save(index_path, meta_path)
 
         # --- IMAGES / KEYFRAMES ---
         if image_docs:
-            if self.image_embedder is None:
-                self.image_embedder = ImageEmbedder(
-                    model_name=self.models["clip"]["model"],
-                    pretrained=self.models["clip"]["pretrained"],
-                    device=self.models["clip"]["device"]
-                )
+            index_dir = (get_image_index_dir(cache_dir, source_hash)
+                         if source_hash is not None else "outputs/indexes/images")
+            # CLIP is only constructed if something actually needs encoding
             self.image_retriever = ImageRetriever(
                 self.image_embedder,
-                index_dir="outputs/indexes/images"
+                index_dir=index_dir,
+                embedder_factory=self._ensure_image_embedder,
+                storage=storage,
+                exact_rerank=exact_rerank,
             )
 
             # check if these are video keyframes — apply temporal attention if so
             is_video = any(d.modality == "video" for d in image_docs)
+            attn_kwargs = {}
             if is_video and len(image_docs) > 1:
                 from src.retrieval.temporal_attention import TemporalAttention
 
@@ -164,16 +208,34 @@ class RAGPipeline:
                     def apply_temporal_attention(self, v):
                         return self.temporal_attn.attend(v)
 
-                self.image_retriever.build_index(
-                    image_docs,
-                    apply_temporal_attention=True,
-                    temporal_attn=_AttnWrapper()
-                )
+                attn_kwargs = {"apply_temporal_attention": True,
+                               "temporal_attn": _AttnWrapper()}
+
+            if source_hash is not None and self.image_retriever.load_if_exists():
+                print(f"[INFO] Cache hit — loaded image index.")
+                record_cache("image_index", hits=1)
+                # only sources missing from the cached index get encoded
+                self.image_retriever.add_documents(image_docs, **attn_kwargs)
             else:
-                self.image_retriever.build_index(image_docs)
+                if source_hash is not None:
+                    record_cache("image_index", misses=1)
+                self.image_retriever.build_index(image_docs, **attn_kwargs)
 
             print(f"[INFO] Indexed {len(image_docs)} images"
-                  f"{' with temporal attention' if is_video else ''}.")
+                  f"{' with temporal attention' if attn_kwargs else ''}.")
+
+    def _ensure_image_embedder(self):
+        """Lazy-load CLIP on first use. Safe to call multiple times."""
+        if self.image_embedder is None:
+            from src.embeddings.image_embedder import ImageEmbedder
+            with track_model_load("clip"):
+                self.image_embedder = ImageEmbedder(
+                    model_name=self.models["clip"]["model"],
+                    pretrained=self.models["clip"]["pretrained"],
+                    device=self.models["clip"]["device"],
+                    batch_size=self.models["clip"].get("batch_size", 64),
+                )
+        return self.image_embedder
 
     # ==========================================================
     # SHARED RETRIEVAL — used by query() and query_stream()
@@ -188,96 +250,257 @@ class RAGPipeline:
         """
         if self.text_vectorstore is None and self.image_retriever is None:
             return [], []
+        from src.retrieval.unified_retriever import UnifiedRetriever
 
         # Build retrievers — only what exists
+        retrieval_cfg = self.config["retrieval"]
+        hybrid = retrieval_cfg.get("hybrid", True)
+        rerank_cfg = self.config.get("rerank", {})
+        rerank = rerank_cfg.get("enabled", False)
+        # over-fetch when a reranker will pick the final top-n
+        top_k = rerank_cfg.get("candidates", 20) if rerank else retrieval_cfg["top_k"]
         text_retriever = TextRetriever(
-            self.text_embedder,
+            self._ensure_text_embedder(),
             self.text_vectorstore,
-            self.config["retrieval"]["top_k"],
+            top_k,
+            hybrid=hybrid,
+            rrf_k=retrieval_cfg.get("rrf_k", 60),
+            min_relevance=retrieval_cfg.get("min_relevance"),
         ) if self.text_vectorstore is not None else None
 
-        retriever = UnifiedRetriever(text_retriever, self.image_retriever)
-        results = retriever.retrieve(question)
-
-        # Filename pre-filter — ONLY if user explicitly mentions a filename
-        # Falls back to full semantic retrieval if no filename found in query
-        query_lower = question.lower()
-        matched_source = None
+        # load CLIP outside the timed fan-out so a cold start isn't a timeout
+        if self.image_retriever is not None:
+            self._ensure_image_embedder()
+
+        retriever = UnifiedRetriever(
+            text_retriever,
+            self.image_retriever,
+            parallel=retrieval_cfg.get("parallel", True),
+            text_timeout=retrieval_cfg.get("text_timeout_s"),
+            image_timeout=retrieval_cfg.get("image_timeout_s"),
+            min_relevance=retrieval_cfg.get("min_relevance"),
+        )
 
-        for r in results:
-            src = r.get("source", "")
-            fname = os.path.basename(src).lower()
-            fname_stem = os.path.splitext(fname)[0].lower()
-            # handle frame sources like "samplevid.mp4::frame_5.0s"
-            if "::" in fname:
-                fname = fname.split("::")[0]
-                fname_stem = os.path.splitext(fname)[0]
-            if fname in query_lower or fname_stem in query_lower:
-                matched_source = src.split("::")[0]
-                break
-
-        if matched_source:
-            filtered = [r for r in results
-                        if r.get("source", "").startswith(matched_source)]
-            if filtered:
-                results = filtered
+        # Filename filter — ONLY if user explicitly mentions a filename.
+        # Pushed into the indexes so it returns the true top-k of that file;
+        # falls back to unfiltered retrieval if the filtered search is empty.
+        with span("retrieve"):
+            filters = self._filename_filter(question)
+            results = retriever.retrieve(question, filters=filters) if filters else []
+            if not results:
+                results = retriever.retrieve(question)
 
         if not results:
             return [], []
 
-        # Section bias reranking
-        q_words = set(question.lower().split())
+        # Cross-encoder rerank — bounded by a per-query time budget
+        if rerank:
+            reranker = self._ensure_reranker()
+            with span("rerank"):
+                results = reranker.rerank(question, results, top_n=rerank_cfg.get("top_n"))
+            print(f"[Reranker] {reranker.last_stats}")
+
+        # Section bias reranking — dense-only mode. In hybrid mode section
+        # headings are an indexed BM25 field, already reflected in the fused rank.
+        elif not hybrid:
+            q_words = set(question.lower().split())
 
-        def section_bias(r):
-            section_words = set(r.get("section", "").lower().split())
-            overlap = len(q_words & section_words)
-            return r.get("score", 1.0) - (overlap * 0.1)
+            def section_bias(r):
+                section_words = set(r.get("section", "").lower().split())
+                overlap = len(q_words & section_words)
+                return r.get("score", 1.0) - (overlap * 0.1)
 
-        results = sorted(results, key=section_bias)
+            results = sorted(results, key=section_bias)
 
         # Filter too-short chunks
-        contexts = [r["text"] for r in results]
-        contexts = [c for c in contexts if len(c.split()) > 2]
+        candidates = [r for r in results if len(r["text"].split()) > 2]
 
-        if not contexts:
+        if not candidates:
             return [], results
 
-        # Token budget assembly
-        TOKEN_LIMIT = self.config.get("token_budget", {}).get("total", 3500)
-        safe_contexts = []
-        for ctx in contexts:
-            test_prompt = build_prompt(safe_contexts + [ctx], question)
-            token_len = len(self.tokenizer.encode(test_prompt, add_special_tokens=False))
-            if token_len > TOKEN_LIMIT:
-                used = len(self.tokenizer.encode(
-                    build_prompt(safe_contexts, question), add_special_tokens=False
-                ))
-                available = TOKEN_LIMIT - used
-                if available > 50:
-                    truncated = self.tokenizer.decode(
-                        self.tokenizer.encode(ctx, add_special_tokens=False)[:available]
-                    )
-                    safe_contexts.append(f"[CONTEXT CHUNK {len(safe_contexts) + 1}]\n{truncated}")
-                break
-            safe_contexts.append(f"[CONTEXT CHUNK {len(safe_contexts) + 1}]\n{ctx}")
+        # Context packing — merge / dedupe, then fill the generator's prompt
+        # window, counted with its own tokenizer
+        pack_cfg = self.config.get("token_budget", {})
+        packer = ContextPacker(
+            self._ensure_tokenizer(),
+            self._prompt_token_limit(),
+            merge_adjacent=pack_cfg.get("merge_adjacent", True),
+            dedupe_threshold=pack_cfg.get("dedupe_threshold", 0.85),
+            chunk_tokenizer=self.models["embedding_model"],
+        )
+        with span("budget"):
+            safe_contexts = packer.pack(candidates, question)
+        print(f"[ContextPacker] {packer.last_stats}")
 
         return safe_contexts, results
 
+    def _prompt_token_limit(self) -> int:
+        """The generator's prompt window; token_budget.total, if set, caps it further."""
+        limit = prompt_token_limit(self._model_config, self.config["llm"]["max_new_tokens"])
+        total = self.config.get("token_budget", {}).get("total")
+        return min(limit, total) if total else limit
+
+    def _ensure_reranker(self):
+        """Lazy-load the cross-encoder on first reranked query."""
+        if self.reranker is None:
+            from src.retrieval.reranker import CrossEncoderReranker
+            rerank_cfg = self.config.get("rerank", {})
+            with track_model_load("reranker"):
+                self.reranker = CrossEncoderReranker(
+                    model_name=self.models.get("reranker", {}).get(
+                        "model", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+                    device=self.models.get("reranker", {}).get("device", "cpu"),
+                    budget_ms=rerank_cfg.get("budget_ms", 150),
+                    cache_size=rerank_cfg.get("cache_size", 10000),
+                )
+        return self.reranker
+
+    def _embed_chunks(self, docs: list[Document]):
+        """Chunk and embed `docs` → (embeddings, per-chunk metadata)."""
+        chunks = self._ensure_chunker().chunk(docs)
+        print(f"[INFO] Total chunks: {len(chunks)}")
+        embeddings = self._ensure_text_embedder().embed([c.text for c in chunks])
+        metadata = [
+            {
+                "text": c.text,
+                "chunk_index": i,      # document order — lets the packer rejoin neighbours
+                "section": c.section or "General",
+                "source": c.source,
+                "page": c.page,
+                "modality": c.modality,
+                "start_time": c.metadata.get("start_time"),
+                "overlap_tokens": c.metadata.get("overlap_tokens"),   # TokenChunker only
+            }
+            for i, c in enumerate(chunks)
+        ]
+        return embeddings, metadata
+
+    def _shard_fingerprint(self, docs: list[Document]) -> str:
+        """Content of a shard's documents plus everything that shapes its chunks."""
+        h = hashlib.md5(repr((self.config["chunking"], self.models["embedding_model"])).encode())
+        for d in sorted(docs, key=lambda d: (d.source, d.page or 0, d.timestamp or 0.0)):
+            h.update(repr((d.source, d.modality, d.section, d.page, d.timestamp,
+                           d.metadata.get("start_time"))).encode())
+            h.update(d.text.encode())
+        return h.hexdigest()
+
+    def _ingest_sharded(self, text_docs: list[Document], shard_root: str, store_kwargs: dict):
+        """
+        Incremental sharded ingest: shards whose documents are unchanged are
+        loaded as-is, changed or removed ones are dropped, and only the new /
+        changed shards are chunked and embedded.
+        """
+        from src.vectorstore.sharded_store import ShardedFAISSStore
+
+        retrieval_cfg = self.config["retrieval"]
+        shard_kwargs = dict(shard_by=retrieval_cfg["shard_by"],
+                            n_shards=retrieval_cfg.get("n_shards", 8))
+        store = (ShardedFAISSStore.load(shard_root, exact_rerank=store_kwargs["exact_rerank"],
+                                        **shard_kwargs)
+                 if list_shards(shard_root) else None)
+        router = store or ShardedFAISSStore(0, root=shard_root, **shard_kwargs)
+
+        groups = {}
+        for doc in text_docs:
+            groups.setdefault(router.shard_for({"source": doc.source}), []).append(doc)
+        fingerprints = {name: self._shard_fingerprint(docs) for name, docs in groups.items()}
+
+        kept, dropped = set(), []
+        if store is not None:
+            for name in list(store.shards):
+                if store.fingerprints.get(name) == fingerprints.get(name):
+                    kept.add(name)
+                else:
+                    store.drop_shard(name, refit=False)
+                    dropped.append(name)
+        rebuild = [name for name in groups if name not in kept]
+        record_cache("text_index", hits=len(kept), misses=len(rebuild))
+        print(f"[INFO] Text shards: {len(kept)} reused, {len(rebuild)} to build.")
+
+        if rebuild:
+            embeddings, metadata = self._embed_chunks(
+                [doc for name in rebuild for doc in groups[name]]
+            )
+            if store is None:
+                store = ShardedFAISSStore(embeddings.shape[1], root=shard_root,
+                                          **store_kwargs, **shard_kwargs)
+            store.add(embeddings, metadata)
+            store.build_lexical_index()
+            for name in rebuild:
+                store.fingerprints[name] = fingerprints[name]
+        if rebuild or dropped:
+            store.fit_calibration()
+            store.save()
+        print(f"[INFO] {len(store.metadata)} chunks in {len(store.shards)} shards.")
+        return store
+
+    def _known_sources(self) -> set[str]:
+        """Every source string in the text and image indexes (cached per ingest)."""
+        if self._sources is None:
+            sources = set()
+            if self.text_vectorstore is not None:
+                sources.update(m.get("source", "") for m in self.text_vectorstore.metadata)
+            if self.image_retriever is not None:
+                sources.update(d.source for d in self.image_retriever.documents)
+            self._sources = sources
+        return self._sources
+
+    def _filename_filter(self, question: str) -> dict:
+        """{"source": [...]} for every indexed file named in the question, else None."""
+        query_lower = question.lower()
+        matched = []
+        for src in self._known_sources():
+            # handle frame sources like "samplevid.mp4::frame_5.0s"
+            fname = os.path.basename(src.split("::")[0]).lower()
+            fname_stem = os.path.splitext(fname)[0]
+            if not fname:
+                continue
+            # the full file name always counts; a stem only if long and non-numeric
+            stem_ok = len(fname_stem) >= MIN_STEM_CHARS and not fname_stem.isdigit()
+            if _mentions(query_lower, fname) or (stem_ok and _mentions(query_lower, fname_stem)):
+                matched.append(src)
+        return {"source": matched} if matched else None
+
     # ==========================================================
     # QUERY — lazy loads generator, returns full string
     # ==========================================================
 
+    def answer_tokens(self, question: str) -> int:
+        """
+        max_new_tokens for this question: the llm.answer_length hint for its
+        type, capped by llm.max_new_tokens. The generator further caps it to
+        what's left of n_ctx after the prompt.
+        """
+        llm_cfg = self.config["llm"]
+        if llm_cfg.get("answer_length") is None:
+            return llm_cfg["max_new_tokens"]
+        _, hint = answer_length(question, llm_cfg["answer_length"])
+        return min(hint, llm_cfg["max_new_tokens"])
+
     def _ensure_generator(self):
         """Lazy-load Phi-3 on first call. Safe to call multiple times."""
         if self.generator is None:
-            self.generator = Generator(
-                model_config=self._model_config,
-                temperature=self.config["llm"]["temperature"],
-                max_new_tokens=self.config["llm"]["max_new_tokens"],
-            )
+            from src.generation.generator import Generator
+            with track_model_load("generator"):
+                self.generator = Generator(
+                    model_config=self._model_config,
+                    temperature=self.config["llm"]["temperature"],
+                    max_new_tokens=self.config["llm"]["max_new_tokens"],
+                )
 
     def query(self, question: str) -> str:
-        """Run a full RAG query and return the complete answer as a string."""
+        """
+        Run a full RAG query and return the complete answer as a string.
+        Per-stage timings (ms) of the call are left in self.last_timings.
+        """
+        trace = Trace()
+        try:
+            with trace.activate():
+                return self._query(question)
+        finally:
+            self.last_timings = trace.finish()
+
+    def _query(self, question: str) -> str:
         self._ensure_generator()
 
         if self.text_vectorstore is None and self.image_retriever is None:
@@ -291,13 +514,27 @@ class RAGPipeline:
             return "The retrieved content was too sparse to answer the question."
 
         prompt = build_prompt(safe_contexts, question)
-        return self.generator.generate(prompt)
+        with span("generate"):
+            return self.generator.generate(prompt, self.answer_tokens(question))
 
     def query_stream(self, question: str):
         """
         Generator — yields string tokens one by one for SSE streaming.
-        Follows the same retrieval path as query().
+        Follows the same retrieval path as query(); timings land in
+        self.last_timings once the stream is exhausted.
         """
+        trace = Trace()
+        first = True
+        try:
+            for token in traced_iter(trace, self._query_stream(question)):
+                if first:
+                    trace.mark("first_token")
+                    first = False
+                yield token
+        finally:
+            self.last_timings = trace.finish()
+
+    def _query_stream(self, question: str):
         self._ensure_generator()
 
         if self.text_vectorstore is None and self.image_retriever is None:
@@ -314,4 +551,4 @@ class RAGPipeline:
             return
 
         prompt = build_prompt(safe_contexts, question)
-        yield from self.generator.generate_stream(prompt)
\ No newline at end of file
+        yield from self.generator.generate_stream(prompt, self.answer_tokens(question))
\ No newline at end of file
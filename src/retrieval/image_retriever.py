@@ -4,46 +4,187 @@ import pickle
 from pathlib import Path
 from src.schema import Document
 from src.embeddings.image_embedder import ImageEmbedder
+from src.vectorstore.score_calibration import ScoreCalibrator
+from src.vectorstore.faiss_store import (
+    build_flat_index, exact_rerank, sample_vectors, storage_of,
+)
 
 class ImageRetriever:
-    def __init__(self, embedder: ImageEmbedder, index_dir: str = "outputs/indexes/images"):
+    """
+    CLIP image index + its document store, persisted under `index_dir`.
+
+    `embedder` may be None when `embedder_factory` is given — CLIP is then only
+    loaded the first time something actually needs encoding, so loading a
+    cached index costs no model load at all.
+
+    `storage` / `exact_rerank` work as in FAISSStore: fp16 / int8 codes, with
+    float32 copies kept on disk to re-score the top top_k * exact_rerank hits.
+    """
+
+    def __init__(self, embedder: ImageEmbedder = None, index_dir: str = "outputs/indexes/images",
+                 embedder_factory=None, storage: str = "float32", exact_rerank: int = 0):
         self.embedder = embedder
+        self._embedder_factory = embedder_factory
         self.index_dir = Path(index_dir)
         self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.storage = storage
+        self.exact_rerank = exact_rerank if storage != "float32" else 0
         self.index = None
         self.documents = []
+        self.calibrator = None
+        self._exact = None
+
+    def _get_embedder(self) -> ImageEmbedder:
+        if self.embedder is None:
+            self.embedder = self._embedder_factory()
+        return self.embedder
 
     def build_index(self, documents, apply_temporal_attention: bool = False,
                 temporal_attn=None):
-        self.documents = documents
-        pil_images = [doc.metadata.get("_pil_image") for doc in documents]
-        if all(img is not None for img in pil_images):
-            vectors = self.embedder.encode_pil_images(pil_images)
-        else:
-            vectors = self.embedder.encode_images([doc.source for doc in documents])
+        vectors = self._encode_documents(documents)
 
         # apply temporal attention if this is a video keyframe sequence
         if apply_temporal_attention and temporal_attn is not None:
             vectors = temporal_attn.apply_temporal_attention(vectors)
 
-        self.index = faiss.IndexFlatIP(vectors.shape[1])
-        self.index.add(vectors)
+        self.documents = documents
+        self.index = build_flat_index(vectors.shape[1], "cosine", self.storage)
+        self._exact = None
+        self._add_vectors(vectors)
+        self._fit_calibration()
         self._save()
 
-    def retrieve(self, query: str, top_k: int = 3) -> list[Document]:
+    def add_documents(self, documents, apply_temporal_attention: bool = False,
+                      temporal_attn=None) -> int:
+        """
+        Incrementally add documents whose source is not indexed yet.
+        Already-indexed sources are skipped without touching CLIP.
+        Returns the number of documents added.
+        """
+        if self.index is None:
+            self.build_index(documents, apply_temporal_attention, temporal_attn)
+            return len(documents)
+
+        known = {doc.source for doc in self.documents}
+        new_docs = [doc for doc in documents if doc.source not in known]
+        if not new_docs:
+            return 0
+
+        vectors = self._encode_documents(new_docs)
+        if apply_temporal_attention and temporal_attn is not None and len(new_docs) > 1:
+            vectors = temporal_attn.apply_temporal_attention(vectors)
+
+        self._add_vectors(vectors)
+        self.documents = self.documents + new_docs
+        self._fit_calibration()
+        self._save()
+        print(f"[ImageRetriever] Added {len(new_docs)} images "
+              f"({len(self.documents)} total).")
+        return len(new_docs)
+
+    def _add_vectors(self, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if self.exact_rerank:
+            self._exact = vectors if self._exact is None \
+                else np.vstack([np.asarray(self._exact), vectors])
+        if storage_of(self.index) == "int8" and self.index.ntotal:
+            # int8 ranges were learned from the first batch only — retrain on
+            # everything so later images aren't clipped to those ranges
+            existing = (np.asarray(self._exact[:self.index.ntotal]) if self._exact is not None
+                        else self.index.reconstruct_n(0, self.index.ntotal))
+            vectors = np.vstack([existing, vectors])
+            self.index = build_flat_index(vectors.shape[1], "cosine", "int8")
+        if not self.index.is_trained:
+            self.index.train(vectors)
+        self.index.add(vectors)
+
+    def _fit_calibration(self):
+        """
+        Calibrate CLIP text→image scores onto the shared relevance scale.
+        Captions encoded with CLIP's text tower act as pseudo-queries, so the
+        background distribution matches what real text queries produce.
+        """
+        ids, vectors = sample_vectors(self.index)
+        texts = [self.documents[i].text for i in ids]
+        if all(t and t.strip() for t in texts):
+            queries = self._get_embedder().encode_texts(texts)
+        else:
+            queries = vectors
+        # query i is doc i's own caption — excluded so matches don't skew the background
+        calibrator = ScoreCalibrator().fit(queries, vectors, metric="cosine")
+        # a handful of images gives no background — retrieve() keeps raw CLIP scores
+        self.calibrator = calibrator if calibrator.fitted else None
+
+    def _encode_documents(self, documents) -> np.ndarray:
+        embedder = self._get_embedder()
+        images = [doc.metadata.get("_pil_image", doc.metadata.get("_frame_ref"))
+                  for doc in documents]
+        if all(img is not None for img in images):
+            # FrameRefs are decoded batch by batch inside the embedder
+            return embedder.encode_pil_images(images)
+        return embedder.encode_images([doc.source for doc in documents])
+
+    def retrieve(self, query: str, top_k: int = 3, filters: dict = None,
+                 min_relevance: float = None) -> list[Document]:
+        """
+        `filters` may carry `source` (str or list of exact sources) and/or
+        `modality`; other keys don't apply to images and are ignored.
+        With a fitted calibrator each hit gets metadata["relevance"] in [0, 1]
+        and hits below `min_relevance` are dropped.
+        """
         if self.index is None:
             self._load()
-        query_vec = self.embedder.encode_text(query)
-        scores, indices = self.index.search(query_vec, top_k)
+        params = None
+        if filters and (filters.get("source") is not None or filters.get("modality") is not None):
+            mask = self._filter_mask(filters)
+            if not mask.any():
+                return []
+            bits = np.packbits(mask, bitorder="little")
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBitmap(bits))
+        query_vec = self._get_embedder().encode_text(query)
+        fetch = top_k * self.exact_rerank if self._exact is not None else top_k
+        scores, indices = self.index.search(query_vec, fetch, params=params)
+        scores, indices = scores[0], indices[0]
+        if self._exact is not None:
+            scores, indices = exact_rerank(query_vec, indices, self._exact, "cosine", top_k)
+        relevance = self.calibrator(scores) if self.calibrator is not None else None
         results = []
-        for score, idx in zip(scores[0], indices[0]):
+        for rank, (score, idx) in enumerate(zip(scores, indices)):
             if idx < 0:
                 continue
             doc = self.documents[idx]
             doc.metadata["clip_score"] = float(score)
+            if relevance is not None:
+                if min_relevance is not None and relevance[rank] < min_relevance:
+                    continue
+                doc.metadata["relevance"] = float(relevance[rank])
             results.append(doc)
         return results
 
+    def _filter_mask(self, filters: dict) -> np.ndarray:
+        mask = np.ones(len(self.documents), dtype=bool)
+        for key in ("source", "modality"):
+            wanted = filters.get(key)
+            if wanted is None:
+                continue
+            wanted = {wanted} if isinstance(wanted, str) else set(wanted)
+            mask &= np.fromiter(
+                (getattr(doc, key) in wanted for doc in self.documents),
+                dtype=bool, count=len(self.documents),
+            )
+        return mask
+
+    def exists(self) -> bool:
+        return ((self.index_dir / "image.index").exists()
+                and (self.index_dir / "image_docs.pkl").exists())
+
+    def load_if_exists(self) -> bool:
+        """Load a persisted index from index_dir. Returns False on a cache miss."""
+        if not self.exists():
+            return False
+        self._load()
+        return True
+
     def _save(self):
         # Strip PIL images before pickling — not serializable
         docs_to_save = []
@@ -59,6 +200,14 @@ class ImageRetriever:
         faiss.write_index(self.index, str(self.index_dir / "image.index"))
         with open(self.index_dir / "image_docs.pkl", "wb") as f:
             pickle.dump(docs_to_save, f)
+        if self.calibrator is not None:
+            self.calibrator.save(str(self.index_dir / "image_calib.pkl"))
+        else:
+            (self.index_dir / "image_calib.pkl").unlink(missing_ok=True)
+        if self._exact is not None:
+            np.save(self.index_dir / "image_vectors.npy", np.asarray(self._exact))
+        # keep the stripped copies — the PIL images are no longer needed once indexed
+        self.documents = docs_to_save
 
     def _load(self):
         index_path = self.index_dir / "image.index"
@@ -67,6 +216,21 @@ class ImageRetriever:
             self.index = faiss.read_index(str(index_path))
             with open(docs_path, "rb") as f:
                 self.documents = pickle.load(f)
+            calib_path = self.index_dir / "image_calib.pkl"
+            self.calibrator = ScoreCalibrator.load(str(calib_path)) if calib_path.exists() else None
+            if self.calibrator is not None and not self.calibrator.fitted:
+                self.calibrator = None
+            self.storage = storage_of(self.index)
+            exact_path = self.index_dir / "image_vectors.npy"
+            exact = (np.load(exact_path, mmap_mode="r")
+                     if self.exact_rerank and self.storage != "float32" and exact_path.exists()
+                     else None)
+            # no usable float32 copy (missing, float32 index, or exact rerank
+            # switched on after the build) — later adds must not grow a
+            # misaligned one
+            use_exact = exact is not None and exact.shape[0] == self.index.ntotal
+            self.exact_rerank = self.exact_rerank if use_exact else 0
+            self._exact = exact if use_exact else None
             print(f"[ImageRetriever] Loaded index: {len(self.documents)} images")
         else:
-            raise FileNotFoundError("No image index found. Run build_index() first.")
\ No newline at end of file
+            raise FileNotFoundError("No image index found. Run build_index() first.")
@@ -0,0 +1,103 @@
+import time
+import hashlib
+from collections import OrderedDict
+from src.utils.metrics import record_cache
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, chunk) pairs with a small cross-encoder in one batch.
+
+    Latency is bounded per query by a deadline of `budget_ms`, checked
+    between batches of `batch_size` pairs: a batch only starts if the measured
+    per-pair cost (EMA) says it finishes in time, so the overrun is at most
+    one batch (the first call, with no EMA yet, scores one batch to learn it).
+    Unscored candidates keep their retrieval order behind the reranked head.
+    Scores are cached by (query hash, chunk id) so repeated questions only
+    pay for unseen chunks.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+                 device: str = "cpu", budget_ms: float = 150.0, cache_size: int = 10000,
+                 batch_size: int = 8):
+        from sentence_transformers import CrossEncoder
+
+        print(f"[Reranker] Loading {model_name} on {device}")
+        self.model = CrossEncoder(model_name, device=device, max_length=512)
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self._cache = OrderedDict()
+        self._ms_per_pair = None        # EMA, learned from real batches
+        self.last_stats = {}
+
+    @staticmethod
+    def _key(query_hash: str, r: dict) -> tuple[str, str]:
+        chunk_id = hashlib.sha1(
+            f"{r.get('source', '')}|{r.get('text', '')}".encode()
+        ).hexdigest()
+        return query_hash, chunk_id
+
+    def _next_batch(self, remaining: int, elapsed_ms: float) -> int:
+        """Pairs to score next: 0 once the deadline can't fit another pair."""
+        if self.budget_ms is None:
+            return remaining
+        if self._ms_per_pair is None:
+            return min(remaining, self.batch_size)
+        fits = int((self.budget_ms - elapsed_ms) / self._ms_per_pair)
+        return max(0, min(remaining, self.batch_size, fits))
+
+    def rerank(self, query: str, results: list[dict], top_n: int = None) -> list[dict]:
+        t0 = time.perf_counter()
+        query_hash = hashlib.sha1(query.encode()).hexdigest()
+        keys = [self._key(query_hash, r) for r in results]
+
+        uncached = [i for i, k in enumerate(keys) if k not in self._cache]
+        record_cache("rerank", hits=len(results) - len(uncached), misses=len(uncached))
+
+        # best-ranked uncached candidates first, batch by batch until the deadline
+        fresh = {}
+        while len(fresh) < len(uncached):
+            pending = uncached[len(fresh):]
+            n = self._next_batch(len(pending), (time.perf_counter() - t0) * 1000)
+            if n == 0:
+                break
+            batch = pending[:n]
+            t_model = time.perf_counter()
+            scores = self.model.predict(
+                [(query, results[i].get("text") or "") for i in batch],
+                batch_size=len(batch),
+                show_progress_bar=False,
+            )
+            per_pair = (time.perf_counter() - t_model) * 1000 / len(batch)
+            self._ms_per_pair = per_pair if self._ms_per_pair is None \
+                else 0.7 * self._ms_per_pair + 0.3 * per_pair
+            for i, score in zip(batch, scores):
+                fresh[keys[i]] = float(score)
+
+        scored, unscored = [], []
+        for r, k in zip(results, keys):
+            if k in fresh:
+                scored.append({**r, "rerank_score": fresh[k]})
+            elif k in self._cache:
+                self._cache.move_to_end(k)
+                scored.append({**r, "rerank_score": self._cache[k]})
+            else:
+                unscored.append(r)
+
+        # cache after ranking, so eviction never drops this query's own scores
+        self._cache.update(fresh)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+        scored.sort(key=lambda r: -r["rerank_score"])
+        ranked = scored + unscored
+
+        self.last_stats = {
+            "candidates": len(results),
+            "scored": len(fresh),
+            "cache_hits": len(results) - len(uncached),
+            "truncated": len(uncached) - len(fresh),
+            "ms": round((time.perf_counter() - t0) * 1000, 2),
+        }
+        return ranked[:top_n] if top_n else ranked
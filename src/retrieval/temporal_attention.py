@@ -6,14 +6,23 @@ import numpy as np
 class TemporalAttention(nn.Module):
     """
     Applies multi-head self-attention over a sequence of CLIP frame embeddings.
-    Each frame embedding attends to all other frames — giving every vector
-    temporal context from its neighbors before storing in FAISS.
-    
+    Each frame embedding attends to its temporal neighbors — giving every vector
+    temporal context before storing in FAISS.
+
+    Sequences up to `window` frames use full N×N attention. Longer sequences
+    use sliding-window attention: frames are processed in blocks of `window`,
+    each block attending over itself plus `overlap` frames of context on
+    either side, so time and memory grow linearly with N.
+
     Input:  [N x D] numpy array  (N frames, D=512 CLIP dims)
     Output: [N x D] numpy array  (same shape, temporally attended)
     """
-    def __init__(self, embed_dim: int = 512, num_heads: int = 8):
+    def __init__(self, embed_dim: int = 512, num_heads: int = 8,
+                 window: int = 512, overlap: int = 64):
         super().__init__()
+        self.embed_dim = embed_dim
+        self.window = window
+        self.overlap = overlap
         self.attn = nn.MultiheadAttention(
             embed_dim=embed_dim,
             num_heads=num_heads,
@@ -36,15 +45,37 @@ class TemporalAttention(nn.Module):
         pe[:, 1::2] = torch.cos(position * div_term)
         return pe
 
+    def _pos_enc_for(self, n: int) -> torch.Tensor:
+        """Positional encodings for n frames, growing the buffer (doubling) on demand."""
+        if n > self.pos_enc.shape[0]:
+            new_len = max(n, 2 * self.pos_enc.shape[0])
+            self.pos_enc = self._build_pos_enc(new_len, self.embed_dim).to(self.pos_enc.device)
+        return self.pos_enc[:n]
+
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         """
         x: [N x D] tensor of frame embeddings
         returns: [N x D] attended embeddings
         """
-        x = x.unsqueeze(0)                          # [1 x N x D] batch dim
-        x = x + self.pos_enc[:x.shape[1]].unsqueeze(0)  # add positional encoding
-        attended, _ = self.attn(x, x, x)            # self-attention
-        return attended.squeeze(0)                   # back to [N x D]
+        n = x.shape[0]
+        x = x + self._pos_enc_for(n)                # global positions, even when windowed
+
+        if self.window is None or n <= self.window:
+            x = x.unsqueeze(0)                      # [1 x N x D] batch dim
+            attended, _ = self.attn(x, x, x, need_weights=False)
+            return attended.squeeze(0)              # back to [N x D]
+
+        out = torch.empty_like(x)
+        for start in range(0, n, self.window):
+            end = min(start + self.window, n)
+            lo = max(0, start - self.overlap)
+            hi = min(n, end + self.overlap)
+            # block [start, end) queries its own frames plus overlap context
+            q = x[start:end].unsqueeze(0)
+            kv = x[lo:hi].unsqueeze(0)
+            attended, _ = self.attn(q, kv, kv, need_weights=False)
+            out[start:end] = attended.squeeze(0)
+        return out
 
     @torch.no_grad()
     def attend(self, vectors: np.ndarray) -> np.ndarray:
@@ -58,4 +89,4 @@ class TemporalAttention(nn.Module):
         t = torch.from_numpy(vectors).float()
         attended = self.forward(t)
         attended = attended / attended.norm(dim=-1, keepdim=True)
-        return attended.numpy().astype("float32")
\ No newline at end of file
+        return attended.numpy().astype("float32")
@@ -1,10 +1,29 @@
+from src.utils.tracing import span
+
+
 class TextRetriever:
-    def __init__(self, embedder, vectorstore, top_k: int):
+    def __init__(self, embedder, vectorstore, top_k: int,
+                 hybrid: bool = False, rrf_k: int = 60, min_relevance: float = None):
         self.embedder = embedder
         self.vectorstore = vectorstore
         self.top_k = top_k
+        # dense + BM25 fused by reciprocal rank fusion
+        self.hybrid = hybrid
+        self.rrf_k = rrf_k
+        # calibrated cutoff — only used when the store has a fitted calibrator
+        self.min_relevance = min_relevance
 
-    def retrieve(self, query: str):
-        query_vec = self.embedder.embed([query])
-        results = self.vectorstore.search(query_vec, self.top_k)
+    def retrieve(self, query: str, filters: dict = None):
+        """`filters` is applied inside the index — see FAISSStore.filter_mask."""
+        with span("embed"):
+            query_vec = self.embedder.embed([query])
+        with span("search"):
+            if self.hybrid:
+                return self.vectorstore.search_hybrid(
+                    query_vec, query, self.top_k, rrf_k=self.rrf_k, filters=filters,
+                    min_relevance=self.min_relevance,
+                )
+            results = self.vectorstore.search(
+                query_vec, self.top_k, filters=filters, min_relevance=self.min_relevance
+            )
         return results
@@ -1,41 +1,149 @@
+import time
+import heapq
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait
 from src.retrieval.text_retriever import TextRetriever
 from src.retrieval.image_retriever import ImageRetriever
 from src.schema import Document
+from src.utils.tracing import current_trace, span
+
+WORKERS_PER_MODALITY = 4
+
+
+class _ModalityPool:
+    """
+    Executor for one modality. At most `workers` searches are in flight —
+    timed-out ones still running in the background included — and a query
+    that finds no free slot skips the modality instead of queueing behind
+    abandoned work. A slow image search therefore can't starve text, and
+    never makes later queries time out while they wait in a queue.
+    """
+
+    def __init__(self, name: str, workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix=f"retrieval-{name}")
+        self.slots = threading.BoundedSemaphore(workers)
+
+    def submit(self, fn, *args):
+        """(future, started) or None when every slot is busy. started[0] = worker start time."""
+        if not self.slots.acquire(blocking=False):
+            return None
+        started = [None, threading.Event()]
+
+        def run():
+            started[0] = time.monotonic()
+            started[1].set()
+            try:
+                return fn(*args)
+            finally:
+                self.slots.release()
+
+        return self.executor.submit(run), started
+
+
+# Shared by every UnifiedRetriever — retrievers are rebuilt per query, so
+# per-instance pools would spawn threads on every request.
+_POOLS = {}
+_POOL_LOCK = threading.Lock()
+
+
+def _modality_pool(name: str) -> _ModalityPool:
+    with _POOL_LOCK:
+        if name not in _POOLS:
+            _POOLS[name] = _ModalityPool(name, WORKERS_PER_MODALITY)
+        return _POOLS[name]
 
 
 class UnifiedRetriever:
-    def __init__(self, text_retriever: TextRetriever, image_retriever: ImageRetriever = None):
+    def __init__(self, text_retriever: TextRetriever, image_retriever: ImageRetriever = None,
+                 parallel: bool = True, text_timeout: float = None, image_timeout: float = None,
+                 min_relevance: float = None):
         self.text_retriever = text_retriever
         self.image_retriever = image_retriever
+        # fan out to both modalities concurrently — FAISS and torch release the GIL
+        self.parallel = parallel
+        # seconds; None = wait indefinitely. A timed-out modality is dropped.
+        self.text_timeout = text_timeout
+        self.image_timeout = image_timeout
+        # calibrated image cutoff (text cutoff lives on the TextRetriever)
+        self.min_relevance = min_relevance
 
-    def retrieve(self, query: str) -> list[dict]:
-        results = []
+    def retrieve(self, query: str, filters: dict = None) -> list[dict]:
+        """`filters` (source / modality / page / start_time) is pushed into each index."""
+        tasks = {}
+        if self.text_retriever is not None:
+            tasks["text"] = (partial(self._retrieve_text, filters=filters), self.text_timeout)
+        if self.image_retriever is not None:
+            tasks["image"] = (partial(self._retrieve_images, filters=filters), self.image_timeout)
+
+        if self.parallel and len(tasks) > 1:
+            per_modality = self._fan_out(query, tasks)
+        else:
+            per_modality = [self._run_safely(name, fn, query) for name, (fn, _) in tasks.items()]
+
+        # Merge by score — lower is better — without reordering within a
+        # modality: each list keeps its retriever's own ranking (RRF order for
+        # hybrid text) and calibrated scores only decide the interleaving.
+        return list(heapq.merge(*per_modality, key=lambda r: r.get("score", 999)))
+
+    def _fan_out(self, query: str, tasks: dict) -> list[list[dict]]:
+        # pool threads don't inherit the caller's trace — hand it over explicitly
+        trace = current_trace()
+        run = trace.bind(self._run_safely) if trace is not None else self._run_safely
+        jobs = {}
+        for name, (fn, _) in tasks.items():
+            job = _modality_pool(name).submit(run, name, fn, query)
+            if job is None:
+                print(f"[UnifiedRetriever] {name.capitalize()} retrieval busy with timed-out "
+                      f"searches — continuing without it.")
+                continue
+            jobs[name] = job
+
+        out = []
+        for name, (future, started) in jobs.items():
+            timeout = tasks[name][1]
+            remaining = None
+            if timeout is not None:
+                # the clock starts when the search starts — a slot was free, so
+                # this wait is only thread start-up, never queueing
+                started[1].wait()
+                remaining = max(0.0, timeout - (time.monotonic() - started[0]))
+            done, _ = wait([future], timeout=remaining)
+            if done:
+                out.append(future.result())
+            else:
+                # the worker keeps running in the background; its result is discarded
+                print(f"[UnifiedRetriever] {name.capitalize()} retrieval timed out "
+                      f"after {timeout}s — continuing without it.")
+        return out
 
+    def _run_safely(self, name: str, fn, query: str) -> list[dict]:
+        try:
+            with span(f"retrieve_{name}"):
+                return fn(query)
+        except Exception as e:
+            print(f"[UnifiedRetriever] {name.capitalize()} retrieval failed: {e}")
+            return []
+
+    def _retrieve_text(self, query: str, filters: dict = None) -> list[dict]:
         # Text / Audio / Video transcript results
-        if self.text_retriever is not None:
-            try:
-                text_results = self.text_retriever.retrieve(query)
-                results.extend(text_results)
-            except Exception as e:
-                print(f"[UnifiedRetriever] Text retrieval failed: {e}")
+        return self.text_retriever.retrieve(query, filters=filters)
 
+    def _retrieve_images(self, query: str, filters: dict = None) -> list[dict]:
         # Image / Keyframe results — convert Document to dict
-        if self.image_retriever is not None:
-            try:
-                image_results = self.image_retriever.retrieve(query, top_k=3)
-                for doc in image_results:
-                    results.append({
-                        "text": doc.text,
-                        "source": doc.source,
-                        "modality": doc.modality,
-                        "score": 1 - doc.metadata.get("clip_score", 0),
-                        "section": doc.metadata.get("video_file", "image"),
-                        "page": None,
-                        "clip_score": doc.metadata.get("clip_score", 0)
-                    })
-            except Exception as e:
-                print(f"[UnifiedRetriever] Image retrieval failed: {e}")
-
-        # Sort by score — lower is better
-        results.sort(key=lambda r: r.get("score", 999))
-        return results
\ No newline at end of file
+        results = []
+        for doc in self.image_retriever.retrieve(query, top_k=3, filters=filters,
+                                                 min_relevance=self.min_relevance):
+            # calibrated relevance when available, raw CLIP cosine otherwise
+            relevance = doc.metadata.get("relevance", doc.metadata.get("clip_score", 0))
+            results.append({
+                "text": doc.text,
+                "source": doc.source,
+                "modality": doc.modality,
+                "score": 1 - relevance,
+                "section": doc.metadata.get("video_file", "image"),
+                "page": None,
+                "clip_score": doc.metadata.get("clip_score", 0)
+            })
+        return results
@@ -24,6 +24,14 @@ def compute_dir_hash(directory: str) -> str:
     return hashlib.md5(hash_input).hexdigest()
 
 
+def compute_dir_key(directory: str) -> str:
+    """
+    Stable key of a directory's location, not its contents — for indexes that
+    are updated in place as files change (see get_shard_root).
+    """
+    return "dir-" + hashlib.md5(str(Path(directory).resolve()).encode()).hexdigest()[:16]
+
+
 def get_cache_paths(cache_dir: str, source_hash: str):
     """
     Returns (index_path, meta_path) for a given source hash.
@@ -39,4 +47,36 @@ def get_cache_paths(cache_dir: str, source_hash: str):
 
 def cache_exists(cache_dir: str, source_hash: str) -> bool:
     index_path, meta_path = get_cache_paths(cache_dir, source_hash)
-    return Path(index_path).exists() and Path(meta_path).exists()
\ No newline at end of file
+    return Path(index_path).exists() and Path(meta_path).exists()
+
+
+def get_image_index_dir(cache_dir: str, source_hash: str) -> str:
+    """
+    Directory for the CLIP image index + doc store of a given source hash.
+    Sits next to the text index so both share one fingerprint.
+    """
+    path = Path(cache_dir) / source_hash / "images"
+    path.mkdir(parents=True, exist_ok=True)
+    return str(path)
+
+
+def get_shard_root(cache_dir: str, dir_key: str) -> str:
+    """
+    Root of a sharded text index. Each shard is laid out like a normal cache
+    entry under it — get_cache_paths(shard_root, shard_name) — so shards can be
+    written by separate processes and loaded or deleted one at a time.
+    Keyed by compute_dir_key(), so the root survives file changes and
+    unchanged shards are reused.
+    """
+    path = Path(cache_dir) / dir_key / "shards"
+    path.mkdir(parents=True, exist_ok=True)
+    return str(path)
+
+
+def list_shards(shard_root: str) -> list[str]:
+    """Names of the complete shards (index + metadata present) under shard_root."""
+    root = Path(shard_root)
+    if not root.exists():
+        return []
+    return sorted(p.name for p in root.iterdir()
+                  if p.is_dir() and cache_exists(shard_root, p.name))
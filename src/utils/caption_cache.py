@@ -0,0 +1,73 @@
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from PIL import Image
+
+
+def image_content_hash(image: Image.Image) -> str:
+    """
+    Hash of decoded pixel content (mode + size + raw bytes).
+    Independent of filename, container format or upload path.
+    """
+    h = hashlib.sha256()
+    h.update(f"{image.mode}|{image.width}x{image.height}|".encode())
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def caption_key(content_hash: str, model_id: str, prompt: str) -> str:
+    """Cache key = pixels + captioning model + prompt. Any change = new caption."""
+    prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()
+    return hashlib.sha256(f"{content_hash}|{model_id}|{prompt_hash}".encode()).hexdigest()
+
+
+class CaptionCache:
+    """
+    Single on-disk caption store shared by every image and video ingest.
+    SQLite table with the key as PRIMARY KEY → indexed point lookups, one file.
+    """
+
+    def __init__(self, db_path: str = "outputs/indexes/caption_cache.sqlite"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # ingestion runs in a worker thread, so allow cross-thread use behind a lock
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS captions ("
+                " key TEXT PRIMARY KEY,"
+                " caption TEXT NOT NULL,"
+                " model_id TEXT NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get_many(self, keys: list[str]) -> dict[str, str]:
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # stay under SQLite's bound-parameter limit
+            for i in range(0, len(unique), 500):
+                part = unique[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, caption FROM captions WHERE key IN "
+                    f"({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def put_many(self, entries: dict[str, str], model_id: str):
+        if not entries:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO captions (key, caption, model_id) VALUES (?, ?, ?)",
+                [(k, v, model_id) for k, v in entries.items()],
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,23 @@
+import copy
+import os
+import threading
+import yaml
+
+# path -> (mtime, parsed YAML)
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def load_yaml(path: str) -> dict:
+    """
+    Parsed YAML file, cached per process and keyed by mtime, so an edited
+    config is picked up but an unchanged one is parsed only once.
+    Returns a deep copy — callers may mutate their config freely.
+    """
+    mtime = os.path.getmtime(path)
+    with _LOCK:
+        cached = _CACHE.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path) as f:
+                cached = _CACHE[path] = (mtime, yaml.safe_load(f))
+    return copy.deepcopy(cached[1])
@@ -0,0 +1,178 @@
+import io
+import os
+import math
+import time
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+from PIL import Image
+
+from src.utils.caption_cache import image_content_hash
+
+# Qwen2-VL processor max_pixels (512 * 28 * 28). CLIP (224px) downsizes further
+# itself, so nothing larger than this ever needs to be kept.
+VLM_MAX_PIXELS = 512 * 28 * 28
+
+SHARD_SUFFIX = ".jpgshard"
+TMP_SUFFIX = ".tmp"
+
+
+@dataclass(frozen=True)
+class FrameRef:
+    """
+    Lightweight, picklable pointer to one JPEG frame inside a shard file.
+    Stored in Document.metadata["_frame_ref"] in place of a live PIL image.
+    """
+    shard: str
+    offset: int
+    length: int
+    width: int
+    height: int
+    content_hash: str
+
+    def load(self) -> Image.Image:
+        return load_frames([self])[0]
+
+
+def downscale(image: Image.Image, max_pixels: int = VLM_MAX_PIXELS) -> Image.Image:
+    """Shrink (never enlarge) so width * height <= max_pixels, keeping aspect ratio."""
+    pixels = image.width * image.height
+    if pixels <= max_pixels:
+        return image
+    scale = math.sqrt(max_pixels / pixels)
+    size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+    return image.resize(size, Image.BICUBIC)
+
+
+def load_frames(items: list) -> list[Image.Image]:
+    """
+    Resolve a batch of FrameRefs / PIL images to RGB PIL images.
+    PIL images pass through untouched; refs are read with one handle per shard.
+    """
+    handles = {}
+    out = []
+    try:
+        for item in items:
+            if not isinstance(item, FrameRef):
+                out.append(item)
+                continue
+            f = handles.get(item.shard)
+            if f is None:
+                f = handles[item.shard] = open(item.shard, "rb")
+            f.seek(item.offset)
+            img = Image.open(io.BytesIO(f.read(item.length)))
+            out.append(img.convert("RGB"))
+    finally:
+        for f in handles.values():
+            f.close()
+    return out
+
+
+def frame_hash(item) -> str:
+    """Content hash without decoding the JPEG when the item is already a FrameRef."""
+    if isinstance(item, FrameRef):
+        return item.content_hash
+    return image_content_hash(item)
+
+
+class FrameStore:
+    """
+    Append-only JPEG shard for keyframes. Frames are downscaled to the VLM input
+    size and written as they are decoded, so a long video never has all of its
+    frames in RAM at once.
+
+    Frames go to a temp file that replaces `shard_path` atomically on close —
+    an existing shard is never truncated under FrameRefs (or readers) that
+    still point into it. Refs become readable once the store is closed.
+    """
+
+    def __init__(self, shard_path: str, max_pixels: int = VLM_MAX_PIXELS, quality: int = 90):
+        self.shard_path = Path(shard_path)
+        self.shard_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_pixels = max_pixels
+        self.quality = quality
+        self._tmp_path = self.shard_path.with_name(
+            f"{self.shard_path.name}.{os.getpid()}{TMP_SUFFIX}")
+        self._f = open(self._tmp_path, "wb")
+
+    def add(self, image: Image.Image) -> FrameRef:
+        img = downscale(image.convert("RGB"), self.max_pixels)
+        content_hash = image_content_hash(img)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=self.quality)
+        data = buf.getvalue()
+
+        offset = self._f.tell()
+        self._f.write(data)
+        return FrameRef(
+            shard=str(self.shard_path),
+            offset=offset,
+            length=len(data),
+            width=img.width,
+            height=img.height,
+            content_hash=content_hash,
+        )
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+            os.replace(self._tmp_path, self.shard_path)
+
+    def abort(self):
+        """Discard a partially written shard; an existing one stays untouched."""
+        if not self._f.closed:
+            self._f.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+# ------------------------------------------------------------------
+# CLEANUP
+# ------------------------------------------------------------------
+
+
+def referenced_shards(index_root: str = "outputs/indexes") -> set[str]:
+    """
+    Resolved paths of every shard a persisted image doc store
+    (image_docs.pkl) under `index_root` still points to.
+    """
+    shards = set()
+    for path in Path(index_root).rglob("image_docs.pkl"):
+        with open(path, "rb") as f:
+            documents = pickle.load(f)
+        for doc in documents:
+            ref = doc.metadata.get("_frame_ref")
+            if isinstance(ref, FrameRef):
+                shards.add(str(Path(ref.shard).resolve()))
+    return shards
+
+
+def prune_shards(frame_dir: str = "outputs/frame_store", index_root: str = "outputs/indexes",
+                 min_age_s: float = 3600.0, dry_run: bool = False) -> list[Path]:
+    """
+    Delete shards under `frame_dir` that no persisted index references, plus
+    leftover temp files from aborted ingests. Files younger than `min_age_s`
+    are kept — an ingest in progress has not saved its index yet.
+    Returns the removed (or, with dry_run, removable) paths.
+    """
+    keep = referenced_shards(index_root)
+    cutoff = time.time() - min_age_s
+    removed = []
+    for path in sorted(Path(frame_dir).glob(f"*{SHARD_SUFFIX}*")):
+        is_tmp = path.name.endswith(TMP_SUFFIX)
+        if not is_tmp and str(path.resolve()) in keep:
+            continue
+        if path.stat().st_mtime > cutoff:
+            continue
+        if not dry_run:
+            path.unlink(missing_ok=True)
+        removed.append(path)
+    return removed
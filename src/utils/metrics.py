@@ -0,0 +1,304 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from src.utils.tracing import STAGE_HISTOGRAM
+
+# Dependency-free metrics registry rendered in the Prometheus text format
+# (version 0.0.4), so any Prometheus-compatible scraper can read /metrics.
+
+DEFAULT_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: tuple, values: tuple, extra: dict = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+        if not self.labels and self.kind != "histogram":
+            self._values[()] = 0    # unlabelled series are exported from the start
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(labels[k] for k in self.labels)
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [
+            f"{self.name}{_label_str(self.labels, key)} {_fmt(value)}" for key, value in items
+        ]
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), fn=None):
+        super().__init__(name, help, labels)
+        # unlabelled gauges may be computed at scrape time instead of set
+        self._fn = fn
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self) -> list[str]:
+        if self._fn is not None:
+            return self._header() + [f"{self.name} {_fmt(self._fn())}"]
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (),
+                 buckets: tuple = DEFAULT_BUCKETS_S):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(k, (list(c), s, n)) for k, (c, s, n) in self._values.items()]
+        lines = self._header()
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = {"le": _fmt(bound) if bound != float("inf") else "+Inf"}
+                lines.append(f"{self.name}_bucket{_label_str(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple = (), fn=None) -> Gauge:
+        return self.register(Gauge(name, help, labels, fn))
+
+    def histogram(self, name: str, help: str, labels: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS_S) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def collector(self, fn):
+        """Register fn() -> list[str] of exposition lines, called on every scrape."""
+        with self._lock:
+            self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for fn in collectors:
+            lines.extend(fn())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ------------------------------------------------------------------
+# SERVICE METRICS
+# ------------------------------------------------------------------
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "omnirag_http_requests_total", "HTTP requests handled.", ("method", "path", "status"))
+QUERIES_IN_FLIGHT = REGISTRY.gauge(
+    "omnirag_queries_in_flight", "Queries currently being answered.")
+QUERY_QUEUE_DEPTH = REGISTRY.gauge(
+    "omnirag_query_queue_depth", "Accepted queries not yet streaming tokens.")
+TTFT = REGISTRY.histogram(
+    "omnirag_time_to_first_token_seconds", "Request start to first streamed token.")
+TOKENS_GENERATED = REGISTRY.counter(
+    "omnirag_generated_tokens_total", "Tokens streamed to clients.")
+TOKENS_PER_SECOND = REGISTRY.histogram(
+    "omnirag_decode_tokens_per_second", "Decode throughput per query.",
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200))
+GENERATION_FINISHED = REGISTRY.counter(
+    "omnirag_generation_finished_total",
+    "Generations by finish reason (length = hit the max_new_tokens cap).", ("reason",))
+GENERATION_MAX_NEW_TOKENS = REGISTRY.histogram(
+    "omnirag_generation_max_new_tokens", "Output-token cap granted per generation.",
+    buckets=(32, 64, 96, 128, 192, 256, 320, 384, 512, 768, 1024))
+
+INGEST_DOCUMENTS = REGISTRY.counter(
+    "omnirag_ingest_documents_total", "Documents produced by ingestion.", ("modality",))
+INGEST_BYTES = REGISTRY.counter(
+    "omnirag_ingest_bytes_total", "Uploaded bytes ingested.", ("modality",))
+INGEST_SECONDS = REGISTRY.histogram(
+    "omnirag_ingest_duration_seconds", "Wall time per ingested file.", ("modality",),
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600))
+
+CACHE_REQUESTS = REGISTRY.counter(
+    "omnirag_cache_requests_total", "Cache lookups by outcome.", ("cache", "result"))
+
+MODEL_LOADS = REGISTRY.counter(
+    "omnirag_model_loads_total", "Model loads.", ("model",))
+MODEL_UNLOADS = REGISTRY.counter(
+    "omnirag_model_unloads_total", "Model unloads.", ("model",))
+MODEL_LOAD_SECONDS = REGISTRY.histogram(
+    "omnirag_model_load_seconds", "Model load time.", ("model",),
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120))
+MODEL_UNLOAD_SECONDS = REGISTRY.histogram(
+    "omnirag_model_unload_seconds", "Model unload time.", ("model",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10))
+
+
+def record_cache(cache: str, hits: int = 0, misses: int = 0):
+    if hits:
+        CACHE_REQUESTS.inc(hits, cache=cache, result="hit")
+    if misses:
+        CACHE_REQUESTS.inc(misses, cache=cache, result="miss")
+
+
+@contextmanager
+def track_model_load(model: str):
+    with MODEL_LOAD_SECONDS.time(model=model):
+        yield
+    MODEL_LOADS.inc(model=model)
+
+
+@contextmanager
+def track_model_unload(model: str):
+    with MODEL_UNLOAD_SECONDS.time(model=model):
+        yield
+    MODEL_UNLOADS.inc(model=model)
+
+
+def _rss_bytes() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # not Linux — fall back to peak RSS (KB on Linux, bytes on macOS)
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+REGISTRY.gauge("omnirag_process_resident_memory_bytes",
+               "Resident set size of this process.", fn=_rss_bytes)
+
+
+@REGISTRY.collector
+def _cache_hit_ratio() -> list[str]:
+    name = "omnirag_cache_hit_ratio"
+    lines = [f"# HELP {name} Hits / lookups since start.", f"# TYPE {name} gauge"]
+    caches = {}
+    with CACHE_REQUESTS._lock:
+        for (cache, result), n in CACHE_REQUESTS._values.items():
+            caches.setdefault(cache, {})[result] = n
+    for cache, counts in sorted(caches.items()):
+        total = counts.get("hit", 0) + counts.get("miss", 0)
+        ratio = counts.get("hit", 0) / total if total else 0.0
+        lines.append(f'{name}{{cache="{_escape(cache)}"}} {_fmt(ratio)}')
+    return lines
+
+
+@REGISTRY.collector
+def _generation_cap_hit_ratio() -> list[str]:
+    name = "omnirag_generation_cap_hit_ratio"
+    lines = [f"# HELP {name} Share of generations cut off by max_new_tokens.",
+             f"# TYPE {name} gauge"]
+    with GENERATION_FINISHED._lock:
+        counts = {reason: n for (reason,), n in GENERATION_FINISHED._values.items()}
+    total = sum(counts.values())
+    lines.append(f"{name} {_fmt(counts.get('length', 0) / total if total else 0.0)}")
+    return lines
+
+
+@REGISTRY.collector
+def _stage_latency() -> list[str]:
+    """Per-query stage spans (see src.utils.tracing), exported in seconds."""
+    name = "omnirag_stage_latency_seconds"
+    lines = [f"# HELP {name} Per-stage query latency from request traces.",
+             f"# TYPE {name} histogram"]
+    for stage, s in sorted(STAGE_HISTOGRAM.snapshot().items()):
+        for bound, cumulative in s["buckets"].items():
+            le = "+Inf" if bound == "+Inf" else _fmt(float(bound) / 1000)
+            lines.append(f'{name}_bucket{{stage="{_escape(stage)}",le="{le}"}} {cumulative}')
+        lines.append(f'{name}_sum{{stage="{_escape(stage)}"}} {_fmt(s["sum_ms"] / 1000)}')
+        lines.append(f'{name}_count{{stage="{_escape(stage)}"}} {s["count"]}')
+    return lines
@@ -1,20 +1,321 @@
-from transformers import AutoTokenizer
+import re
+import threading
+from pathlib import Path
+from src.generation.prompt_templates import build_prompt
 
+# ------------------------------------------------------------------
+# TOKENIZERS — one shared encode / decode / count interface
+# ------------------------------------------------------------------
 
-class TokenBudgeter:
-    def __init__(self, model_name: str, max_tokens: int):
+
+class _Tokenizer:
+    name = ""
+
+    def encode(self, text: str) -> list[int]:
+        raise NotImplementedError
+
+    def encode_batch(self, texts: list[str]) -> list[list[int]]:
+        return [self.encode(t) for t in texts]
+
+    def decode(self, ids: list[int]) -> str:
+        raise NotImplementedError
+
+    def count(self, text: str) -> int:
+        return len(self.encode(text))
+
+    def count_batch(self, texts: list[str]) -> list[int]:
+        return [len(ids) for ids in self.encode_batch(texts)]
+
+
+class HFTokenizer(_Tokenizer):
+    """A HuggingFace tokenizer. Batches go through the fast (Rust) tokenizer in one call."""
+
+    def __init__(self, model_name: str):
+        from transformers import AutoTokenizer
+        self.name = model_name
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        # used for counting and chunking, never truncation — don't warn past the model limit
+        self.tokenizer.model_max_length = int(1e30)
+
+    def encode(self, text: str) -> list[int]:
+        return self.tokenizer.encode(text, add_special_tokens=False)
+
+    def encode_batch(self, texts: list[str]) -> list[list[int]]:
+        if not texts:
+            return []
+        return self.tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+
+    def decode(self, ids: list[int]) -> str:
+        return self.tokenizer.decode(ids, skip_special_tokens=True)
+
+
+class LlamaCppTokenizer(_Tokenizer):
+    """
+    The GGUF model's own tokenizer, loaded vocab-only (no weights, no VRAM).
+    Prompt markers like <|user|> are parsed as special tokens, as llama.cpp
+    does when generating.
+    """
+
+    def __init__(self, model_path: str):
+        from llama_cpp import Llama
+        self.name = model_path
+        self.llm = Llama(model_path=model_path, vocab_only=True, verbose=False)
+
+    def encode(self, text: str) -> list[int]:
+        return self.llm.tokenize(text.encode("utf-8"), add_bos=False, special=True)
+
+    def decode(self, ids: list[int]) -> str:
+        return self.llm.detokenize(ids).decode("utf-8", errors="ignore")
+
+
+# ------------------------------------------------------------------
+# REGISTRY — one cached instance per model, per process
+# ------------------------------------------------------------------
+
+_TOKENIZERS = {}
+_LOCK = threading.Lock()
+
+
+def _cached(key: tuple, factory) -> _Tokenizer:
+    with _LOCK:
+        tokenizer = _TOKENIZERS.get(key)
+        if tokenizer is None:
+            tokenizer = _TOKENIZERS[key] = factory()
+            print(f"[Tokenizers] Loaded {key[0]} tokenizer: {key[1]}")
+        return tokenizer
+
+
+def get_tokenizer(model_name: str) -> HFTokenizer:
+    return _cached(("hf", model_name), lambda: HFTokenizer(model_name))
+
+
+def get_generation_tokenizer(model_config: dict, fallback: str) -> _Tokenizer:
+    """
+    Tokenizer of the model that actually consumes the prompt: the GGUF vocab
+    for llamacpp, the HF tokenizer for huggingface. The stub backend (or a
+    missing GGUF file) falls back to the `fallback` HF tokenizer.
+    """
+    backend = model_config.get("backend", "huggingface")
+    if backend == "llamacpp" and Path(model_config.get("model_path", "")).exists():
+        path = model_config["model_path"]
+        return _cached(("gguf", path), lambda: LlamaCppTokenizer(path))
+    if backend == "huggingface":
+        return get_tokenizer(model_config.get("model_name", "google/flan-t5-base"))
+    return get_tokenizer(fallback)
+
+
+def prompt_token_limit(model_config: dict, max_new_tokens: int) -> int:
+    """
+    Prompt tokens the generator can take: its n_ctx minus room for the answer.
+    Encoder-decoder (T5) models read the prompt into their own encoder window,
+    so nothing is reserved there.
+    """
+    n_ctx = model_config.get("n_ctx", 4096)
+    if (model_config.get("backend", "huggingface") == "huggingface"
+            and "t5" in model_config.get("model_name", "google/flan-t5-base").lower()):
+        return n_ctx
+    return n_ctx - max_new_tokens
+
+
+# ------------------------------------------------------------------
+# BUDGET
+# ------------------------------------------------------------------
+
+
+class TokenBudgeter:
+    """
+    Packs ranked context chunks into build_prompt() without exceeding
+    max_tokens, counted with the generator's tokenizer. The first chunk that
+    doesn't fit is truncated into the remaining space if more than `min_tail`
+    tokens are left.
+    """
+
+    def __init__(self, tokenizer: _Tokenizer, max_tokens: int, min_tail: int = 50):
+        self.tokenizer = tokenizer
         self.max_tokens = max_tokens
+        self.min_tail = min_tail
 
     def select_contexts(self, contexts: list[str], question: str) -> list[str]:
-        selected = []
-        total_tokens = len(self.tokenizer.encode(question))
+        labels = [f"[CONTEXT CHUNK {i + 1}]\n" for i in range(len(contexts))]
+        counts = self.tokenizer.count_batch([l + c for l, c in zip(labels, contexts)])
+        sep = self.tokenizer.count("\n\n")
 
-        for ctx in contexts:
-            ctx_tokens = len(self.tokenizer.encode(ctx))
-            if total_tokens + ctx_tokens > self.max_tokens:
+        selected = []
+        used = self.tokenizer.count(build_prompt([], question))
+        for label, ctx, n in zip(labels, contexts, counts):
+            cost = n + (sep if selected else 0)
+            if used + cost > self.max_tokens:
+                available = (self.max_tokens - used - self.tokenizer.count(label)
+                             - (sep if selected else 0))
+                if available > self.min_tail:
+                    ids = self.tokenizer.encode(ctx)[:available]
+                    selected.append(label + self.tokenizer.decode(ids))
                 break
-            selected.append(ctx)
-            total_tokens += ctx_tokens
+            selected.append(label + ctx)
+            used += cost
+
+        return self._trim(selected, question)
+
+    def _trim(self, selected: list[str], question: str) -> list[str]:
+        """Counts aren't exactly additive across joins — check the real prompt once."""
+        while selected and self.tokenizer.count(build_prompt(selected, question)) > self.max_tokens:
+            selected.pop()
+        return selected
+
+
+# ------------------------------------------------------------------
+# PACKING
+# ------------------------------------------------------------------
+
+_WORD = re.compile(r"\w+")
+
+
+def _overlap(a: str, b: str, min_chars: int = 20) -> int:
+    """Length of the longest tail of `a` that `b` starts with (>= min_chars), else 0."""
+    probe = b[:min_chars]
+    if len(probe) < min_chars:
+        return 0
+    i = a.find(probe)
+    while i != -1:
+        if b.startswith(a[i:]):
+            return len(a) - i
+        i = a.find(probe, i + 1)
+    return 0
 
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class ContextPacker(TokenBudgeter):
+    """
+    Budget packing over ranked retrieval results:
+      1. merge  — same-source, same-page chunks that overlap (TokenChunker's
+                  token overlap) or are consecutive (chunk_index) become one
+                  contiguous span, ranked as its best part; a consecutive
+                  chunk's `overlap_tokens` (counted with `chunk_tokenizer`,
+                  the chunker's model) are dropped even when the decoded
+                  text doesn't match as a string
+      2. dedupe — near-identical caption / transcript chunks (word-set
+                  Jaccard >= dedupe_threshold) keep only the best-ranked one
+      3. pack   — spans go in in rank order; one that doesn't fit is skipped
+                  for the next-best that does, and the first skipped span is
+                  truncated into whatever is left at the end
+    """
+
+    DEDUPE_MODALITIES = ("image", "video", "audio")
+
+    def __init__(self, tokenizer: _Tokenizer, max_tokens: int, min_tail: int = 50,
+                 merge_adjacent: bool = True, dedupe_threshold: float = 0.85,
+                 chunk_tokenizer: str = None):
+        super().__init__(tokenizer, max_tokens, min_tail)
+        self.merge_adjacent = merge_adjacent
+        self.dedupe_threshold = dedupe_threshold
+        # model name; resolved from the registry only when a merge needs it
+        self.chunk_tokenizer = chunk_tokenizer
+        self.last_stats = {}
+
+    def pack(self, results: list[dict], question: str) -> list[str]:
+        spans = [dict(r, _rank=i) for i, r in enumerate(results)]
+        if self.merge_adjacent:
+            spans = self._merge(spans)
+        n_merged = len(spans)
+        if self.dedupe_threshold is not None:
+            spans = self._dedupe(spans)
+
+        texts = [s["text"] for s in spans]
+        counts = self.tokenizer.count_batch(texts)
+        sep = self.tokenizer.count("\n\n")
+        # two-digit label as the per-chunk bound; _trim settles the rest
+        label = self.tokenizer.count("[CONTEXT CHUNK 10]\n")
+
+        chosen, skipped = [], []
+        used = self.tokenizer.count(build_prompt([], question))
+        for text, n in zip(texts, counts):
+            cost = n + label + (sep if chosen else 0)
+            if used + cost <= self.max_tokens:
+                chosen.append(text)
+                used += cost
+            else:
+                skipped.append(text)
+
+        truncated = False
+        if skipped:
+            available = self.max_tokens - used - label - (sep if chosen else 0)
+            if available > self.min_tail:
+                chosen.append(self.tokenizer.decode(self.tokenizer.encode(skipped[0])[:available]))
+                truncated = True
+
+        selected = self._trim(
+            [f"[CONTEXT CHUNK {i + 1}]\n{t}" for i, t in enumerate(chosen)], question
+        )
+        self.last_stats = {
+            "candidates": len(results),
+            "merged": len(results) - n_merged,
+            "deduped": n_merged - len(spans),
+            "packed": len(selected),
+            "skipped": len(skipped) - int(truncated),
+            "truncated": truncated,
+            "budget": self.max_tokens,
+        }
         return selected
+
+    def _merge(self, spans: list[dict]) -> list[dict]:
+        groups = {}
+        for s in spans:
+            groups.setdefault((s.get("source"), s.get("page")), []).append(s)
+
+        merged = []
+        for group in groups.values():
+            # document order when the index carries chunk_index, rank order otherwise
+            if all(s.get("chunk_index") is not None for s in group):
+                group.sort(key=lambda s: s["chunk_index"])
+            current = group[0]
+            for nxt in group[1:]:
+                joined = self._join(current, nxt)
+                if joined is None:
+                    merged.append(current)
+                    current = nxt
+                else:
+                    current = joined
+            merged.append(current)
+        return sorted(merged, key=lambda s: s["_rank"])
+
+    def _join(self, a: dict, b: dict):
+        """One span covering a and b if they overlap or are consecutive, else None."""
+        ta, tb = a["text"], b["text"]
+        if tb in ta:
+            text = ta
+        elif ta in tb:
+            text = tb
+        elif _overlap(ta, tb):
+            text = ta + tb[_overlap(ta, tb):]
+        elif a.get("chunk_index") is None and _overlap(tb, ta):
+            text = tb + ta[_overlap(tb, ta):]
+        elif (a.get("chunk_index") is not None and b.get("chunk_index") is not None
+              and b["chunk_index"] == a["chunk_index"] + 1):
+            text = ta + " " + self._strip_overlap(b)
+        else:
+            return None
+        best = a if a["_rank"] <= b["_rank"] else b
+        return {**best, "text": text, "_rank": best["_rank"],
+                "chunk_index": b.get("chunk_index")}
+
+    def _strip_overlap(self, chunk: dict) -> str:
+        """`chunk`'s text without the leading tokens it repeats from its predecessor."""
+        n = chunk.get("overlap_tokens")
+        if not n or self.chunk_tokenizer is None:
+            return chunk["text"]
+        tokenizer = get_tokenizer(self.chunk_tokenizer)
+        return tokenizer.decode(tokenizer.encode(chunk["text"])[n:])
+
+    def _dedupe(self, spans: list[dict]) -> list[dict]:
+        kept, seen = [], []
+        for s in spans:
+            if s.get("modality") in self.DEDUPE_MODALITIES:
+                words = set(_WORD.findall(s["text"].lower()))
+                if any(_jaccard(words, w) >= self.dedupe_threshold for w in seen):
+                    continue
+                seen.append(words)
+            kept.append(s)
+        return kept
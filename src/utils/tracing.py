@@ -0,0 +1,181 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Active trace for the current query. Thread pools don't inherit contextvars,
+# so work handed to another thread is wrapped with Trace.bind().
+_CURRENT = contextvars.ContextVar("omnirag_trace", default=None)
+
+
+class Trace:
+    """
+    Per-query timing record built from named spans on a monotonic clock.
+
+        trace = Trace()
+        with trace.activate():
+            with span("embed"):
+                ...
+        trace.finish()   # → {"embed": 3.1, ..., "total": 812.4}  (ms)
+
+    Spans with the same name are summed. `mark(name)` records the time since
+    the trace started (e.g. first_token = TTFT). `count(name, n)` tracks
+    non-time quantities such as generated tokens.
+    """
+
+    def __init__(self):
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counts = {}
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    def add(self, name: str, start: float, end: float):
+        """Record a span from two perf_counter() readings."""
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + (end - start) * 1000
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter())
+
+    def mark(self, name: str):
+        with self._lock:
+            self.stages.setdefault(name, self.elapsed_ms())
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    @contextmanager
+    def activate(self):
+        token = _CURRENT.set(self)
+        try:
+            yield self
+        finally:
+            _CURRENT.reset(token)
+
+    def bind(self, fn):
+        """Wrap `fn` so it runs with this trace active, in whatever thread calls it."""
+        def run(*args, **kwargs):
+            with self.activate():
+                return fn(*args, **kwargs)
+        return run
+
+    def timings(self) -> dict:
+        with self._lock:
+            out = {k: round(v, 2) for k, v in self.stages.items()}
+        out["total"] = round(self.elapsed_ms(), 2)
+        return out
+
+    def finish(self) -> dict:
+        """Final timings; also folded into the process-wide STAGE_HISTOGRAM."""
+        timings = self.timings()
+        STAGE_HISTOGRAM.observe_many(timings)
+        return timings
+
+
+def current_trace():
+    return _CURRENT.get()
+
+
+@contextmanager
+def span(name: str):
+    """Time a block under the active trace; a no-op when nothing is being traced."""
+    trace = _CURRENT.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name):
+        yield
+
+
+def traced_iter(trace: Trace, iterable):
+    """
+    Yield from `iterable` with `trace` active only while it produces each item,
+    so a traced generator doesn't leak the trace into its consumer.
+    """
+    it = iter(iterable)
+    while True:
+        with trace.activate():
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+class LatencyHistogram:
+    """
+    Thread-safe fixed-bucket histogram per stage, in milliseconds.
+    Cheap enough to update on every query; quantiles are bucket estimates.
+    """
+
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+    def __init__(self, buckets_ms: tuple = BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, stage: str, ms: float):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                # last slot = overflow (> largest bucket)
+                entry = self._stages[stage] = {
+                    "counts": [0] * (len(self.buckets_ms) + 1), "sum": 0.0, "n": 0,
+                }
+            entry["counts"][bisect.bisect_left(self.buckets_ms, ms)] += 1
+            entry["sum"] += ms
+            entry["n"] += 1
+
+    def observe_many(self, timings: dict):
+        for stage, ms in timings.items():
+            self.observe(stage, ms)
+
+    def _quantile(self, counts: list[int], n: int, q: float):
+        """Upper bound of the bucket holding quantile q; None = overflow bucket."""
+        target, seen = q * n, 0
+        for i, c in enumerate(counts):
+            seen += c
+            if seen >= target:
+                return float(self.buckets_ms[i]) if i < len(self.buckets_ms) else None
+        return None
+
+    def snapshot(self) -> dict:
+        """{stage: {count, sum_ms, mean_ms, p50_ms, p95_ms, p99_ms, buckets}}"""
+        with self._lock:
+            stages = {k: {"counts": list(v["counts"]), "sum": v["sum"], "n": v["n"]}
+                      for k, v in self._stages.items()}
+        out = {}
+        for stage, e in stages.items():
+            n = e["n"]
+            out[stage] = {
+                "count": n,
+                "sum_ms": round(e["sum"], 2),
+                "mean_ms": round(e["sum"] / n, 2) if n else 0.0,
+                "p50_ms": self._quantile(e["counts"], n, 0.50),
+                "p95_ms": self._quantile(e["counts"], n, 0.95),
+                "p99_ms": self._quantile(e["counts"], n, 0.99),
+                # cumulative counts per upper bound, "+Inf" last
+                "buckets": dict(zip(
+                    [str(b) for b in self.buckets_ms] + ["+Inf"],
+                    [sum(e["counts"][:i + 1]) for i in range(len(e["counts"]))],
+                )),
+            }
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+STAGE_HISTOGRAM = LatencyHistogram()
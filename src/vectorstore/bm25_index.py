@@ -0,0 +1,174 @@
+import re
+import pickle
+from collections import Counter
+import numpy as np
+
+# keeps part numbers / versions together: "xj-220", "v1.2", "iso_9001"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for",
+    "from", "how", "in", "is", "it", "of", "on", "or", "that", "the", "this",
+    "to", "was", "were", "what", "when", "where", "which", "who", "why", "with",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class _FieldIndex:
+    """
+    One BM25 field stored CSR-style: postings for term t are
+    doc_ids[offsets[t]:offsets[t+1]] with matching term frequencies in tfs.
+    """
+
+    def __init__(self, docs_tokens: list[list[str]], vocab: dict[str, int]):
+        n_docs = len(docs_tokens)
+        term_ids, doc_ids, tfs = [], [], []
+        lengths = np.zeros(n_docs, dtype=np.float32)
+
+        for doc_id, tokens in enumerate(docs_tokens):
+            lengths[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+        self.tfs = np.asarray(tfs, dtype=np.float32)[order]
+        counts = np.bincount(term_ids, minlength=len(vocab))
+        self.offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+
+        self.lengths = lengths
+        self.avg_len = float(lengths.mean()) if n_docs and lengths.mean() > 0 else 1.0
+        self.n_docs = n_docs
+
+    def df(self, t: int) -> int:
+        if t + 1 >= len(self.offsets):
+            return 0  # term only seen in the other field
+        return int(self.offsets[t + 1] - self.offsets[t])
+
+    def score_into(self, scores: np.ndarray, term_ids: list[int],
+                   k1: float, b: float, weight: float, stats: tuple = None):
+        """
+        `stats` = (n_docs, avg_len, {term_id: df}) from a larger corpus this
+        field is one part of; None uses this field's own statistics.
+        """
+        n_docs, avg_len, dfs = stats if stats is not None else (self.n_docs, self.avg_len, None)
+        norm = k1 * (1 - b + b * self.lengths / avg_len)
+        for t in term_ids:
+            if self.df(t) == 0:
+                continue
+            lo, hi = self.offsets[t], self.offsets[t + 1]
+            ids, tf = self.doc_ids[lo:hi], self.tfs[lo:hi]
+            df = dfs[t] if dfs is not None else hi - lo
+            idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            scores[ids] += weight * idf * tf * (k1 + 1) / (tf + norm[ids])
+
+
+class BM25Index:
+    """
+    Compact inverted index over chunk text plus section headings.
+    Built once at ingest time and persisted next to the FAISS index.
+    Section matches are weighted by `section_weight` — this replaces the old
+    word-overlap "section bias" with an indexed field.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, section_weight: float = 0.5):
+        self.k1 = k1
+        self.b = b
+        self.section_weight = section_weight
+        self.vocab = {}
+        self.body = None
+        self.section = None
+
+    @classmethod
+    def build(cls, metadata: list[dict], **kwargs) -> "BM25Index":
+        index = cls(**kwargs)
+        index.body = _FieldIndex([tokenize(m.get("text") or "") for m in metadata], index.vocab)
+        index.section = _FieldIndex([tokenize(m.get("section") or "") for m in metadata], index.vocab)
+        return index
+
+    def __len__(self) -> int:
+        return self.body.n_docs if self.body is not None else 0
+
+    def corpus_stats(self, query: str) -> dict:
+        """
+        Per-field (n_docs, total_len, {term: df}) for the query's terms — the
+        parts merge_corpus_stats() adds up across shards.
+        """
+        terms = [t for t in set(tokenize(query)) if t in self.vocab]
+        return {
+            name: (field.n_docs, float(field.lengths.sum()),
+                   {t: field.df(self.vocab[t]) for t in terms})
+            for name, field in (("body", self.body), ("section", self.section))
+        }
+
+    def search(self, query: str, k: int, mask: np.ndarray = None,
+               stats: dict = None) -> list[tuple[int, float]]:
+        """
+        Top-k (doc_id, bm25_score) pairs, best first. Zero-score docs are omitted.
+        `mask` (bool per doc) restricts the result to a filtered subset.
+        `stats` (from merge_corpus_stats) scores against corpus-wide document
+        frequencies and lengths, so scores from several indexes compare.
+        """
+        term_ids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not term_ids or len(self) == 0:
+            return []
+
+        field_stats = {"body": None, "section": None}
+        if stats is not None:
+            for name, (n_docs, avg_len, dfs) in stats.items():
+                field_stats[name] = (n_docs, avg_len,
+                                     {self.vocab[t]: df for t, df in dfs.items() if t in self.vocab})
+
+        scores = np.zeros(len(self), dtype=np.float32)
+        self.body.score_into(scores, term_ids, self.k1, self.b, 1.0, field_stats["body"])
+        self.section.score_into(scores, term_ids, self.k1, self.b, self.section_weight,
+                                field_stats["section"])
+        if mask is not None:
+            scores[~mask] = 0.0
+
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def merge_corpus_stats(parts: list[dict]) -> dict:
+    """Sum BM25Index.corpus_stats() of disjoint indexes into corpus-wide (n_docs, avg_len, dfs)."""
+    merged = {}
+    for name in ("body", "section"):
+        n_docs, total_len, dfs = 0, 0.0, Counter()
+        for part in parts:
+            n, length, df = part[name]
+            n_docs += n
+            total_len += length
+            dfs.update(df)
+        avg_len = total_len / n_docs if n_docs and total_len > 0 else 1.0
+        merged[name] = (n_docs, avg_len, dict(dfs))
+    return merged
+
+
+def reciprocal_rank_fusion(rankings: list[list[int]], k: int = 60) -> list[tuple[int, float]]:
+    """Fuse several best-first id lists: score(id) = sum 1 / (k + rank)."""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda x: -x[1])
@@ -1,42 +1,380 @@
 import pickle
 import faiss
 import numpy as np
+from pathlib import Path
+from src.vectorstore.bm25_index import BM25Index, reciprocal_rank_fusion
+from src.vectorstore.score_calibration import ScoreCalibrator
+
+
+def _lexical_path(meta_path: str) -> Path:
+    # persisted next to the FAISS index inside the same cache dir
+    return Path(meta_path).with_name("bm25.pkl")
+
+
+def _calibration_path(meta_path: str) -> Path:
+    return Path(meta_path).with_name("calibration.pkl")
+
+
+def _exact_path(meta_path: str) -> Path:
+    return Path(meta_path).with_name("vectors.npy")
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype="float32").copy()
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+# scalar-quantized storage: 2 bytes / dim (fp16) or 1 byte / dim (int8) vs 4 for float32
+STORAGE_TYPES = {
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+
+def build_flat_index(dim: int, metric: str = "l2", storage: str = "float32"):
+    """Exhaustive index for `metric` ("l2" | "cosine") with float32 / fp16 / int8 codes."""
+    if storage == "float32":
+        return faiss.IndexFlatIP(dim) if metric == "cosine" else faiss.IndexFlatL2(dim)
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"Unknown vector storage '{storage}'. "
+                         f"Use float32, {', '.join(STORAGE_TYPES)}.")
+    faiss_metric = faiss.METRIC_INNER_PRODUCT if metric == "cosine" else faiss.METRIC_L2
+    return faiss.IndexScalarQuantizer(dim, STORAGE_TYPES[storage], faiss_metric)
+
+
+def storage_of(index) -> str:
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        for name, qtype in STORAGE_TYPES.items():
+            if index.sq.qtype == qtype:
+                return name
+    return "float32"
+
+
+def sample_vectors(index, max_docs: int = 4096, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (ids, float32 rows) for up to max_docs random stored vectors — decodes
+    only the sample, so fp16 / int8 stores are never expanded in full.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.sort(rng.choice(index.ntotal, min(max_docs, index.ntotal), replace=False))
+    return ids, index.reconstruct_batch(ids)
+
+
+def exact_rerank(query_vector: np.ndarray, ids: np.ndarray, vectors: np.ndarray,
+                 metric: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Re-score candidate `ids` against full-precision `vectors` (may be a memmap)
+    and return the best k as (raw, ids) in FAISS conventions: cosine → similarity
+    (desc), l2 → squared distance (asc).
+    """
+    ids = ids[ids >= 0]
+    if ids.size == 0:
+        return np.zeros(0, dtype=np.float32), ids
+    rows = np.asarray(vectors[np.sort(ids)], dtype=np.float32)
+    ids = np.sort(ids)
+    q = query_vector[0]
+    if metric == "cosine":
+        raw = rows @ q
+        order = np.argsort(-raw)[:k]
+    else:
+        raw = np.sum((rows - q) ** 2, axis=1)
+        order = np.argsort(raw)[:k]
+    return raw[order].astype(np.float32), ids[order]
 
 
 class FAISSStore:
+    """
+    metric="l2"     — IndexFlatL2 on raw vectors (original behaviour).
+    metric="cosine" — IndexFlatIP on L2-normalized vectors (normalized on add
+                      and at query time).
+
+    storage="fp16" / "int8" keeps vectors scalar-quantized (IndexScalarQuantizer).
+    exact_rerank=N > 0 additionally keeps float32 copies on disk (memory-mapped
+    after load) and re-scores the top k * N quantized candidates exactly.
 
-    def __init__(self, dim: int):
-        self.index = faiss.IndexFlatL2(dim)
+    With a fitted calibrator, `score` is 1 - relevance on the shared [0, 1]
+    scale (see ScoreCalibrator) and cutoffs use `min_relevance`; otherwise
+    `score` is the raw L2 distance / (1 - cosine) and cutoffs use `threshold`.
+    """
+
+    def __init__(self, dim: int, metric: str = "l2", storage: str = "float32",
+                 exact_rerank: int = 0):
+        self.metric = metric
+        self.storage = storage
+        self.index = build_flat_index(dim, metric, storage)
+        # exact re-rank only makes sense on top of quantized codes
+        self.exact_rerank = exact_rerank if storage != "float32" else 0
+        self._exact = None
         self.metadata = []
+        self.lexical = None
+        self.calibrator = None
+        self._fields = None
 
     def add(self, vectors: np.ndarray, metadatas: list[dict]):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if self.metric == "cosine":
+            vectors = _normalized(vectors)
+        if not self.index.is_trained:
+            # int8 learns per-dimension ranges from the first batch
+            self.index.train(vectors)
+        if self.exact_rerank:
+            self._exact = vectors if self._exact is None \
+                else np.vstack([np.asarray(self._exact), vectors])
         self.index.add(vectors)
         self.metadata.extend(metadatas)
+        self.lexical = None  # stale — rebuilt by build_lexical_index()
+        self.calibrator = None  # stale — refit by fit_calibration()
+        self._fields = None
+
+    def fit_calibration(self):
+        """Fit the raw-score → relevance calibrator on a sample of the stored vectors."""
+        _, vectors = sample_vectors(self.index)
+        calibrator = ScoreCalibrator().fit(vectors, vectors, metric=self.metric)
+        # too few chunks for a background distribution — raw scores stay in charge
+        self.calibrator = calibrator if calibrator.fitted else None
 
-    def search(self, query_vector: np.ndarray, k: int, threshold: float = 2.0) -> list[dict]:
-        distances, indices = self.index.search(query_vector, k)
+    # ------------------------------------------------------------------
+    # FILTERS
+    # ------------------------------------------------------------------
 
-        results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx < len(self.metadata) and dist < threshold:
-                results.append({
-                    **self.metadata[idx],
-                    "score": float(dist),   # lower = more similar (L2)
-                })
+    def _filter_fields(self) -> dict:
+        """
+        Per-source / per-modality id arrays plus page and start_time columns,
+        computed once per store so a filter is a few vectorized ops.
+        """
+        if self._fields is None:
+            by_source, by_modality = {}, {}
+            for i, m in enumerate(self.metadata):
+                by_source.setdefault(m.get("source"), []).append(i)
+                by_modality.setdefault(m.get("modality"), []).append(i)
+
+            def as_float(key):
+                return np.array(
+                    [np.nan if m.get(key) is None else float(m[key]) for m in self.metadata],
+                    dtype=np.float64,
+                )
+
+            self._fields = {
+                "source": {k: np.asarray(v, dtype=np.int64) for k, v in by_source.items()},
+                "modality": {k: np.asarray(v, dtype=np.int64) for k, v in by_modality.items()},
+                "page": as_float("page"),
+                "start_time": as_float("start_time"),
+            }
+        return self._fields
+
+    def filter_mask(self, filters: dict) -> np.ndarray:
+        """
+        Boolean mask over stored ids. Supported keys (all optional, AND-ed):
+            source:     str or list[str]  — exact source values
+            modality:   str or list[str]
+            page:       (min, max)        — inclusive; chunks without a page are excluded
+            start_time: (min, max)        — seconds, inclusive; None = open bound
+        """
+        fields = self._filter_fields()
+        n = len(self.metadata)
+        mask = np.ones(n, dtype=bool)
+
+        for key in ("source", "modality"):
+            wanted = filters.get(key)
+            if wanted is None:
+                continue
+            if isinstance(wanted, str):
+                wanted = [wanted]
+            keep = np.zeros(n, dtype=bool)
+            for value in wanted:
+                ids = fields[key].get(value)
+                if ids is not None:
+                    keep[ids] = True
+            mask &= keep
+
+        for key in ("page", "start_time"):
+            bounds = filters.get(key)
+            if bounds is None:
+                continue
+            lo, hi = bounds
+            col = fields[key]
+            keep = ~np.isnan(col)
+            if lo is not None:
+                keep &= col >= lo
+            if hi is not None:
+                keep &= col <= hi
+            mask &= keep
+
+        return mask
+
+    def _search_params(self, mask: np.ndarray):
+        # FAISS reads bit i of the bitmap as (bits[i >> 3] >> (i & 7)) & 1
+        bits = np.packbits(mask, bitorder="little")
+        return faiss.SearchParameters(sel=faiss.IDSelectorBitmap(bits))
+
+    def build_lexical_index(self):
+        """Build the BM25 inverted index over chunk text + section headings."""
+        self.lexical = BM25Index.build(self.metadata)
+        print(f"[INFO] BM25 index built over {len(self.lexical)} chunks "
+              f"({len(self.lexical.vocab)} terms).")
+
+    def _query(self, query_vector: np.ndarray) -> np.ndarray:
+        query_vector = np.ascontiguousarray(query_vector, dtype="float32")
+        return _normalized(query_vector) if self.metric == "cosine" else query_vector
+
+    def relevance(self, query_vector: np.ndarray, ids: list[int]) -> np.ndarray:
+        """
+        Calibrated dense relevance of specific ids — also for hits that only
+        the BM25 branch found. Requires a fitted calibrator.
+        """
+        query_vector = self._query(query_vector)
+        ids = np.asarray(ids, dtype=np.int64)
+        if ids.size == 0:
+            return np.zeros(0, dtype=np.float32)
+        if self._exact is not None:
+            rows = np.asarray(self._exact[ids], dtype=np.float32)
+        else:
+            rows = self.index.reconstruct_batch(ids)
+        q = query_vector[0]
+        raw_hib = rows @ q if self.metric == "cosine" else -np.sum((rows - q) ** 2, axis=1)
+        return self.calibrator(raw_hib)
+
+    def _dense(self, query_vector: np.ndarray, k: int, threshold: float,
+               mask: np.ndarray = None, min_relevance: float = None) -> list[tuple[int, float]]:
+        """(id, score) pairs, lower score = better, already cut off."""
+        query_vector = self._query(query_vector)
+        fetch = k * self.exact_rerank if self._exact is not None else k
+        if mask is None:
+            distances, indices = self.index.search(query_vector, fetch)
+        else:
+            # filter inside FAISS — true top-k within the subset, not post-filtered
+            distances, indices = self.index.search(
+                query_vector, fetch, params=self._search_params(mask)
+            )
+        raw, ids = distances[0], indices[0]
+        if self._exact is not None:
+            raw, ids = exact_rerank(query_vector, ids, self._exact, self.metric, k)
+        valid = (ids >= 0) & (ids < len(self.metadata))
+
+        # higher-is-better raw score, as the calibrator expects
+        raw_hib = raw if self.metric == "cosine" else -raw
+        if self.calibrator is not None:
+            relevance = self.calibrator(raw_hib)
+            scores = 1.0 - relevance
+            keep = valid & (relevance >= (min_relevance or 0.0))
+        else:
+            scores = 1.0 - raw if self.metric == "cosine" else raw
+            keep = valid & (scores < threshold)
+
+        return [(int(i), float(sc)) for i, sc in zip(ids[keep], scores[keep])]
+
+    def search(self, query_vector: np.ndarray, k: int, threshold: float = 2.0,
+               filters: dict = None, min_relevance: float = None) -> list[dict]:
+        mask = self.filter_mask(filters) if filters else None
+        if mask is not None and not mask.any():
+            return []
+        results = [
+            {
+                **self.metadata[idx],
+                "score": score,   # lower = more similar
+            }
+            for idx, score in self._dense(query_vector, k, threshold, mask, min_relevance)
+        ]
 
         results.sort(key=lambda x: x["score"])
         return results
 
+    def search_hybrid(self, query_vector: np.ndarray, query_text: str, k: int,
+                      threshold: float = 2.0, rrf_k: int = 60,
+                      candidates: int = None, filters: dict = None,
+                      min_relevance: float = None) -> list[dict]:
+        """
+        Dense + BM25 candidates fused by reciprocal rank fusion.
+
+        Results are in fused (rrf_score) order. `min_relevance` only cuts the
+        dense branch before fusion — an exact keyword hit that BM25 ranks is
+        never dropped for weak embedding similarity.
+
+        With a fitted calibrator `score` is on the calibrated scale image hits
+        are merged on: the calibrated dense relevances of the fused hits
+        (computed directly for BM25-only hits), handed out best-first along
+        the fused order so `score` never contradicts rrf_score. Uncalibrated,
+        `score` is 1 - rrf / max_rrf in [0, 1].
+        The per-branch values are kept as `dense_score` and `bm25_score`.
+        """
+        if self.lexical is None:
+            self.build_lexical_index()
+        candidates = candidates or max(4 * k, 20)
+        mask = self.filter_mask(filters) if filters else None
+        if mask is not None and not mask.any():
+            return []
+
+        dense = self._dense(query_vector, candidates, threshold, mask, min_relevance)
+        keyword = self.lexical.search(query_text, candidates, mask=mask)
+
+        dense_scores = dict(dense)
+        bm25_scores = dict(keyword)
+        fused = reciprocal_rank_fusion(
+            [[i for i, _ in dense], [i for i, _ in keyword]], k=rrf_k
+        )[:k]
+
+        if self.calibrator is not None:
+            relevance = self.relevance(query_vector, [idx for idx, _ in fused])
+            scores = 1.0 - np.sort(relevance)[::-1]
+        else:
+            max_rrf = 2.0 / (rrf_k + 1)
+            scores = [1.0 - rrf / max_rrf for _, rrf in fused]
+
+        return [
+            {
+                **self.metadata[idx],
+                "score": float(score),
+                "rrf_score": rrf,
+                "dense_score": dense_scores.get(idx),
+                "bm25_score": bm25_scores.get(idx),
+            }
+            for (idx, rrf), score in zip(fused, scores)
+        ]
+
     def save(self, index_path: str, meta_path: str):
         faiss.write_index(self.index, index_path)
         with open(meta_path, "wb") as f:
             pickle.dump(self.metadata, f)
+        if self.lexical is not None:
+            self.lexical.save(str(_lexical_path(meta_path)))
+        if self.calibrator is not None:
+            self.calibrator.save(str(_calibration_path(meta_path)))
+        else:
+            _calibration_path(meta_path).unlink(missing_ok=True)
+        if self._exact is not None:
+            np.save(_exact_path(meta_path), np.asarray(self._exact))
         print(f"[INFO] Index saved → {index_path}")
 
     @classmethod
-    def load(cls, index_path: str, meta_path: str) -> "FAISSStore":
+    def load(cls, index_path: str, meta_path: str, exact_rerank: int = 0) -> "FAISSStore":
         store = cls.__new__(cls)
         store.index = faiss.read_index(index_path)
+        store.storage = storage_of(store.index)
+        # full-precision copies stay on disk; only re-ranked rows are paged in
+        exact_path = _exact_path(meta_path)
+        exact = (np.load(exact_path, mmap_mode="r")
+                 if exact_rerank and store.storage != "float32" and exact_path.exists()
+                 else None)
+        # a stale or partial copy would re-rank against the wrong rows — and
+        # later adds must not grow a misaligned one, so exact rerank goes off
+        use_exact = exact is not None and exact.shape[0] == store.index.ntotal
+        if exact is not None and not use_exact:
+            print(f"[WARN] {exact_path} has {exact.shape[0]} rows, index has "
+                  f"{store.index.ntotal} — exact rerank disabled.")
+        store.exact_rerank = exact_rerank if use_exact else 0
+        store._exact = exact if use_exact else None
         with open(meta_path, "rb") as f:
             store.metadata = pickle.load(f)
-        return store
\ No newline at end of file
+        # caches written before BM25 existed get it built on first hybrid search
+        lexical_path = _lexical_path(meta_path)
+        store.lexical = BM25Index.load(str(lexical_path)) if lexical_path.exists() else None
+        calibration_path = _calibration_path(meta_path)
+        store.calibrator = (ScoreCalibrator.load(str(calibration_path))
+                            if calibration_path.exists() else None)
+        if store.calibrator is not None and not store.calibrator.fitted:
+            store.calibrator = None   # written before unfitted calibrators were dropped
+        store.metric = ("cosine" if store.index.metric_type == faiss.METRIC_INNER_PRODUCT
+                        else "l2")
+        store._fields = None
+        return store
@@ -0,0 +1,70 @@
+import pickle
+import numpy as np
+
+
+class ScoreCalibrator:
+    """
+    Maps raw similarity scores of one index onto a common [0, 1] relevance scale.
+
+    Fitted at ingest time from the background distribution of query–document
+    similarities (pseudo-queries × a document sample), stored as quantiles.
+    relevance(raw) = fraction of background pairs scoring below `raw`, so 0.9
+    means "more similar than 90% of arbitrary pairs" for text and images alike.
+    Raw scores must be higher-is-better (pass -L2 for L2 indexes).
+
+    With fewer than `min_pairs` background pairs (e.g. a one-chunk index once
+    self-pairs are excluded) the calibrator stays unfitted — `fitted` is False
+    and callers keep their raw scores instead.
+    """
+
+    def __init__(self, n_quantiles: int = 101):
+        self.levels = np.linspace(0.0, 1.0, n_quantiles)
+        self.quantiles = None
+
+    def fit(self, query_vecs: np.ndarray, doc_vecs: np.ndarray, metric: str = "cosine",
+            max_queries: int = 256, max_docs: int = 4096, seed: int = 0,
+            exclude_self: bool = True, min_pairs: int = 16) -> "ScoreCalibrator":
+        """
+        query_vecs / doc_vecs: float32 [N x D]. When the queries are drawn from
+        the documents themselves (exclude_self), identical row pairs are dropped.
+        """
+        rng = np.random.default_rng(seed)
+        qi = rng.choice(len(query_vecs), min(max_queries, len(query_vecs)), replace=False)
+        di = rng.choice(len(doc_vecs), min(max_docs, len(doc_vecs)), replace=False)
+        q, d = query_vecs[qi], doc_vecs[di]
+
+        if metric == "cosine":
+            raw = q @ d.T
+        else:
+            # -squared L2, matching IndexFlatL2 distances
+            raw = -(np.sum(q ** 2, 1)[:, None] + np.sum(d ** 2, 1)[None, :] - 2 * q @ d.T)
+
+        if exclude_self:
+            keep = qi[:, None] != di[None, :]
+            raw = raw[keep]
+        raw = raw.ravel()
+        if raw.size < min_pairs:
+            self.quantiles = None
+            return self
+        self.quantiles = np.quantile(raw, self.levels).astype(np.float32)
+        return self
+
+    @property
+    def fitted(self) -> bool:
+        return self.quantiles is not None
+
+    def __call__(self, raw: np.ndarray) -> np.ndarray:
+        """Vectorized raw → relevance in [0, 1]."""
+        raw = np.asarray(raw, dtype=np.float32)
+        if self.quantiles is None:
+            raise ValueError("ScoreCalibrator is not fitted — check `fitted` first.")
+        return np.interp(raw, self.quantiles, self.levels).astype(np.float32)
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def load(cls, path: str) -> "ScoreCalibrator":
+        with open(path, "rb") as f:
+            return pickle.load(f)
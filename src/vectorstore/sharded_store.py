@@ -0,0 +1,307 @@
+import os
+import json
+import heapq
+import shutil
+import zlib
+import hashlib
+import threading
+import numpy as np
+from itertools import islice
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from src.vectorstore.faiss_store import FAISSStore
+from src.vectorstore.score_calibration import ScoreCalibrator
+from src.vectorstore.bm25_index import merge_corpus_stats, reciprocal_rank_fusion
+from src.utils.cache import get_cache_paths, list_shards
+
+# Shared across stores: one query fans out to every shard, and FAISS releases
+# the GIL during search, so the shards are scanned on all cores at once.
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def _shared_pool() -> ThreadPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 4,
+                                       thread_name_prefix="shard-search")
+        return _POOL
+
+
+class ShardedFAISSStore:
+    """
+    A text index split into independent FAISSStore shards.
+
+    shard_by="source" — one shard per source file, so re-ingesting or removing
+                        a file only rewrites / drops that file's shard.
+    shard_by="hash"   — crc32(source) % n_shards, for a bounded shard count.
+
+    Shards live under `root` at get_cache_paths(root, shard_name) and are saved
+    and loaded independently; a separate ingest process can build one shard as
+    a plain FAISSStore and save it there. Searches run every shard in parallel
+    and heap-merge the per-shard top-k. Scores are comparable across shards
+    because every shard carries the same calibrator, fitted on a sample drawn
+    from all shards (or, uncalibrated, the same raw metric) — a one-chunk
+    shard has no background of its own to fit. It is persisted once under
+    `root` and refit (and rewritten) whenever shards are added or dropped.
+
+    `fingerprints` maps shard name → a content fingerprint of what it was
+    built from (manifest.json under `root`), so an ingest can keep unchanged
+    shards and rebuild only the ones whose sources changed.
+
+    Exposes the same search / search_hybrid / metadata surface as FAISSStore.
+    """
+
+    def __init__(self, dim: int, metric: str = "l2", storage: str = "float32",
+                 exact_rerank: int = 0, shard_by: str = "source", n_shards: int = 8,
+                 root: str = None):
+        if shard_by not in ("source", "hash"):
+            raise ValueError(f"Unknown shard_by '{shard_by}'. Use source or hash.")
+        self.dim = dim
+        self.metric = metric
+        self.storage = storage
+        self.exact_rerank = exact_rerank
+        self.shard_by = shard_by
+        self.n_shards = n_shards
+        self.root = root
+        self.shards = {}
+        self.calibrator = None
+        self.fingerprints = {}
+        self._dirty = set()
+
+    # ------------------------------------------------------------------
+    # SHARD MANAGEMENT
+    # ------------------------------------------------------------------
+
+    def shard_for(self, meta: dict) -> str:
+        source = meta.get("source") or ""
+        if self.shard_by == "source":
+            # stable, filesystem-safe name per source
+            return "src-" + hashlib.md5(source.encode()).hexdigest()[:12]
+        return f"shard-{zlib.crc32(source.encode()) % self.n_shards:03d}"
+
+    def _new_shard(self) -> FAISSStore:
+        return FAISSStore(self.dim, metric=self.metric, storage=self.storage,
+                          exact_rerank=self.exact_rerank)
+
+    def add(self, vectors: np.ndarray, metadatas: list[dict]):
+        """Route rows to their shards; only the touched shards are marked for saving."""
+        rows = {}
+        for i, meta in enumerate(metadatas):
+            rows.setdefault(self.shard_for(meta), []).append(i)
+        for name, idx in rows.items():
+            if name not in self.shards:
+                self.shards[name] = self._new_shard()
+            self.shards[name].add(vectors[idx], [metadatas[i] for i in idx])
+            self._dirty.add(name)
+
+    def add_shard(self, name: str, store: FAISSStore, fingerprint: str = None,
+                  refit: bool = True):
+        """
+        Attach a shard built elsewhere (e.g. by another ingest process).
+        refit=False defers the calibration refit when attaching several.
+        """
+        if name in self.shards:
+            raise ValueError(f"Shard '{name}' already exists — drop it first.")
+        self.shards[name] = store
+        self._dirty.add(name)
+        if fingerprint is not None:
+            self.fingerprints[name] = fingerprint
+        if refit:
+            self.fit_calibration()
+
+    def drop_shard(self, name: str, refit: bool = True):
+        """Remove a shard from memory and, if persisted, from disk."""
+        self.shards.pop(name, None)
+        self.fingerprints.pop(name, None)
+        self._dirty.discard(name)
+        if self.root is not None:
+            shutil.rmtree(Path(self.root) / name, ignore_errors=True)
+            if Path(self.root).exists():
+                self._save_manifest()
+        if refit:
+            self.fit_calibration()
+
+    def load_shard(self, name: str):
+        index_path, meta_path = get_cache_paths(self.root, name)
+        self.shards[name] = FAISSStore.load(index_path, meta_path,
+                                            exact_rerank=self.exact_rerank)
+        self.shards[name].calibrator = self.calibrator
+        self._dirty.discard(name)
+
+    @property
+    def metadata(self) -> list[dict]:
+        return [m for name in sorted(self.shards) for m in self.shards[name].metadata]
+
+    def build_lexical_index(self):
+        for store in self.shards.values():
+            if store.lexical is None:
+                store.build_lexical_index()
+
+    def fit_calibration(self, max_docs: int = 4096, seed: int = 0):
+        """Fit one calibrator on up to `max_docs` vectors sampled across all shards."""
+        stores = [self.shards[name] for name in sorted(self.shards)]
+        sizes = np.array([s.index.ntotal for s in stores], dtype=np.int64)
+        calibrator = None
+        if sizes.sum() > 0:
+            rng = np.random.default_rng(seed)
+            picks = np.sort(rng.choice(sizes.sum(), min(max_docs, sizes.sum()), replace=False))
+            offsets = np.concatenate([[0], np.cumsum(sizes)])
+            parts = []
+            for store, lo, hi in zip(stores, offsets[:-1], offsets[1:]):
+                local = picks[(picks >= lo) & (picks < hi)] - lo
+                if local.size:
+                    parts.append(store.index.reconstruct_batch(local))
+            vectors = np.vstack(parts)
+            calibrator = ScoreCalibrator().fit(vectors, vectors, metric=self.metric)
+            calibrator = calibrator if calibrator.fitted else None
+        self.calibrator = calibrator
+        for store in stores:
+            store.calibrator = calibrator
+        if self.root is not None and Path(self.root).exists():
+            # a reload must not serve the calibration of the old shard set
+            self._save_calibration()
+
+    # ------------------------------------------------------------------
+    # SEARCH
+    # ------------------------------------------------------------------
+
+    def _map_shards(self, fn) -> list:
+        stores = list(self.shards.values())
+        if len(stores) <= 1:
+            return [fn(s) for s in stores]
+        return list(_shared_pool().map(fn, stores))
+
+    def search(self, query_vector: np.ndarray, k: int, threshold: float = 2.0,
+               filters: dict = None, min_relevance: float = None) -> list[dict]:
+        per_shard = self._map_shards(
+            lambda s: s.search(query_vector, k, threshold, filters, min_relevance)
+        )
+        # each shard's list is already sorted best-first
+        return list(islice(heapq.merge(*per_shard, key=lambda r: r["score"]), k))
+
+    def search_hybrid(self, query_vector: np.ndarray, query_text: str, k: int,
+                      threshold: float = 2.0, rrf_k: int = 60,
+                      candidates: int = None, filters: dict = None,
+                      min_relevance: float = None) -> list[dict]:
+        """
+        Same fusion as FAISSStore.search_hybrid, but over global candidate
+        lists: per-shard dense and BM25 hits are heap-merged first, then fused
+        once, so a shard's local rank 1 doesn't outrank a better hit elsewhere.
+        BM25 is scored with corpus-wide document frequencies and lengths —
+        per-shard IDF would make a one-file shard's passing mention of a rare
+        term outscore a file that is all about it. Scores and the dense-only `min_relevance` cutoff follow
+        FAISSStore.search_hybrid when every shard is calibrated.
+        """
+        candidates = candidates or max(4 * k, 20)
+        self.build_lexical_index()
+        stats = merge_corpus_stats([s.lexical.corpus_stats(query_text)
+                                    for s in self.shards.values()])
+
+        def branch_hits(item):
+            name, store = item
+            mask = store.filter_mask(filters) if filters else None
+            if mask is not None and not mask.any():
+                return [], []
+            dense = store._dense(query_vector, candidates, threshold, mask, min_relevance)
+            keyword = store.lexical.search(query_text, candidates, mask=mask, stats=stats)
+            return ([(score, name, i) for i, score in dense],
+                    [(-score, name, i) for i, score in keyword])
+
+        items = list(self.shards.items())
+        if len(items) <= 1:
+            per_shard = [branch_hits(it) for it in items]
+        else:
+            per_shard = list(_shared_pool().map(branch_hits, items))
+
+        dense = list(islice(heapq.merge(*(d for d, _ in per_shard)), candidates))
+        keyword = list(islice(heapq.merge(*(b for _, b in per_shard)), candidates))
+        dense_scores = {(name, i): score for score, name, i in dense}
+        bm25_scores = {(name, i): -neg for neg, name, i in keyword}
+        fused = reciprocal_rank_fusion(
+            [[(name, i) for _, name, i in dense], [(name, i) for _, name, i in keyword]],
+            k=rrf_k,
+        )[:k]
+
+        if fused and all(s.calibrator is not None for s in self.shards.values()):
+            by_shard = {}
+            for pos, ((name, i), _) in enumerate(fused):
+                by_shard.setdefault(name, []).append((pos, i))
+            relevance = np.empty(len(fused), dtype=np.float32)
+            for name, hits in by_shard.items():
+                rel = self.shards[name].relevance(query_vector, [i for _, i in hits])
+                relevance[[pos for pos, _ in hits]] = rel
+            scores = 1.0 - np.sort(relevance)[::-1]
+        else:
+            max_rrf = 2.0 / (rrf_k + 1)
+            scores = [1.0 - rrf / max_rrf for _, rrf in fused]
+
+        return [
+            {
+                **self.shards[name].metadata[i],
+                "score": float(score),
+                "rrf_score": rrf,
+                "dense_score": dense_scores.get((name, i)),
+                "bm25_score": bm25_scores.get((name, i)),
+            }
+            for ((name, i), rrf), score in zip(fused, scores)
+        ]
+
+    # ------------------------------------------------------------------
+    # PERSISTENCE
+    # ------------------------------------------------------------------
+
+    def save(self, root: str = None):
+        """Write only the shards changed since the last save / load."""
+        self.root = root or self.root
+        Path(self.root).mkdir(parents=True, exist_ok=True)
+        for name in sorted(self._dirty):
+            self.shards[name].save(*get_cache_paths(self.root, name))
+        self._save_calibration()
+        self._save_manifest()
+        print(f"[ShardedFAISSStore] Saved {len(self._dirty)} of "
+              f"{len(self.shards)} shards → {self.root}")
+        self._dirty.clear()
+
+    def _save_calibration(self):
+        calibration_path = Path(self.root) / "calibration.pkl"
+        if self.calibrator is not None:
+            self.calibrator.save(str(calibration_path))
+        else:
+            calibration_path.unlink(missing_ok=True)
+
+    def _save_manifest(self):
+        with open(Path(self.root) / "manifest.json", "w") as f:
+            json.dump({"fingerprints": self.fingerprints}, f, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, root: str, exact_rerank: int = 0, **kwargs) -> "ShardedFAISSStore":
+        names = list_shards(root)
+        if not names:
+            raise FileNotFoundError(f"No shards found under {root}")
+
+        def load_one(name):
+            index_path, meta_path = get_cache_paths(root, name)
+            return name, FAISSStore.load(index_path, meta_path, exact_rerank=exact_rerank)
+
+        loaded = list(_shared_pool().map(load_one, names))
+        first = loaded[0][1]
+        store = cls(first.index.d, metric=first.metric, storage=first.storage,
+                    exact_rerank=exact_rerank, root=root, **kwargs)
+        store.shards = dict(loaded)
+        manifest_path = Path(root) / "manifest.json"
+        if manifest_path.exists():
+            with open(manifest_path) as f:
+                fingerprints = json.load(f).get("fingerprints", {})
+            store.fingerprints = {n: fp for n, fp in fingerprints.items() if n in store.shards}
+        calibration_path = Path(root) / "calibration.pkl"
+        if calibration_path.exists():
+            store.calibrator = ScoreCalibrator.load(str(calibration_path))
+            for shard in store.shards.values():
+                shard.calibrator = store.calibrator
+        else:
+            # shards saved with their own calibrators — replace them with a shared one
+            store.fit_calibration()
+        print(f"[ShardedFAISSStore] Loaded {len(names)} shards from {root}")
+        return store